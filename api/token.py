@@ -1,78 +1,48 @@
+from __future__ import annotations
+
 import os
-import jwt
 import time
-from typing import Optional, Dict, Any
-from http.server import BaseHTTPRequestHandler
+import hmac
+import base64
+import hashlib
+import re
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from json.encoder import encode_basestring_ascii
 import json
 
-class TokenHandler(BaseHTTPRequestHandler):
-    def do_POST(self):
-        """Обработка POST запросов для генерации токенов"""
-        try:
-            # Получаем переменные окружения
-            api_key = os.getenv('LIVEKIT_API_KEY')
-            api_secret = os.getenv('LIVEKIT_API_SECRET')
-            
-            if not api_key or not api_secret:
-                self.send_error(500, "Missing LiveKit credentials")
-                return
-            
-            # Читаем тело запроса
-            content_length = int(self.headers.get('Content-Length', 0))
-            body = self.rfile.read(content_length).decode('utf-8')
-            
-            try:
-                request_data = json.loads(body) if body else {}
-            except json.JSONDecodeError:
-                request_data = {}
-            
-            # Извлекаем параметры
-            room_name = request_data.get('roomName', 'default-room')
-            participant_name = request_data.get('participantName', f'user-{int(time.time())}')
-            
-            # Генерируем токен
-            token = generate_livekit_token(
-                api_key=api_key,
-                api_secret=api_secret,
-                room_name=room_name,
-                participant_name=participant_name
-            )
-            
-            # Отправляем ответ
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
-            self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-            self.end_headers()
-            
-            response = {
-                'token': token,
-                'url': os.getenv('LIVEKIT_URL', 'wss://your-project.livekit.cloud')
-            }
-            
-            self.wfile.write(json.dumps(response).encode('utf-8'))
-            
-        except Exception as e:
-            self.send_error(500, f"Error generating token: {str(e)}")
-    
-    def do_OPTIONS(self):
-        """Обработка OPTIONS запросов для CORS"""
-        self.send_response(200)
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-        self.end_headers()
+# Холодный старт Vercel функции: на пути подписи импортируется только stdlib из
+# списка выше. jwt, http.server, concurrent.futures, argparse и signal импортируются
+# лениво там, где они нужны; typing нужен только анализаторам — аннотации
+# не вычисляются благодаря from __future__ import annotations.
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Optional, Dict, Any, Iterable, Iterator, List, Tuple, Callable
+
+DEFAULT_LIVEKIT_URL = 'wss://your-project.livekit.cloud'
+
+# Пакетный выпуск токенов
+MAX_TOKEN_TTL = 24 * 3600
+BATCH_MAX_SIZE = int(os.getenv('LIVEKIT_BATCH_MAX_SIZE', '1000'))
+BATCH_STREAM_THRESHOLD = int(os.getenv('LIVEKIT_BATCH_STREAM_THRESHOLD', '100'))
+
+# Ограничения входных данных: размер тела, длина имен (байт UTF-8)
+MAX_BODY_SIZE = int(os.getenv('LIVEKIT_MAX_BODY_SIZE', str(1024 * 1024)))
+MAX_NAME_BYTES = int(os.getenv('LIVEKIT_MAX_NAME_BYTES', '128'))
 
 def generate_livekit_token(
     api_key: str,
     api_secret: str,
     room_name: str,
     participant_name: str,
-    ttl: int = 3600
+    ttl: int = 3600,
+    now: Optional[int] = None,
+    kid: Optional[str] = None,
+    permissions: Optional[Dict[str, Any]] = None
 ) -> str:
     """
-    Генерирует JWT токен для LiveKit
+    Генерирует JWT токен для LiveKit через PyJWT
     
     Args:
         api_key: LiveKit API ключ
@@ -80,11 +50,17 @@ def generate_livekit_token(
         room_name: Название комнаты
         participant_name: Имя участника
         ttl: Время жизни токена в секундах (по умолчанию 1 час)
+        now: Момент выпуска (unix time), по умолчанию текущее время
+        kid: Идентификатор ключа для заголовка JWT (ключи из keyring)
+        permissions: Блок permissions (профиль прав), по умолчанию DEFAULT_PERMISSIONS
     
     Returns:
         JWT токен для подключения к LiveKit
     """
-    now = int(time.time())
+    import jwt
+    
+    if now is None:
+        now = int(time.time())
     
     # Полезная нагрузка JWT
     payload = {
@@ -95,97 +71,2342 @@ def generate_livekit_token(
         'nbf': now,
         'iat': now,
         'room': room_name,
-        'permissions': {
-            'canPublish': True,
-            'canSubscribe': True,
-            'canPublishData': True,
-            'canUpdateMetadata': True
-        }
+        'permissions': permissions if permissions is not None else dict(DEFAULT_PERMISSIONS)
     }
     
     # Генерируем токен
-    token = jwt.encode(payload, api_secret, algorithm='HS256')
+    token = jwt.encode(payload, api_secret, algorithm='HS256', headers={'kid': kid} if kid else None)
     
     return token
 
-# Для Vercel serverless функций
-def handler(request, context):
-    """Vercel serverless function handler"""
+def _b64url(data: bytes) -> bytes:
+    """base64url без паддинга, как в JWS (RFC 7515)"""
+    return base64.urlsafe_b64encode(data).rstrip(b'=')
+
+# Заголовок JWT не зависит от запроса: сериализуем его один раз так же,
+# как это делает PyJWT (sort_keys=True, компактные разделители)
+def _jwt_header_segment(kid: Optional[str] = None) -> bytes:
+    header = {'alg': 'HS256', 'typ': 'JWT'}
+    if kid:
+        header['kid'] = kid
+    return _b64url(json.dumps(header, separators=(',', ':'), sort_keys=True).encode('utf-8'))
+
+_JWT_HEADER_SEGMENT = _jwt_header_segment()
+
+# Профили прав (grants): именованные наборы permissions с ttl. Профиль
+# выбирается полем "profile" запроса или по шаблону имени комнаты, его блок
+# permissions сериализуется в хвост claims один раз при загрузке.
+
+DEFAULT_PERMISSIONS = {
+    'canPublish': True,
+    'canSubscribe': True,
+    'canPublishData': True,
+    'canUpdateMetadata': True
+}
+
+class GrantProfile:
+    """
+    Профиль прав: permissions, ttl по умолчанию, максимальный ttl и можно ли
+    выбрать профиль полем "profile" запроса. fragment - готовый хвост claims.
+    """
     
-    # Проверяем метод запроса
-    if request.method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type',
-            },
-            'body': ''
-        }
+    __slots__ = ('name', 'permissions', 'ttl', 'max_ttl', 'requestable', 'fragment')
+    
+    def __init__(
+        self,
+        name: str,
+        permissions: Dict[str, Any],
+        ttl: int = 3600,
+        max_ttl: int = MAX_TOKEN_TTL,
+        requestable: bool = False
+    ):
+        if not isinstance(permissions, dict) or not all(isinstance(key, str) for key in permissions):
+            raise ValueError(f'Profile {name!r}: permissions must be an object')
+        for value in (ttl, max_ttl):
+            if not isinstance(value, int) or isinstance(value, bool) or not 0 < value <= MAX_TOKEN_TTL:
+                raise ValueError(f'Profile {name!r}: ttl must be an integer between 1 and {MAX_TOKEN_TTL}')
+        if ttl > max_ttl:
+            raise ValueError(f'Profile {name!r}: ttl is larger than max_ttl')
+        self.name = name
+        self.permissions = permissions
+        self.ttl = ttl
+        self.max_ttl = max_ttl
+        self.requestable = bool(requestable)
+        # Сериализация как у PyJWT (компактные разделители, порядок ключей сохраняется)
+        self.fragment = ',"permissions":' + json.dumps(permissions, separators=(',', ':')) + '}'
+
+DEFAULT_GRANT_PROFILE = GrantProfile('default', DEFAULT_PERMISSIONS)
+
+# Статический хвост полезной нагрузки по умолчанию: блок permissions
+_PERMISSIONS_FRAGMENT = DEFAULT_GRANT_PROFILE.fragment
+
+class TokenMinter:
+    """
+    Движок выпуска LiveKit токенов.
+    
+    Креды загружаются один раз, HMAC-ключ предвычисляется (копия готового
+    состояния hmac вместо разбора ключа на каждый запрос), заголовок и
+    статические фрагменты claims (включая permissions профилей) сериализованы
+    заранее. На каждый запрос подставляются только sub, room и iat/nbf/exp.
+    
+    Встроенный подписчик использует только stdlib (hmac + base64 + json) и
+    выдает токены, побайтово совпадающие с generate_livekit_token (PyJWT).
+    signer='pyjwt' подписывает через PyJWT — на случай, если нужна библиотечная реализация.
+    kid (ключи из Keyring) добавляется в заголовок JWT.
+    """
+    
+    SIGNERS = ('builtin', 'pyjwt')
+    
+    def __init__(
+        self,
+        api_key: str,
+        api_secret: str,
+        url: str = DEFAULT_LIVEKIT_URL,
+        signer: str = 'builtin',
+        kid: Optional[str] = None
+    ):
+        if signer not in self.SIGNERS:
+            raise ValueError(f"Unknown JWT signer {signer!r}, expected one of {self.SIGNERS}")
+        self.api_key = api_key
+        self.url = url
+        self.signer = signer
+        self.kid = kid
+        self._api_secret = api_secret
+        self._mac = hmac.new(api_secret.encode('utf-8'), digestmod=hashlib.sha256)
+        self._signing_prefix = (_jwt_header_segment(kid) if kid else _JWT_HEADER_SEGMENT) + b'.'
+        self._claims_prefix = '{"iss":' + encode_basestring_ascii(api_key) + ',"sub":'
+        # Хвост JSON ответа после токена: {"token": "<token>", "url": "<url>"}
+        self.response_suffix = b'", "url": ' + json.dumps(url).encode('utf-8') + b'}'
+    
+    @classmethod
+    def from_env(cls) -> Optional['TokenMinter']:
+        """Создает минтер из переменных окружения, None если кредов нет"""
+        api_key = os.getenv('LIVEKIT_API_KEY')
+        api_secret = os.getenv('LIVEKIT_API_SECRET')
+        
+        if not api_key or not api_secret:
+            return None
+        
+        return cls(
+            api_key,
+            api_secret,
+            os.getenv('LIVEKIT_URL', DEFAULT_LIVEKIT_URL),
+            signer=os.getenv('LIVEKIT_JWT_SIGNER', 'builtin')
+        )
+    
+    def mint(
+        self,
+        room_name: str,
+        participant_name: str,
+        ttl: int = 3600,
+        now: Optional[int] = None,
+        grants: Optional[GrantProfile] = None
+    ) -> str:
+        """
+        Выпускает JWT токен для LiveKit
+        
+        Args:
+            room_name: Название комнаты
+            participant_name: Имя участника
+            ttl: Время жизни токена в секундах (по умолчанию 1 час)
+            now: Момент выпуска (unix time), по умолчанию текущее время
+            grants: Профиль прав, по умолчанию DEFAULT_GRANT_PROFILE
+        
+        Returns:
+            JWT токен для подключения к LiveKit
+        """
+        if now is None:
+            now = int(time.time())
+        
+        if self.signer == 'pyjwt':
+            return generate_livekit_token(
+                self.api_key, self._api_secret, room_name, participant_name, ttl, now, self.kid,
+                grants.permissions if grants is not None else None
+            )
+        
+        claims = (
+            self._claims_prefix
+            + encode_basestring_ascii(participant_name)
+            + ',"aud":"livekit","exp":' + str(now + ttl)
+            + ',"nbf":' + str(now)
+            + ',"iat":' + str(now)
+            + ',"room":' + encode_basestring_ascii(room_name)
+            + (grants.fragment if grants is not None else _PERMISSIONS_FRAGMENT)
+        )
+        
+        signing_input = self._signing_prefix + _b64url(claims.encode('utf-8'))
+        mac = self._mac.copy()
+        mac.update(signing_input)
+        
+        return (signing_input + b'.' + _b64url(mac.digest())).decode('ascii')
+
+# Набор ключей подписи (keyring) для ротации без перезапуска: несколько пар
+# (api_key, secret) с kid и окном действия в JSON файле. Файл перечитывается
+# при изменении, минтеры ключей с предвычисленным HMAC создаются один раз
+# на загрузку, так что ротация ничего не добавляет к подписи запроса.
+
+_FOREVER = float('inf')
+
+def _keyring_timestamp(value: Any, default: float) -> float:
+    """Граница окна ключа: unix time или строка ISO 8601 (без зоны - UTC)"""
+    if value is None:
+        return default
+    if isinstance(value, str):
+        from datetime import datetime, timezone
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return moment.timestamp()
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f'Invalid key validity bound: {value!r}')
+    return float(value)
+
+class SigningKey:
+    """Ключ из keyring: kid, API ключ, окно действия [not_before, not_after) и минтер ключа"""
+    
+    __slots__ = ('kid', 'api_key', 'not_before', 'not_after', 'minter')
+    
+    def __init__(
+        self,
+        kid: str,
+        api_key: str,
+        api_secret: str,
+        not_before: float = 0.0,
+        not_after: float = _FOREVER,
+        url: str = DEFAULT_LIVEKIT_URL,
+        signer: str = 'builtin'
+    ):
+        if not_before >= not_after:
+            raise ValueError(f'Key {kid!r}: not_before must be earlier than not_after')
+        self.kid = kid
+        self.api_key = api_key
+        self.not_before = not_before
+        self.not_after = not_after
+        self.minter = TokenMinter(api_key, api_secret, url, signer=signer, kid=kid)
+    
+    def active_at(self, now: float) -> bool:
+        return self.not_before <= now < self.not_after
+
+class _KeyringState:
+    """Снимок загруженного файла; не меняется после создания, кроме кеша активного ключа"""
+    
+    __slots__ = ('version', 'keys', 'by_kid', 'by_api_key', 'active')
+    
+    def __init__(self, version: int, keys: List[SigningKey]):
+        self.version = version
+        self.keys = sorted(keys, key=lambda key: key.not_before)
+        self.by_kid = {key.kid: key for key in self.keys}
+        self.by_api_key: Dict[str, SigningKey] = {}
+        for key in self.keys:
+            self.by_api_key.setdefault(key.api_key, key)
+        # (с какого момента, до какого, минтер) - активный ключ на этом
+        # интервале; одним кортежем, чтобы потоки не видели его наполовину
+        self.active: Tuple[float, float, Optional[TokenMinter]] = (0.0, 0.0, None)
+    
+    def select(self, now: float) -> Tuple[float, float, Optional[TokenMinter]]:
+        """
+        Активный ключ - действующий с самым поздним not_before. Выбор не меняется
+        до ближайшего из: конец окна активного ключа, начало окна следующего.
+        """
+        active = None
+        until = _FOREVER
+        for key in self.keys:
+            if key.not_before > now:
+                until = min(until, key.not_before)
+            elif now < key.not_after:
+                active = key
+        if active is not None:
+            until = min(until, active.not_after)
+        self.active = (now, until, active.minter if active is not None else None)
+        return self.active
+
+class TokenKeyring:
+    """
+    Ключи подписи из JSON файла:
+    
+        {"keys": [
+            {"kid": "2026-09", "api_key": "...", "api_secret": "...", "not_after": "2026-10-08T00:00:00Z"},
+            {"kid": "2026-10", "api_key": "...", "api_secret": "...", "not_before": "2026-10-01T00:00:00Z"}
+        ]}
+    
+    not_before/not_after - unix time или ISO 8601, по умолчанию без ограничения.
+    Подписывает активный ключ (действующий с самым поздним not_before); он
+    кешируется до ближайшей границы окон, так что выбор ключа - O(1).
+    
+    Раз в poll_interval секунд (по обращениям, без фонового потока) файл
+    проверяется по mtime/размеру/inode и при изменении перечитывается. Новый
+    снимок ключей подменяет старый одним присваиванием: запросы в полете
+    дописывают старым снимком, перечитывает файл только один поток. Если
+    новый файл некорректен, остаются прежние ключи, ошибка - в last_error.
+    """
+    
+    def __init__(
+        self,
+        path: str,
+        url: str = DEFAULT_LIVEKIT_URL,
+        signer: str = 'builtin',
+        poll_interval: float = 1.0
+    ):
+        self.path = path
+        self.url = url
+        self.signer = signer
+        self.poll_interval = poll_interval
+        self.reloads = 0
+        self.last_error: Optional[str] = None
+        self._file_signature = None
+        self._next_poll = 0.0
+        self._reload_lock = threading.Lock()
+        self._reload_hooks: List[Callable[[], None]] = []
+        self._state = _KeyringState(0, [])
+        self.poll()
+    
+    @classmethod
+    def from_env(cls) -> Optional['TokenKeyring']:
+        """Keyring из LIVEKIT_KEYRING_FILE, None если файл не задан"""
+        path = os.getenv('LIVEKIT_KEYRING_FILE')
+        if not path:
+            return None
+        return cls(
+            path,
+            os.getenv('LIVEKIT_URL', DEFAULT_LIVEKIT_URL),
+            signer=os.getenv('LIVEKIT_JWT_SIGNER', 'builtin'),
+            poll_interval=float(os.getenv('LIVEKIT_KEYRING_POLL_INTERVAL', '1.0'))
+        )
     
-    if request.method != 'POST':
+    @property
+    def version(self) -> int:
+        """Номер загрузки файла; растет при каждой успешной перезагрузке"""
+        return self._state.version
+    
+    def add_reload_hook(self, hook: Callable[[], None]):
+        """hook() вызывается после каждой перезагрузки ключей"""
+        self._reload_hooks.append(hook)
+    
+    def _load_keys(self) -> List[SigningKey]:
+        with open(self.path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        entries = data.get('keys') if isinstance(data, dict) else data
+        if not isinstance(entries, list) or not entries:
+            raise ValueError('Keyring must contain a non-empty "keys" list')
+        keys = []
+        for entry in entries:
+            if not isinstance(entry, dict):
+                raise ValueError('Keyring entries must be objects')
+            api_key = entry.get('api_key')
+            api_secret = entry.get('api_secret')
+            if not isinstance(api_key, str) or not api_key or not isinstance(api_secret, str) or not api_secret:
+                raise ValueError('Keyring entries need non-empty api_key and api_secret')
+            kid = entry.get('kid', api_key)
+            if not isinstance(kid, str) or not kid:
+                raise ValueError(f'Invalid kid for key {api_key!r}')
+            keys.append(SigningKey(
+                kid,
+                api_key,
+                api_secret,
+                _keyring_timestamp(entry.get('not_before'), 0.0),
+                _keyring_timestamp(entry.get('not_after'), _FOREVER),
+                self.url,
+                self.signer
+            ))
+        if len({key.kid for key in keys}) != len(keys):
+            raise ValueError('Keyring kids must be unique')
+        return keys
+    
+    def poll(self) -> bool:
+        """
+        Перечитывает файл, если он изменился. Не ждет: если файл уже
+        перечитывает другой поток, сразу возвращает False.
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        try:
+            self._next_poll = time.monotonic() + self.poll_interval
+            try:
+                # stat до чтения: если файл поменяют между ними, следующий опрос перечитает его еще раз
+                stat = os.stat(self.path)
+                signature = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+                if signature == self._file_signature:
+                    return False
+                keys = self._load_keys()
+            except (OSError, ValueError) as e:
+                self.last_error = f'{type(e).__name__}: {e}'
+                return False
+            self._file_signature = signature
+            self._state = _KeyringState(self._state.version + 1, keys)
+            self.reloads += 1
+            self.last_error = None
+        finally:
+            self._reload_lock.release()
+        for hook in self._reload_hooks:
+            hook()
+        return True
+    
+    def refresh(self):
+        """Опрашивает файл, если с прошлого опроса прошло poll_interval секунд"""
+        if time.monotonic() >= self._next_poll:
+            self.poll()
+    
+    def minter(self, now: Optional[float] = None) -> Optional[TokenMinter]:
+        """Минтер активного ключа, None если в момент now действующих ключей нет"""
+        if time.monotonic() >= self._next_poll:
+            self.poll()
+        if now is None:
+            now = time.time()
+        state = self._state
+        start, until, minter = state.active
+        if not start <= now < until:
+            start, until, minter = state.select(now)
+        return minter
+    
+    def lookup(self, kid: Optional[str], api_key: Any = None) -> Optional[SigningKey]:
+        """Ключ по kid из заголовка токена, а для токенов без kid - по iss (API ключу)"""
+        state = self._state
+        if kid is not None:
+            return state.by_kid.get(kid)
+        if isinstance(api_key, str):
+            return state.by_api_key.get(api_key)
+        return None
+    
+    def stats(self) -> Dict[str, Any]:
+        """Ключи (без секретов), активный kid, число перезагрузок и последняя ошибка"""
+        now = time.time()
+        state = self._state
+        minter = self.minter(now)
         return {
-            'statusCode': 405,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Content-Type': 'application/json'
-            },
-            'body': json.dumps({'error': 'Method not allowed'})
+            'path': self.path,
+            'version': state.version,
+            'reloads': self.reloads,
+            'active_kid': minter.kid if minter is not None else None,
+            'keys': [
+                {
+                    'kid': key.kid,
+                    'api_key': key.api_key,
+                    'not_before': key.not_before if key.not_before > 0 else None,
+                    'not_after': key.not_after if key.not_after != _FOREVER else None,
+                    'valid_now': key.active_at(now)
+                }
+                for key in state.keys
+            ],
+            'last_error': self.last_error
         }
+
+_keyring: Optional[TokenKeyring] = None
+_keyring_loaded = False
+
+def get_keyring() -> Optional[TokenKeyring]:
+    """Возвращает общий для процесса keyring (None, если LIVEKIT_KEYRING_FILE не задан)"""
+    global _keyring, _keyring_loaded
+    if not _keyring_loaded:
+        _keyring = TokenKeyring.from_env()
+        if _keyring is not None:
+            # Токены из кеша могли быть подписаны ключом, который убрали из файла
+            _keyring.add_reload_hook(_clear_token_cache)
+        _keyring_loaded = True
+    return _keyring
+
+_minter: Optional[TokenMinter] = None
+
+def get_minter() -> Optional[TokenMinter]:
+    """
+    Возвращает общий для процесса минтер, создавая его из окружения при первом вызове.
+    Пока кредов нет, возвращает None и повторяет попытку на следующем запросе.
+    С LIVEKIT_KEYRING_FILE возвращает минтер активного ключа из keyring.
+    """
+    global _minter
+    if _minter is None:
+        keyring = get_keyring()
+        if keyring is not None:
+            return keyring.minter()
+        _minter = TokenMinter.from_env()
+    return _minter
+
+class RoomPatternIndex:
+    """
+    Сопоставляет имя комнаты с шаблонами: точное имя или префикс со звездочкой
+    в конце ("support-*"; "*" - любая комната). Точное имя важнее префикса,
+    длинный префикс важнее короткого.
     
-    try:
-        # Получаем переменные окружения
+    Точные имена лежат в dict, префиксы - в dict по каждой встречающейся длине
+    префикса (сжатый вариант префиксного дерева): поиск делает не больше одного
+    обращения к dict на различную длину, сколько бы шаблонов ни было.
+    """
+    
+    def __init__(self, patterns: Iterable[Tuple[str, Any]] = ()):
+        self._exact: Dict[str, Any] = {}
+        by_length: Dict[int, Dict[str, Any]] = {}
+        self.size = 0
+        for pattern, value in patterns:
+            if pattern.endswith('*'):
+                key, table = pattern[:-1], by_length.setdefault(len(pattern) - 1, {})
+            else:
+                key, table = pattern, self._exact
+            if '*' in key:
+                raise ValueError(f'Room pattern {pattern!r}: only a trailing * is supported')
+            if key in table:
+                raise ValueError(f'Duplicate room pattern {pattern!r}')
+            table[key] = value
+            self.size += 1
+        # От длинных префиксов к коротким: первое совпадение - самое длинное
+        self._prefixes = sorted(by_length.items(), reverse=True)
+    
+    def match(self, room_name: str) -> Any:
+        """Значение лучшего шаблона для комнаты, None если ни один не подошел"""
+        value = self._exact.get(room_name)
+        if value is not None:
+            return value
+        size = len(room_name)
+        for length, table in self._prefixes:
+            if length <= size:
+                value = table.get(room_name[:length])
+                if value is not None:
+                    return value
+        return None
+
+class GrantProfiles:
+    """
+    Профили прав и шаблоны комнат, загруженные один раз (LIVEKIT_GRANT_PROFILES_FILE):
+    
+        {"profiles": {
+            "listener": {"permissions": {"canPublish": false, "canSubscribe": true}, "ttl": 7200, "requestable": true},
+            "agent": {"permissions": {...}, "ttl": 3600},
+            "supervisor": {"permissions": {...}, "ttl": 900, "max_ttl": 3600}
+         },
+         "rooms": {"webinar-*": "listener", "support-*": "agent", "ops-war-room": "supervisor"},
+         "default": "default"}
+    
+    Профиль "default" (DEFAULT_PERMISSIONS, ttl 3600) есть всегда, его можно
+    переопределить. Поле "profile" запроса выбирает только профили с
+    requestable: true - иначе любой клиент мог бы запросить права супервизора.
+    """
+    
+    def __init__(
+        self,
+        profiles: Optional[Dict[str, GrantProfile]] = None,
+        rooms: Optional[Dict[str, str]] = None,
+        default: str = 'default'
+    ):
+        self.profiles = {'default': DEFAULT_GRANT_PROFILE}
+        self.profiles.update(profiles or {})
+        if default not in self.profiles:
+            raise ValueError(f'Unknown default profile {default!r}')
+        self.default = self.profiles[default]
+        patterns = []
+        for pattern, name in (rooms or {}).items():
+            if name not in self.profiles:
+                raise ValueError(f'Room pattern {pattern!r} refers to unknown profile {name!r}')
+            patterns.append((pattern, self.profiles[name]))
+        self.rooms = RoomPatternIndex(patterns)
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'GrantProfiles':
+        if not isinstance(data, dict):
+            raise ValueError('Grant profiles must be a JSON object')
+        profiles = {}
+        for name, options in (data.get('profiles') or {}).items():
+            if not isinstance(options, dict):
+                raise ValueError(f'Profile {name!r} must be an object')
+            profiles[name] = GrantProfile(
+                name,
+                options.get('permissions', DEFAULT_PERMISSIONS),
+                options.get('ttl', 3600),
+                options.get('max_ttl', MAX_TOKEN_TTL),
+                options.get('requestable', False)
+            )
+        return cls(profiles, data.get('rooms'), data.get('default', 'default'))
+    
+    @classmethod
+    def from_env(cls) -> 'GrantProfiles':
+        """Профили из LIVEKIT_GRANT_PROFILES_FILE, без него - только профиль default"""
+        path = os.getenv('LIVEKIT_GRANT_PROFILES_FILE')
+        if not path:
+            return cls()
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+    
+    def resolve(self, room_name: str, requested: Any = None) -> GrantProfile:
+        """
+        Профиль для выпуска: запрошенный (если он requestable), иначе по шаблону
+        комнаты, иначе профиль по умолчанию. ValueError для недоступного профиля.
+        """
+        if requested is not None:
+            profile = self.profiles.get(requested) if isinstance(requested, str) else None
+            if profile is None or not profile.requestable:
+                raise ValueError(f'Unknown profile: {requested!r}')
+            return profile
+        return self.rooms.match(room_name) or self.default
+
+_grant_profiles: Optional[GrantProfiles] = None
+
+def get_grant_profiles() -> GrantProfiles:
+    """Возвращает общие для процесса профили прав, загружая их при первом вызове"""
+    global _grant_profiles
+    if _grant_profiles is None:
+        _grant_profiles = GrantProfiles.from_env()
+    return _grant_profiles
+
+# Проверка токенов: подпись, nbf/exp, aud и комната. Используется агентами и
+# админскими инструментами вместо собственных jwt.decode с копией секрета.
+
+def _b64url_decode(segment: bytes) -> bytes:
+    return base64.urlsafe_b64decode(segment + b'=' * (-len(segment) % 4))
+
+class TokenVerificationError(ValueError):
+    """
+    Токен не прошел проверку. reason - машиночитаемая причина: malformed,
+    unsupported_algorithm, unknown_key, bad_signature, wrong_issuer,
+    wrong_audience, retired_key, not_yet_valid, expired, wrong_room.
+    """
+    
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+class TokenVerifier:
+    """
+    Проверяет токены, выпущенные TokenMinter (или PyJWT с теми же кредами).
+    
+    Успешно проверенные токены кешируются (LRU до cache_size записей) по
+    blake2b-дайджесту токена до истечения exp: повторная проверка того же
+    токена не пересчитывает HMAC и не разбирает claims. Отклоненные токены
+    не кешируются. leeway - допуск расхождения часов для nbf/exp в секундах.
+    
+    С keyring ключ выбирается по kid из заголовка (или по iss для токенов
+    без kid), а iat токена должен попадать в окно действия ключа. Кеш
+    сбрасывается при перезагрузке keyring.
+    """
+    
+    def __init__(
+        self,
+        api_key: Optional[str],
+        api_secret: Optional[str],
+        cache_size: int = 10000,
+        leeway: float = 0,
+        keyring: Optional[TokenKeyring] = None
+    ):
+        self.api_key = api_key
+        self.cache_size = cache_size
+        self.leeway = leeway
+        self.keyring = keyring
+        self.hits = 0
+        self.misses = 0
+        self._mac = hmac.new(api_secret.encode('utf-8'), digestmod=hashlib.sha256) if api_secret else None
+        self._keyring_version = keyring.version if keyring is not None else 0
+        self._cache: 'OrderedDict[bytes, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def from_env(cls) -> Optional['TokenVerifier']:
+        """Создает верификатор с кредами минтера (или его keyring), None если кредов нет"""
+        cache_size = int(os.getenv('LIVEKIT_VERIFY_CACHE_SIZE', '10000'))
+        leeway = float(os.getenv('LIVEKIT_VERIFY_LEEWAY', '0'))
+        keyring = get_keyring()
+        if keyring is not None:
+            return cls(None, None, cache_size=cache_size, leeway=leeway, keyring=keyring)
         api_key = os.getenv('LIVEKIT_API_KEY')
         api_secret = os.getenv('LIVEKIT_API_SECRET')
-        
         if not api_key or not api_secret:
+            return None
+        return cls(api_key, api_secret, cache_size=cache_size, leeway=leeway)
+    
+    def verify(self, token: str, room_name: Optional[str] = None, now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Проверяет токен и возвращает его claims.
+        
+        Args:
+            token: JWT токен
+            room_name: Если задано, токен должен давать доступ именно к этой комнате
+            now: Момент проверки (unix time), по умолчанию текущее время
+        
+        Raises:
+            TokenVerificationError: токен поддельный, просрочен или не для этой комнаты
+        """
+        if now is None:
+            now = time.time()
+        try:
+            data = token.encode('ascii')
+        except (AttributeError, UnicodeEncodeError):
+            raise TokenVerificationError('malformed', 'Token must be an ASCII string')
+        
+        if self.keyring is not None:
+            self.keyring.refresh()
+            if self.keyring.version != self._keyring_version:
+                # Ключи сменились: проверенные раньше токены могли быть подписаны удаленным ключом
+                self._keyring_version = self.keyring.version
+                self.clear()
+        
+        key = None
+        if self.cache_size > 0:
+            key = hashlib.blake2b(data, digest_size=16).digest()
+            with self._lock:
+                entry = self._cache.get(key)
+                if entry is not None:
+                    claims, expires_at = entry
+                    if expires_at > now - self.leeway:
+                        self._cache.move_to_end(key)
+                        self.hits += 1
+                        return self._check_room(dict(claims), room_name)
+                    # Истек: дальше полная проверка вернет expired
+                    del self._cache[key]
+                self.misses += 1
+        
+        claims = self._verify_signed(data, now)
+        
+        if key is not None:
+            with self._lock:
+                self._cache[key] = (claims, claims['exp'])
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        
+        return self._check_room(dict(claims), room_name)
+    
+    def _verify_signed(self, data: bytes, now: float) -> Dict[str, Any]:
+        signing_input, _, signature = data.rpartition(b'.')
+        header, _, payload = signing_input.partition(b'.')
+        if not header or not payload or not signature or b'.' in payload:
+            raise TokenVerificationError('malformed', 'Token must have three segments')
+        
+        kid = None
+        if header != _JWT_HEADER_SEGMENT:
+            # Заголовок другой сериализации или с kid: принимаем только HS256
+            try:
+                header_data = json.loads(_b64url_decode(header))
+            except ValueError:
+                raise TokenVerificationError('malformed', 'Invalid token header')
+            if not isinstance(header_data, dict) or header_data.get('alg') != 'HS256':
+                raise TokenVerificationError('unsupported_algorithm', 'Only HS256 tokens are accepted')
+            kid = header_data.get('kid')
+            if kid is not None and not isinstance(kid, str):
+                raise TokenVerificationError('malformed', 'Token kid must be a string')
+        
+        signing_key = None
+        if self.keyring is not None:
+            # Ключ подписи определяется до проверки подписи: по kid или по iss из payload
+            claims = self._decode_claims(payload)
+            signing_key = self.keyring.lookup(kid, claims.get('iss'))
+            if signing_key is None:
+                raise TokenVerificationError('unknown_key', 'Token was signed by a key that is not in the keyring')
+            api_key, base_mac = signing_key.api_key, signing_key.minter._mac
+        else:
+            api_key, base_mac = self.api_key, self._mac
+        
+        mac = base_mac.copy()
+        mac.update(signing_input)
+        if not hmac.compare_digest(_b64url(mac.digest()), signature):
+            raise TokenVerificationError('bad_signature', 'Token signature is invalid')
+        
+        if signing_key is None:
+            claims = self._decode_claims(payload)
+        
+        if claims.get('iss') != api_key:
+            raise TokenVerificationError('wrong_issuer', 'Token was issued for another API key')
+        audience = claims.get('aud')
+        if audience != 'livekit' and not (isinstance(audience, list) and 'livekit' in audience):
+            raise TokenVerificationError('wrong_audience', 'Token audience is not livekit')
+        
+        expires_at = claims.get('exp')
+        if not isinstance(expires_at, (int, float)) or isinstance(expires_at, bool):
+            raise TokenVerificationError('malformed', 'Token has no exp claim')
+        if expires_at <= now - self.leeway:
+            raise TokenVerificationError('expired', 'Token has expired')
+        not_before = claims.get('nbf')
+        if isinstance(not_before, (int, float)) and not_before > now + self.leeway:
+            raise TokenVerificationError('not_yet_valid', 'Token is not valid yet')
+        
+        if signing_key is not None:
+            issued_at = claims.get('iat', not_before)
+            if isinstance(issued_at, (int, float)) and not (
+                signing_key.not_before - self.leeway <= issued_at < signing_key.not_after + self.leeway
+            ):
+                raise TokenVerificationError('retired_key', 'Token was issued outside of the signing key validity window')
+        
+        return claims
+    
+    @staticmethod
+    def _decode_claims(payload: bytes) -> Dict[str, Any]:
+        try:
+            claims = json.loads(_b64url_decode(payload))
+        except ValueError:
+            raise TokenVerificationError('malformed', 'Invalid token payload')
+        if not isinstance(claims, dict):
+            raise TokenVerificationError('malformed', 'Token payload must be an object')
+        return claims
+    
+    @staticmethod
+    def _check_room(claims: Dict[str, Any], room_name: Optional[str]) -> Dict[str, Any]:
+        if room_name is not None:
+            # Токены TokenMinter несут room на верхнем уровне, токены LiveKit SDK - в video grant
+            video = claims.get('video')
+            room = claims.get('room', video.get('room') if isinstance(video, dict) else None)
+            if room != room_name:
+                raise TokenVerificationError('wrong_room', 'Token does not grant access to this room')
+        return claims
+    
+    def introspect(self, token: str, room_name: Optional[str] = None, now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Ответ в духе RFC 7662: {"active": true, ...claims} для действующего
+        токена, {"active": false, "error": reason} для любого другого.
+        """
+        try:
+            claims = self.verify(token, room_name, now)
+        except TokenVerificationError as e:
+            return {'active': False, 'error': e.reason}
+        claims['active'] = True
+        return claims
+    
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Размер кеша проверенных токенов, попадания и промахи"""
+        with self._lock:
             return {
-                'statusCode': 500,
-                'headers': {
-                    'Access-Control-Allow-Origin': '*',
-                    'Content-Type': 'application/json'
-                },
-                'body': json.dumps({'error': 'Missing LiveKit credentials'})
+                'size': len(self._cache),
+                'max_size': self.cache_size,
+                'hits': self.hits,
+                'misses': self.misses
             }
+
+_verifier: Optional[TokenVerifier] = None
+
+def get_verifier() -> Optional[TokenVerifier]:
+    """Возвращает общий для процесса верификатор (None, пока нет кредов)"""
+    global _verifier
+    if _verifier is None:
+        _verifier = TokenVerifier.from_env()
+    return _verifier
+
+def verify_livekit_token(token: str, room_name: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Проверяет токен кредами из окружения и возвращает его claims.
+    Бросает TokenVerificationError, если токен недействителен.
+    """
+    verifier = get_verifier()
+    if verifier is None:
+        raise RuntimeError('Missing LiveKit credentials')
+    return verifier.verify(token, room_name)
+
+class TokenCache:
+    """
+    In-process LRU+TTL кеш выпущенных токенов по ключу (room, participant, профиль прав, ttl, kid).
+    
+    ttl входит в ключ: запрос короткоживущего токена не получит закешированный
+    токен с большим сроком. kid ключа подписи - тоже: когда keyring переходит
+    на следующий ключ по окну действия (без изменения файла), токены прежнего
+    ключа больше не отдаются. Токен отдается повторно, пока у него остается
+    больше min_remaining от запрошенного ttl. Размер ограничен max_size: при переполнении
+    вытесняется давно не использованная запись.
+    """
+    
+    def __init__(self, max_size: int = 10000, min_remaining: float = 0.5):
+        self.max_size = max_size
+        self.min_remaining = min_remaining
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: 'OrderedDict[tuple, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def from_env(cls) -> Optional['TokenCache']:
+        """Создает кеш из окружения, None если кеш выключен (LIVEKIT_TOKEN_CACHE_SIZE=0)"""
+        max_size = int(os.getenv('LIVEKIT_TOKEN_CACHE_SIZE', '10000'))
+        if max_size <= 0:
+            return None
+        return cls(max_size, float(os.getenv('LIVEKIT_TOKEN_CACHE_MIN_REMAINING', '0.5')))
+    
+    def get(
+        self,
+        room_name: str,
+        participant_name: str,
+        ttl: int,
+        now: int,
+        profile: str = 'default',
+        kid: Optional[str] = None
+    ) -> Optional[str]:
+        """Возвращает закешированный токен с тем же ttl и kid, если у него осталось достаточно времени жизни"""
+        key = (room_name, participant_name, profile, ttl, kid)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                token, expires_at = entry
+                if expires_at - now > self.min_remaining * ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return token
+                # Токен слишком близок к истечению: дальше он не пригодится
+                del self._entries[key]
+            self.misses += 1
+            return None
+    
+    def put(
+        self,
+        room_name: str,
+        participant_name: str,
+        ttl: int,
+        token: str,
+        expires_at: int,
+        profile: str = 'default',
+        kid: Optional[str] = None
+    ):
+        """Сохраняет токен, выпущенный с ttl ключом kid, вытесняя самые старые записи при переполнении"""
+        key = (room_name, participant_name, profile, ttl, kid)
+        with self._lock:
+            self._entries[key] = (token, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики попаданий, промахов и вытеснений"""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+_token_cache: Optional[TokenCache] = None
+_token_cache_loaded = False
+
+def get_token_cache() -> Optional[TokenCache]:
+    """Возвращает общий для процесса кеш токенов (None, если он выключен)"""
+    global _token_cache, _token_cache_loaded
+    if not _token_cache_loaded:
+        _token_cache = TokenCache.from_env()
+        _token_cache_loaded = True
+    return _token_cache
+
+def _clear_token_cache():
+    if _token_cache is not None:
+        _token_cache.clear()
+
+# Квоты выпуска токенов: скользящее окно по источнику запроса (Origin или адрес
+# клиента) и по комнате. Лимиты задаются как "запросов/секунд", например "600/60".
+
+class RateLimitResult:
+    """Результат проверки квоты: разрешено ли, лимит, остаток и время до сброса (секунды)"""
+    
+    __slots__ = ('allowed', 'limit', 'remaining', 'reset_after')
+    
+    def __init__(self, allowed: bool, limit: int, remaining: int, reset_after: float):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.reset_after = reset_after
+    
+    @property
+    def reset_seconds(self) -> int:
+        """reset_after, округленное вверх до целых секунд"""
+        reset_after = self.reset_after
+        seconds = int(reset_after)
+        return seconds + 1 if seconds < reset_after else max(0, seconds)
+    
+    def headers(self) -> Tuple[Tuple[str, str], ...]:
+        """Заголовки X-RateLimit-* (и Retry-After при отказе)"""
+        reset = str(self.reset_seconds)
+        if self.allowed:
+            return (
+                ('X-RateLimit-Limit', str(self.limit)),
+                ('X-RateLimit-Remaining', str(self.remaining)),
+                ('X-RateLimit-Reset', reset),
+                _RATE_LIMIT_EXPOSE_HEADER,
+            )
+        return (
+            ('X-RateLimit-Limit', str(self.limit)),
+            ('X-RateLimit-Remaining', str(max(0, self.remaining))),
+            ('X-RateLimit-Reset', reset),
+            ('Retry-After', reset),
+            _RATE_LIMIT_EXPOSE_HEADER,
+        )
+
+# Браузер отдает скрипту виджета только явно перечисленные заголовки ответа
+_RATE_LIMIT_EXPOSE_HEADER = (
+    'Access-Control-Expose-Headers', 'X-RateLimit-Limit, X-RateLimit-Remaining, X-RateLimit-Reset, Retry-After'
+)
+
+class _Window:
+    """Кольцо счетчиков одного ключа: counts[slot % len(counts)] и их сумма"""
+    
+    __slots__ = ('slot', 'total', 'counts')
+    
+    def __init__(self, buckets: int, slot: int):
+        self.slot = slot
+        self.total = 0
+        self.counts = [0] * buckets
+
+class LocalRateLimitBackend:
+    """
+    Хранилище скользящих окон в памяти процесса.
+    
+    Окно window секунд делится на buckets корзин; у каждого ключа кольцо из
+    buckets + 1 счетчиков (текущая неполная корзина и buckets полных перед
+    ней, так что запрос учитывается не меньше window секунд и лимит не
+    превышается ни в каком окне). Запрос сдвигает кольцо до текущей корзины,
+    обнуляя устаревшие, и прибавляет cost - O(1) на запрос. Число ключей
+    ограничено max_keys: давно не использованные вытесняются.
+    
+    Общий интерфейс бэкендов - метод hit(); бэкенд с общим для нескольких
+    инстансов хранилищем (Redis и т.п.) реализует тот же метод и подключается
+    через LIVEKIT_RATE_LIMIT_BACKEND.
+    """
+    
+    def __init__(self, buckets: int = 10, max_keys: int = 100000):
+        self.buckets = buckets
+        self.max_keys = max_keys
+        self._size = buckets + 1
+        self._windows: 'OrderedDict[str, _Window]' = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def hit(self, key: str, cost: int, limit: int, window: float, now: float) -> RateLimitResult:
+        """
+        Учитывает cost запросов по ключу, если они укладываются в limit за
+        последние window секунд; при отказе счетчики не меняются.
+        """
+        size = self._size
+        width = window / self.buckets
+        slot = int(now // width)
+        with self._lock:
+            entry = self._windows.get(key)
+            if entry is None:
+                entry = self._windows[key] = _Window(size, slot)
+                if len(self._windows) > self.max_keys:
+                    self._windows.popitem(last=False)
+            else:
+                self._windows.move_to_end(key)
+                gap = slot - entry.slot
+                if gap > 0:
+                    counts = entry.counts
+                    if gap >= size:
+                        entry.counts = [0] * size
+                        entry.total = 0
+                    else:
+                        for expired in range(entry.slot + 1, slot + 1):
+                            index = expired % size
+                            entry.total -= counts[index]
+                            counts[index] = 0
+                    entry.slot = slot
+                elif gap < 0:
+                    # Часы инстансов с общим хранилищем чуть расходятся: считаем в последнюю корзину
+                    slot = entry.slot
+            
+            if entry.total + cost <= limit:
+                entry.counts[slot % size] += cost
+                entry.total += cost
+                # Полностью квота восстановится, когда из кольца выйдет текущая корзина
+                return RateLimitResult(True, limit, limit - entry.total, (slot + size) * width - now)
+            return RateLimitResult(False, limit, limit - entry.total, self._retry_after(entry, cost, limit, width, now))
+    
+    def _retry_after(self, entry: _Window, cost: int, limit: int, width: float, now: float) -> float:
+        """Через сколько секунд из окна выйдет достаточно старых запросов для cost новых"""
+        size = self._size
+        freed = 0
+        for age in range(size - 1, -1, -1):
+            slot = entry.slot - age
+            freed += entry.counts[slot % size]
+            if entry.total - freed + cost <= limit:
+                return (slot + size) * width - now
+        # cost больше самого лимита: такой запрос не пройдет никогда
+        return size * width
+    
+    def clear(self):
+        with self._lock:
+            self._windows.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'keys': len(self._windows), 'max_keys': self.max_keys}
+
+def _parse_limit(value: str) -> Optional[Tuple[int, float]]:
+    """ "600/60" -> (600, 60.0); пусто или "0" - без лимита"""
+    value = value.strip()
+    if not value or value == '0':
+        return None
+    count, _, window = value.partition('/')
+    return int(count), float(window or 60)
+
+class TokenRateLimiter:
+    """
+    Квоты выпуска токенов по источнику (origin_limit) и по комнате (room_limit),
+    каждая - (запросов, окно в секундах) или None. Запрос проходит, если
+    укладывается во все квоты; запрос, отклоненный квотой комнаты, уже учтен
+    в квоте источника (злоупотребляющий источник расходует свою квоту и отказами).
+    """
+    
+    def __init__(
+        self,
+        origin_limit: Optional[Tuple[int, float]] = None,
+        room_limit: Optional[Tuple[int, float]] = None,
+        backend: Any = None
+    ):
+        self.origin_limit = origin_limit
+        self.room_limit = room_limit
+        self.backend = backend if backend is not None else LocalRateLimitBackend()
+        self.rejected = 0
+    
+    @classmethod
+    def from_env(cls) -> Optional['TokenRateLimiter']:
+        """
+        Создает лимитер из окружения, None если квоты не заданы:
+        LIVEKIT_RATE_LIMIT_ORIGIN, LIVEKIT_RATE_LIMIT_ROOM ("запросов/секунд"),
+        LIVEKIT_RATE_LIMIT_BACKEND ("модуль:фабрика" общего хранилища).
+        """
+        origin_limit = _parse_limit(os.getenv('LIVEKIT_RATE_LIMIT_ORIGIN', ''))
+        room_limit = _parse_limit(os.getenv('LIVEKIT_RATE_LIMIT_ROOM', ''))
+        if origin_limit is None and room_limit is None:
+            return None
+        
+        backend_path = os.getenv('LIVEKIT_RATE_LIMIT_BACKEND', '')
+        if backend_path:
+            import importlib
+            
+            module_name, _, factory = backend_path.partition(':')
+            backend = getattr(importlib.import_module(module_name), factory or 'create_backend')()
+        else:
+            backend = LocalRateLimitBackend(max_keys=int(os.getenv('LIVEKIT_RATE_LIMIT_MAX_KEYS', '100000')))
+        return cls(origin_limit, room_limit, backend)
+    
+    def check(
+        self,
+        origin: Optional[str],
+        room_name: Optional[str],
+        cost: int = 1,
+        now: Optional[float] = None
+    ) -> Optional[RateLimitResult]:
+        """
+        Учитывает cost запросов от origin в комнату room_name (None - не проверять
+        эту квоту). Возвращает отказ или самый строгий из результатов; None, если
+        ни одна квота не применялась.
+        """
+        if now is None:
+            now = time.time()
+        result = None
+        if origin is not None and self.origin_limit is not None:
+            limit, window = self.origin_limit
+            result = self.backend.hit('o:' + origin, cost, limit, window, now)
+            if not result.allowed:
+                self.rejected += 1
+                return result
+        if room_name is not None and self.room_limit is not None:
+            limit, window = self.room_limit
+            room_result = self.backend.hit('r:' + room_name, cost, limit, window, now)
+            if not room_result.allowed:
+                self.rejected += 1
+                return room_result
+            if result is None or room_result.remaining < result.remaining:
+                result = room_result
+        return result
+
+_rate_limiter: Optional[TokenRateLimiter] = None
+_rate_limiter_loaded = False
+
+def get_rate_limiter() -> Optional[TokenRateLimiter]:
+    """Возвращает общий для процесса лимитер (None, если квоты не заданы)"""
+    global _rate_limiter, _rate_limiter_loaded
+    if not _rate_limiter_loaded:
+        _rate_limiter = TokenRateLimiter.from_env()
+        _rate_limiter_loaded = True
+    return _rate_limiter
+
+def issue_token(
+    minter: TokenMinter,
+    room_name: str,
+    participant_name: str,
+    ttl: Optional[int] = None,
+    use_cache: bool = True,
+    grants: Optional[GrantProfile] = None
+) -> str:
+    """
+    Выдает токен участнику: повторно использует свежий токен из кеша
+    или выпускает новый через минтер.
+    
+    Args:
+        minter: Минтер токенов
+        room_name: Название комнаты
+        participant_name: Имя участника
+        ttl: Время жизни нового токена в секундах, по умолчанию ttl профиля
+        use_cache: False, чтобы обойти кеш для этого запроса
+        grants: Профиль прав, по умолчанию DEFAULT_GRANT_PROFILE
+    """
+    if grants is None:
+        grants = DEFAULT_GRANT_PROFILE
+    if ttl is None:
+        ttl = grants.ttl
+    now = int(time.time())
+    cache = get_token_cache() if use_cache else None
+    
+    if cache is not None:
+        token = cache.get(room_name, participant_name, ttl, now, grants.name, minter.kid)
+        if token is not None:
+            return token
+    
+    if _stage_hooks:
+        started = time.perf_counter()
+        token = minter.mint(room_name, participant_name, ttl=ttl, now=now, grants=grants)
+        record_stage('sign', started)
+    else:
+        token = minter.mint(room_name, participant_name, ttl=ttl, now=now, grants=grants)
+    
+    if cache is not None:
+        cache.put(room_name, participant_name, ttl, token, now + ttl, grants.name, minter.kid)
+    
+    return token
+
+def _no_cache_requested(request_data: Any) -> bool:
+    """Запрос просит обойти кеш токенов ("noCache": true)"""
+    return isinstance(request_data, dict) and bool(request_data.get('noCache'))
+
+def batch_entries(request_data: Any) -> Optional[List[Any]]:
+    """
+    Возвращает записи пакетного запроса или None для одиночного.
+    Пакет — это JSON-массив или объект с ключом "batch".
+    """
+    if isinstance(request_data, list):
+        return request_data
+    if isinstance(request_data, dict) and isinstance(request_data.get('batch'), list):
+        return request_data['batch']
+    return None
+
+# Имя комнаты или участника: 1..MAX_NAME_BYTES байт UTF-8 без управляющих символов
+_NAME_RE = re.compile('[^\x00-\x1f\x7f]+')
+
+def name_error(field: str, value: Any) -> Optional[str]:
+    """Возвращает текст ошибки, если value не подходит как roomName/participantName"""
+    if not isinstance(value, str) or not value:
+        return f'{field} must be a non-empty string'
+    if len(value) > MAX_NAME_BYTES or len(value.encode('utf-8')) > MAX_NAME_BYTES:
+        return f'{field} must be at most {MAX_NAME_BYTES} bytes'
+    if not _NAME_RE.fullmatch(value):
+        return f'{field} must not contain control characters'
+    return None
+
+# Быстрый путь для типичного одиночного запроса {"roomName": "...", "participantName": "..."}
+# (поля в любом порядке, любое может отсутствовать): регулярное выражение по байтам тела
+# проверяет схему, длину и набор символов без json.loads и промежуточного dict.
+# Строки с escape-последовательностями, лишние поля и пакеты идут общим путем через json.
+_FAST_WS = rb'[ \t\r\n]*'
+_FAST_FIELD = rb'"(roomName|participantName)"' + _FAST_WS + rb':' + _FAST_WS + (
+    rb'"([^"\\\x00-\x1f\x7f]{1,%d})"' % MAX_NAME_BYTES
+)
+_FAST_BODY_RE = re.compile(
+    _FAST_WS + rb'\{' + _FAST_WS
+    + rb'(?:' + _FAST_FIELD + _FAST_WS + rb'(?:,' + _FAST_WS + _FAST_FIELD + _FAST_WS + rb')?)?'
+    + rb'\}' + _FAST_WS
+)
+
+def parse_fast_body(body: bytes) -> Optional[Tuple[Optional[str], Optional[str]]]:
+    """
+    Разбирает тело одиночного запроса быстрым путем.
+    Возвращает (roomName, participantName) (None для отсутствующего поля)
+    или None, если тело нужно разбирать общим путем.
+    """
+    match = _FAST_BODY_RE.fullmatch(body)
+    if match is None:
+        return None
+    first_key, first, second_key, second = match.groups()
+    if first_key is not None and first_key == second_key:
+        # Повторяющийся ключ: пусть решает json.loads (побеждает последнее значение)
+        return None
+    if first_key == b'participantName':
+        first, second = second, first
+    try:
+        return (
+            first.decode('utf-8') if first is not None else None,
+            second.decode('utf-8') if second is not None else None,
+        )
+    except UnicodeDecodeError:
+        return None
+
+def _issue_batch_entry(
+    minter: TokenMinter,
+    entry: Any,
+    index: int,
+    use_cache: bool,
+    limiter: Optional[TokenRateLimiter] = None
+) -> Dict[str, Any]:
+    """Выпускает токен для одной записи пакета; ошибки возвращаются в самой записи"""
+    if not isinstance(entry, dict):
+        return {'index': index, 'error': 'Entry must be an object'}
+    
+    room_name = entry.get('roomName', 'default-room')
+    participant_name = entry.get('participantName', f'user-{int(time.time())}-{index}')
+    
+    error = name_error('roomName', room_name) or name_error('participantName', participant_name)
+    if error:
+        return {'index': index, 'error': error}
+    try:
+        grants = get_grant_profiles().resolve(room_name, entry.get('profile'))
+    except ValueError as e:
+        return {'index': index, 'error': str(e)}
+    ttl = entry.get('ttl', grants.ttl)
+    if not isinstance(ttl, int) or isinstance(ttl, bool) or not 0 < ttl <= grants.max_ttl:
+        return {'index': index, 'error': f'ttl must be an integer between 1 and {grants.max_ttl}'}
+    if limiter is not None:
+        # Квота источника списана за весь пакет, здесь - квота комнаты.
+        # Проверяется после валидации, чтобы невалидные записи ее не расходовали
+        limited = limiter.check(None, room_name)
+        if limited is not None and not limited.allowed:
+            return {'index': index, 'error': 'Rate limit exceeded for room', 'retryAfter': limited.reset_seconds}
+    
+    try:
+        token = issue_token(minter, room_name, participant_name, ttl=ttl, use_cache=use_cache, grants=grants)
+    except Exception as e:
+        return {'index': index, 'error': f'Error generating token: {str(e)}'}
+    
+    return {
+        'index': index,
+        'roomName': room_name,
+        'participantName': participant_name,
+        'token': token
+    }
+
+def iter_batch_response(
+    minter: TokenMinter,
+    entries: List[Any],
+    use_cache: bool = True,
+    limiter: Optional[TokenRateLimiter] = None
+) -> Iterator[bytes]:
+    """
+    Потоково сериализует ответ на пакетный запрос:
+    {"url": ..., "results": [{"index": 0, "token": ...}, {"index": 1, "error": ...}, ...]}
+    
+    Каждая запись кодируется сразу после выпуска токена, поэтому весь
+    ответ никогда не собирается в одну большую строку.
+    """
+    yield b'{"url": ' + json.dumps(minter.url).encode('utf-8') + b', "results": ['
+    for index, entry in enumerate(entries):
+        result = json.dumps(_issue_batch_entry(minter, entry, index, use_cache, limiter)).encode('utf-8')
+        yield result if index == 0 else b', ' + result
+    yield b']}'
+
+# Единый конвейер обработки запроса, не зависящий от транспорта.
+# TokenHandler и Vercel handler — тонкие адаптеры поверх process_token_request.
+
+# Заголовки ответов собраны заранее и не меняются от запроса к запросу
+_CORS_HEADERS = (
+    ('Access-Control-Allow-Origin', '*'),
+    ('Access-Control-Allow-Methods', 'POST, OPTIONS'),
+    ('Access-Control-Allow-Headers', 'Content-Type'),
+)
+_JSON_HEADERS = (('Content-Type', 'application/json'),) + _CORS_HEADERS
+
+# Хуки замера стадий: hook(stage, seconds). Пока хуков нет, время не замеряется
+_stage_hooks: List[Callable[[str, float], None]] = []
+
+def add_stage_hook(hook: Callable[[str, float], None]):
+    """
+    Подписывает hook(stage, seconds) на длительности стадий обработки запроса:
+    read и write (транспорт), parse, mint, serialize (конвейер) и sign
+    (подпись нового токена внутри mint; не вызывается при попадании в кеш).
+    """
+    _stage_hooks.append(hook)
+
+def remove_stage_hook(hook: Callable[[str, float], None]):
+    _stage_hooks.remove(hook)
+
+def record_stage(stage: str, started: float) -> float:
+    """Сообщает хукам длительность стадии и возвращает момент ее окончания"""
+    now = time.perf_counter()
+    for hook in _stage_hooks:
+        hook(stage, now - started)
+    return now
+
+class TokenResponse:
+    """Ответ конвейера: статус, заголовки и тело (bytes) либо итератор чанков"""
+    
+    __slots__ = ('status', 'headers', 'body', 'chunks')
+    
+    def __init__(
+        self,
+        status: int,
+        headers: Tuple[Tuple[str, str], ...],
+        body: bytes = b'',
+        chunks: Optional[Iterator[bytes]] = None
+    ):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.chunks = chunks
+    
+    def read_body(self) -> bytes:
+        """Тело целиком (потоковый ответ собирается в память)"""
+        if self.chunks is not None:
+            return b''.join(self.chunks)
+        return self.body
+
+def _error_response(status: int, message: str) -> TokenResponse:
+    return TokenResponse(status, _JSON_HEADERS, json.dumps({'error': message}).encode('utf-8'))
+
+_OPTIONS_RESPONSE = TokenResponse(200, _CORS_HEADERS)
+_METHOD_NOT_ALLOWED = _error_response(405, 'Method not allowed')
+_MISSING_CREDENTIALS = _error_response(500, 'Missing LiveKit credentials')
+_INVALID_JSON = _error_response(400, 'Invalid JSON body')
+_INVALID_BODY = _error_response(400, 'Request body must be a JSON object or array')
+_RATE_LIMITED = _error_response(429, 'Rate limit exceeded')
+_BODY_TOO_LARGE = _error_response(413, f'Request body is too large (max {MAX_BODY_SIZE} bytes)')
+
+def process_token_request(
+    method: str,
+    body: Any = None,
+    no_cache: bool = False,
+    origin: Optional[str] = None
+) -> TokenResponse:
+    """
+    Обрабатывает запрос на выпуск токена независимо от транспорта.
+    
+    Args:
+        method: HTTP метод
+        body: Тело запроса: bytes/str с JSON или уже разобранные dict/list
+        no_cache: Обойти кеш токенов (например, по Cache-Control: no-cache)
+        origin: Источник для квоты (заголовок Origin или адрес клиента), None - без квоты источника
+    
+    Returns:
+        TokenResponse; большие пакеты возвращаются потоком чанков
+    """
+    if method == 'OPTIONS':
+        return _OPTIONS_RESPONSE
+    if method != 'POST':
+        return _METHOD_NOT_ALLOWED
+    
+    started = time.perf_counter() if _stage_hooks else 0.0
+    
+    try:
+        # Креды читаются из окружения один раз и кешируются в минтере
+        minter = get_minter()
+        if minter is None:
+            return _MISSING_CREDENTIALS
         
         # Парсим тело запроса
-        body = request.get('body', '{}')
-        if isinstance(body, str):
-            request_data = json.loads(body) if body else {}
+        fast = None
+        if isinstance(body, (bytes, str)):
+            if isinstance(body, str):
+                body = body.encode('utf-8', 'surrogatepass')
+            if len(body) > MAX_BODY_SIZE:
+                return _BODY_TOO_LARGE
+            fast = parse_fast_body(body) if body else None
+            if fast is not None:
+                request_data = None
+            else:
+                try:
+                    request_data = json.loads(body) if body else {}
+                except (ValueError, RecursionError):
+                    # RecursionError: глубоко вложенные массивы/объекты
+                    return _INVALID_JSON
         else:
-            request_data = body
+            request_data = body if body is not None else {}
         
-        # Извлекаем параметры
+        if started:
+            started = record_stage('parse', started)
+        
+        limiter = get_rate_limiter()
+        
+        if fast is not None:
+            room_name, participant_name = fast
+            return _single_token_response(
+                minter,
+                room_name if room_name is not None else 'default-room',
+                participant_name if participant_name is not None else f'user-{int(time.time())}',
+                not no_cache,
+                started,
+                limiter,
+                origin
+            )
+        
+        use_cache = not no_cache and not _no_cache_requested(request_data)
+        
+        # Пакетный режим: массив записей вместо одной
+        entries = batch_entries(request_data)
+        if entries is not None:
+            if len(entries) > BATCH_MAX_SIZE:
+                return _error_response(400, f'Batch is too large (max {BATCH_MAX_SIZE} entries)')
+            headers = _JSON_HEADERS
+            if limiter is not None:
+                # Пакет из N записей расходует N единиц квоты источника
+                limited = limiter.check(origin, None, cost=max(1, len(entries)))
+                if limited is not None:
+                    if not limited.allowed:
+                        return _rate_limited_response(limited)
+                    headers = _JSON_HEADERS + limited.headers()
+            chunks = iter_batch_response(minter, entries, use_cache=use_cache, limiter=limiter)
+            if len(entries) < BATCH_STREAM_THRESHOLD:
+                return TokenResponse(200, headers, b''.join(chunks))
+            return TokenResponse(200, headers, chunks=chunks)
+        
+        if not isinstance(request_data, dict):
+            return _INVALID_BODY
+        
+        # Извлекаем и проверяем параметры
         room_name = request_data.get('roomName', 'default-room')
         participant_name = request_data.get('participantName', f'user-{int(time.time())}')
+        error = name_error('roomName', room_name) or name_error('participantName', participant_name)
+        if error:
+            return _error_response(400, error)
         
-        # Генерируем токен
-        token = generate_livekit_token(
-            api_key=api_key,
-            api_secret=api_secret,
-            room_name=room_name,
-            participant_name=participant_name
+        return _single_token_response(
+            minter, room_name, participant_name, use_cache, started, limiter, origin, request_data.get('profile')
         )
         
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Content-Type': 'application/json'
-            },
-            'body': json.dumps({
-                'token': token,
-                'url': os.getenv('LIVEKIT_URL', 'wss://your-project.livekit.cloud')
-            })
-        }
+    except Exception as e:
+        return _error_response(500, f'Error generating token: {str(e)}')
+
+def _rate_limited_response(result: RateLimitResult) -> TokenResponse:
+    return TokenResponse(429, _RATE_LIMITED.headers + result.headers(), _RATE_LIMITED.body)
+
+def _single_token_response(
+    minter: TokenMinter,
+    room_name: str,
+    participant_name: str,
+    use_cache: bool,
+    started: float,
+    limiter: Optional[TokenRateLimiter] = None,
+    origin: Optional[str] = None,
+    profile: Any = None
+) -> TokenResponse:
+    try:
+        grants = get_grant_profiles().resolve(room_name, profile)
+    except ValueError as e:
+        return _error_response(400, str(e))
+    
+    headers = _JSON_HEADERS
+    if limiter is not None:
+        limited = limiter.check(origin, room_name)
+        if limited is not None:
+            if not limited.allowed:
+                return _rate_limited_response(limited)
+            headers = _JSON_HEADERS + limited.headers()
+    
+    # Генерируем токен (или переиспользуем свежий из кеша)
+    token = issue_token(minter, room_name, participant_name, use_cache=use_cache, grants=grants)
+    
+    if started:
+        started = record_stage('mint', started)
+    
+    # Токен — ASCII без кавычек, поэтому вставляется в готовый шаблон без экранирования
+    payload = b'{"token": "' + token.encode('ascii') + minter.response_suffix
+    
+    if started:
+        record_stage('serialize', started)
+    
+    return TokenResponse(200, headers, payload)
+
+def process_verify_request(method: str, body: Any = None) -> TokenResponse:
+    """
+    Проверка токена (introspection) независимо от транспорта.
+    Тело: {"token": "...", "roomName": "..."} (roomName необязателен).
+    Ответ 200: {"active": true, ...claims} или {"active": false, "error": reason}.
+    """
+    if method == 'OPTIONS':
+        return _OPTIONS_RESPONSE
+    if method != 'POST':
+        return _METHOD_NOT_ALLOWED
+    
+    try:
+        verifier = get_verifier()
+        if verifier is None:
+            return _MISSING_CREDENTIALS
+        
+        if isinstance(body, (bytes, str)):
+            # Предел - в байтах, как у выпуска токенов
+            if isinstance(body, str):
+                body = body.encode('utf-8', 'surrogatepass')
+            if len(body) > MAX_BODY_SIZE:
+                return _BODY_TOO_LARGE
+            try:
+                request_data = json.loads(body) if body else {}
+            except (ValueError, RecursionError):
+                return _INVALID_JSON
+        else:
+            request_data = body if body is not None else {}
+        
+        if not isinstance(request_data, dict) or not isinstance(request_data.get('token'), str):
+            return _error_response(400, 'token must be a string')
+        room_name = request_data.get('roomName')
+        if room_name is not None and not isinstance(room_name, str):
+            return _error_response(400, 'roomName must be a string')
         
+        result = verifier.introspect(request_data['token'], room_name)
+        return TokenResponse(200, _JSON_HEADERS, json.dumps(result).encode('utf-8'))
+    
     except Exception as e:
+        return _error_response(500, f'Error verifying token: {str(e)}')
+
+def is_verify_path(path: str) -> bool:
+    """Запрос к проверке токена: путь .../verify или ?action=verify"""
+    path, _, query = path.partition('?')
+    return path.rstrip('/').endswith('/verify') or 'action=verify' in query.split('&')
+
+# Метрики эндпоинта токенов
+
+# Границы бакетов гистограмм: длительности стадий в секундах и размеры тел в байтах
+LATENCY_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5
+)
+SIZE_BUCKETS = (64, 128, 256, 512, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+_METRICS_HEADERS = (('Content-Type', 'text/plain; version=0.0.4; charset=utf-8'),)
+
+class Histogram:
+    """Гистограмма с фиксированными бакетами: счетчики по бакетам, сумма и число наблюдений"""
+    
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+    
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+    
+    def render(self, name: str, labels: str = '') -> List[str]:
+        """Строки в формате Prometheus: кумулятивные _bucket, _sum и _count"""
+        prefix = labels + ',' if labels else ''
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {self.count}')
+        suffix = '{' + labels + '}' if labels else ''
+        lines.append(f'{name}_sum{suffix} {self.sum:.9g}')
+        lines.append(f'{name}_count{suffix} {self.count}')
+        return lines
+
+class _MetricsShard:
+    """Метрики одного потока: пишутся без локов, суммируются при выдаче"""
+    
+    __slots__ = ('requests_by_status', 'stages', 'signing', 'request_size', 'in_flight', 'in_flight_bytes')
+    
+    def __init__(self):
+        self.requests_by_status: Dict[int, int] = {}
+        self.stages: Dict[str, Histogram] = {}
+        self.signing = Histogram(LATENCY_BUCKETS)
+        self.request_size = Histogram(SIZE_BUCKETS)
+        self.in_flight = 0
+        self.in_flight_bytes = 0
+
+class TokenMetrics:
+    """
+    Метрики эндпоинта токенов: счетчик запросов по статусам, гистограммы
+    стадий и подписи, размеры тел запросов, запросы и байты в обработке.
+    
+    Каждый поток пишет в свой шард без локов, поэтому запись — несколько
+    сложений и bisect, и метрики можно держать включенными в продакшене.
+    Шарды суммируются только при выдаче: render() (Prometheus) и snapshot() (dict).
+    """
+    
+    def __init__(self):
+        self._shards: List[_MetricsShard] = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+    
+    def _shard(self) -> _MetricsShard:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = _MetricsShard()
+            with self._lock:
+                self._shards.append(shard)
+            return shard
+    
+    def observe_stage(self, stage: str, seconds: float):
+        """Хук для add_stage_hook"""
+        shard = self._shard()
+        if stage == 'sign':
+            histogram = shard.signing
+        else:
+            histogram = shard.stages.get(stage)
+            if histogram is None:
+                histogram = shard.stages[stage] = Histogram(LATENCY_BUCKETS)
+        histogram.counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        histogram.sum += seconds
+        histogram.count += 1
+    
+    def request_started(self, size: int):
+        shard = self._shard()
+        shard.in_flight += 1
+        shard.in_flight_bytes += size
+        histogram = shard.request_size
+        histogram.counts[bisect_left(SIZE_BUCKETS, size)] += 1
+        histogram.sum += size
+        histogram.count += 1
+    
+    def request_finished(self, size: int, status: int):
+        shard = self._shard()
+        shard.in_flight -= 1
+        shard.in_flight_bytes -= size
+        statuses = shard.requests_by_status
+        statuses[status] = statuses.get(status, 0) + 1
+    
+    def _merge(self) -> _MetricsShard:
+        """Сумма всех шардов (значения могут отставать на запрос, идущий прямо сейчас)"""
+        total = _MetricsShard()
+        with self._lock:
+            shards = list(self._shards)
+        
+        def add(target: Histogram, source: Histogram):
+            for i, count in enumerate(source.counts):
+                target.counts[i] += count
+            target.sum += source.sum
+            target.count += source.count
+        
+        for shard in shards:
+            for status, count in list(shard.requests_by_status.items()):
+                total.requests_by_status[status] = total.requests_by_status.get(status, 0) + count
+            for stage, histogram in list(shard.stages.items()):
+                add(total.stages.setdefault(stage, Histogram(LATENCY_BUCKETS)), histogram)
+            add(total.signing, shard.signing)
+            add(total.request_size, shard.request_size)
+            total.in_flight += shard.in_flight
+            total.in_flight_bytes += shard.in_flight_bytes
+        return total
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Текущие значения метрик в виде словаря"""
+        def summary(histogram: Histogram) -> Dict[str, Any]:
+            return {'count': histogram.count, 'sum': histogram.sum, 'buckets': list(histogram.counts)}
+        
+        total = self._merge()
         return {
-            'statusCode': 500,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Content-Type': 'application/json'
-            },
-            'body': json.dumps({'error': f'Error generating token: {str(e)}'})
-        } 
\ No newline at end of file
+            'requests_by_status': total.requests_by_status,
+            'in_flight': total.in_flight,
+            'in_flight_bytes': total.in_flight_bytes,
+            'request_size_bytes': summary(total.request_size),
+            'signing_seconds': summary(total.signing),
+            'stage_seconds': {stage: summary(h) for stage, h in total.stages.items()}
+        }
+    
+    def render(self) -> str:
+        """Метрики в текстовом формате Prometheus"""
+        total = self._merge()
+        
+        lines = ['# TYPE livekit_token_requests_total counter']
+        for status, count in sorted(total.requests_by_status.items()):
+            lines.append(f'livekit_token_requests_total{{status="{status}"}} {count}')
+        
+        lines.append('# TYPE livekit_token_requests_in_flight gauge')
+        lines.append(f'livekit_token_requests_in_flight {total.in_flight}')
+        lines.append('# TYPE livekit_token_in_flight_bytes gauge')
+        lines.append(f'livekit_token_in_flight_bytes {total.in_flight_bytes}')
+        
+        lines.append('# TYPE livekit_token_request_size_bytes histogram')
+        lines.extend(total.request_size.render('livekit_token_request_size_bytes'))
+        
+        lines.append('# TYPE livekit_token_signing_seconds histogram')
+        lines.extend(total.signing.render('livekit_token_signing_seconds'))
+        
+        lines.append('# TYPE livekit_token_stage_seconds histogram')
+        for stage, histogram in sorted(total.stages.items()):
+            lines.extend(histogram.render('livekit_token_stage_seconds', f'stage="{stage}"'))
+        
+        cache = get_token_cache()
+        if cache is not None:
+            stats = cache.stats()
+            for key in ('hits', 'misses', 'evictions'):
+                lines.append(f'# TYPE livekit_token_cache_{key}_total counter')
+                lines.append(f'livekit_token_cache_{key}_total {stats[key]}')
+        
+        return '\n'.join(lines) + '\n'
+
+def _create_metrics() -> Optional[TokenMetrics]:
+    """Метрики включены по умолчанию; TOKEN_METRICS=0 выключает их"""
+    if os.getenv('TOKEN_METRICS', '1') == '0':
+        return None
+    metrics = TokenMetrics()
+    add_stage_hook(metrics.observe_stage)
+    return metrics
+
+_metrics = _create_metrics()
+
+def get_metrics() -> Optional[TokenMetrics]:
+    """Общие для процесса метрики (None, если выключены через TOKEN_METRICS=0)"""
+    return _metrics
+
+# Для Vercel serverless функций
+def _request_origin(request) -> Optional[str]:
+    """Ключ квоты источника для Vercel запроса: Origin, иначе первый адрес из X-Forwarded-For"""
+    headers = request.get('headers') or {}
+    origin = headers.get('origin') or headers.get('Origin')
+    if origin:
+        return origin
+    forwarded = headers.get('x-forwarded-for') or headers.get('X-Forwarded-For')
+    if forwarded:
+        return forwarded.split(',', 1)[0].strip() or None
+    return None
+
+def _process_vercel_request(method: str, body: Any, verify: bool, origin: Optional[str]) -> TokenResponse:
+    if verify:
+        return process_verify_request(method, body)
+    return process_token_request(method, body, origin=origin)
+
+def handler(request, context):
+    """Vercel serverless function handler"""
+    metrics = _metrics
+    verify = is_verify_path(request.get('path') or request.get('url') or '')
+    origin = None if verify else _request_origin(request)
+    if metrics is None or request.method != 'POST':
+        response = _process_vercel_request(request.method, request.get('body'), verify, origin)
+    else:
+        body = request.get('body')
+        size = len(body) if isinstance(body, (bytes, str)) else 0
+        metrics.request_started(size)
+        status = 500
+        try:
+            response = _process_vercel_request('POST', body, verify, origin)
+            status = response.status
+        finally:
+            metrics.request_finished(size, status)
+    
+    return {
+        'statusCode': response.status,
+        'headers': dict(response.headers),
+        'body': response.read_body().decode('utf-8')
+    }
+
+# HTTP сервер (вне Vercel). http.server и concurrent.futures нужны только ему,
+# поэтому классы строятся при первом обращении к token.TokenHandler / token.TokenServer
+# и Vercel функция не платит за эти импорты на холодном старте.
+
+_server_classes_lock = threading.Lock()
+
+def _server_classes() -> Dict[str, type]:
+    """Строит (один раз) и возвращает классы TokenHandler и TokenServer"""
+    with _server_classes_lock:
+        if 'TokenServer' in globals():
+            return {'TokenHandler': globals()['TokenHandler'], 'TokenServer': globals()['TokenServer']}
+        
+        import io
+        import socket
+        import selectors
+        from concurrent.futures import ThreadPoolExecutor
+        from http.server import BaseHTTPRequestHandler, HTTPServer
+        
+        _LENGTH_REQUIRED = _error_response(411, 'Content-Length is required')
+        _INVALID_CONTENT_LENGTH = _error_response(400, 'Invalid Content-Length')
+        _REQUEST_TIMEOUT = _error_response(408, 'Request body was not received in time')
+        _SERVER_BUSY = _error_response(503, 'Too many connections')
+        
+        class _DeadlineSocketIO(socket.SocketIO):
+            """
+            Чтение сокета с общим сроком на несколько recv: таймаут сокета действует
+            на каждый recv отдельно и не спасает от клиента, присылающего байты по одному
+            """
+            
+            def __init__(self, handler: 'TokenHandler'):
+                super().__init__(handler.connection, 'rb')
+                self._handler = handler
+            
+            def readinto(self, buffer) -> Optional[int]:
+                handler = self._handler
+                deadline = handler.read_deadline
+                if deadline is None:
+                    return super().readinto(buffer)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise socket.timeout('read deadline exceeded')
+                handler.connection.settimeout(remaining)
+                try:
+                    return super().readinto(buffer)
+                finally:
+                    handler.connection.settimeout(handler.timeout)
+        
+        class TokenHandler(BaseHTTPRequestHandler):
+            """HTTP адаптер к process_token_request: только чтение тела и запись ответа"""
+            
+            # HTTP/1.1 включает keep-alive: каждый ответ обязан нести Content-Length
+            # или передаваться chunked
+            protocol_version = 'HTTP/1.1'
+            
+            # Сколько секунд держать простаивающее keep-alive соединение
+            timeout = 5
+            
+            # Сколько секунд в сумме ждать строку запроса и заголовки
+            header_timeout = 5
+            
+            # Сколько секунд в сумме ждать тело запроса (защита от slow-loris)
+            body_timeout = 5
+            
+            # Срок, до которого должно прийти читаемое сейчас (заголовки или тело)
+            read_deadline: Optional[float] = None
+            
+            # Соединение ждет следующего запроса у TokenServer, а не в потоке пула
+            idle = False
+            
+            # Заголовки и тело уходят отдельными write(): без TCP_NODELAY Nagle
+            # вместе с delayed ACK клиента добавляет ~40 мс к каждому keep-alive ответу
+            disable_nagle_algorithm = True
+            
+            def do_POST(self):
+                """POST / — выпуск токенов, POST /verify — проверка токена"""
+                started = time.perf_counter() if _stage_hooks else 0.0
+                
+                # Проверяем заголовки до чтения тела: слишком большое или
+                # неизмеримое тело отклоняется сразу, без чтения
+                rejection = None
+                if 'Transfer-Encoding' in self.headers:
+                    rejection = _LENGTH_REQUIRED
+                else:
+                    try:
+                        content_length = int(self.headers.get('Content-Length', 0))
+                    except ValueError:
+                        content_length = -1
+                    if content_length < 0:
+                        rejection = _INVALID_CONTENT_LENGTH
+                    elif content_length > MAX_BODY_SIZE:
+                        rejection = _BODY_TOO_LARGE
+                if rejection is not None:
+                    self._reject(rejection)
+                    return
+                
+                metrics = _metrics
+                if metrics is not None:
+                    metrics.request_started(content_length)
+                status = 500
+                
+                try:
+                    body = self._read_body(content_length) if content_length > 0 else b''
+                    if body is None:
+                        # Клиент не прислал тело за body_timeout или закрыл соединение
+                        status = 408
+                        self._reject(_REQUEST_TIMEOUT, record=False)
+                        return
+                    
+                    if started:
+                        started = record_stage('read', started)
+                    
+                    if is_verify_path(self.path):
+                        response = process_verify_request('POST', body)
+                    else:
+                        response = process_token_request(
+                            'POST',
+                            body,
+                            no_cache='no-cache' in self.headers.get('Cache-Control', ''),
+                            origin=self.headers.get('Origin') or self.client_address[0]
+                        )
+                    status = response.status
+                    
+                    if started:
+                        started = time.perf_counter()
+                    
+                    self._write_response(response)
+                    
+                    if started:
+                        record_stage('write', started)
+                finally:
+                    if metrics is not None:
+                        metrics.request_finished(content_length, status)
+            
+            def _read_body(self, length: int) -> Optional[bytes]:
+                """
+                Читает length байт тела не дольше body_timeout секунд в сумме.
+                None - не успел или закрыл соединение.
+                """
+                self.read_deadline = time.monotonic() + getattr(self.server, 'body_timeout', self.body_timeout)
+                chunks = []
+                remaining = length
+                try:
+                    while remaining:
+                        chunk = self.rfile.read1(min(remaining, 65536))
+                        if not chunk:
+                            return None
+                        chunks.append(chunk)
+                        remaining -= len(chunk)
+                except (socket.timeout, ConnectionError):
+                    return None
+                finally:
+                    self.read_deadline = None
+                return chunks[0] if len(chunks) == 1 else b''.join(chunks)
+            
+            def _reject(self, response: 'TokenResponse', record: bool = True):
+                """
+                Отвечает ошибкой и закрывает соединение: непрочитанный остаток
+                тела нельзя оставлять в keep-alive соединении
+                """
+                self.close_connection = True
+                if record and _metrics is not None:
+                    _metrics.request_started(0)
+                    _metrics.request_finished(0, response.status)
+                try:
+                    self.send_response(response.status)
+                    for name, value in response.headers:
+                        self.send_header(name, value)
+                    self.send_header('Content-Length', str(len(response.body)))
+                    self.send_header('Connection', 'close')
+                    self.end_headers()
+                    self.wfile.write(response.body)
+                except OSError:
+                    pass
+            
+            def do_OPTIONS(self):
+                """Обработка OPTIONS запросов для CORS"""
+                self._write_response(process_token_request('OPTIONS'))
+            
+            def do_GET(self):
+                """GET /metrics — метрики в формате Prometheus, остальное — 405"""
+                if self.path.split('?', 1)[0] == '/metrics' and _metrics is not None:
+                    payload = _metrics.render().encode('utf-8')
+                    self._write_response(TokenResponse(200, _METRICS_HEADERS, payload))
+                    return
+                self._write_response(process_token_request('GET'))
+            
+            def _write_response(self, response: 'TokenResponse'):
+                """Пишет TokenResponse в сокет, потоковые ответы — chunked"""
+                self.send_response(response.status)
+                for name, value in response.headers:
+                    self.send_header(name, value)
+                
+                if response.chunks is None:
+                    self.send_header('Content-Length', str(len(response.body)))
+                    self.end_headers()
+                    if response.body:
+                        self.wfile.write(response.body)
+                    return
+                
+                if self.request_version == 'HTTP/1.0':
+                    # Клиент HTTP/1.0 не понимает chunked: конец ответа — закрытие соединения
+                    self.send_header('Connection', 'close')
+                    self.close_connection = True
+                    self.end_headers()
+                    for chunk in response.chunks:
+                        self.wfile.write(chunk)
+                    return
+                
+                # Chunked transfer-encoding сохраняет keep-alive соединение
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                for chunk in response.chunks:
+                    self.wfile.write(b'%X\r\n%s\r\n' % (len(chunk), chunk))
+                self.wfile.write(b'0\r\n\r\n')
+            
+            def setup(self):
+                # TokenServer задает таймаут простоя keep-alive соединений
+                self.timeout = getattr(self.server, 'keepalive_timeout', self.timeout)
+                super().setup()
+                # Заголовки и тело читаются со сроком на весь запрос, а не на каждый recv
+                self.rfile.close()
+                self.rfile = io.BufferedReader(_DeadlineSocketIO(self))
+            
+            def handle(self):
+                """
+                Обрабатывает запросы соединения. Под TokenServer соединение без
+                следующего запроса в буфере не ждет в потоке пула: handle возвращается
+                с idle=True, и сервер передает соединение пулу, когда придут данные.
+                """
+                park = getattr(self.server, 'parks_idle_connections', False)
+                self.idle = False
+                self.close_connection = True
+                self.handle_one_request()
+                while not self.close_connection:
+                    if park and not self._request_buffered():
+                        self.idle = True
+                        return
+                    self.handle_one_request()
+            
+            def _request_buffered(self) -> bool:
+                """Есть ли уже прочитанные байты следующего запроса (pipelining)"""
+                self.connection.settimeout(0)
+                try:
+                    return bool(self.rfile.peek(1))
+                except OSError:
+                    return False
+                finally:
+                    self.connection.settimeout(self.timeout)
+            
+            def handle_one_request(self):
+                self.read_deadline = time.monotonic() + getattr(self.server, 'header_timeout', self.header_timeout)
+                try:
+                    super().handle_one_request()
+                finally:
+                    self.read_deadline = None
+                # При остановке сервера не держим keep-alive соединения открытыми
+                if getattr(self.server, 'stopping', False):
+                    self.close_connection = True
+            
+            def parse_request(self) -> bool:
+                ok = super().parse_request()
+                # Заголовки прочитаны: тело читается со своим сроком (_read_body)
+                self.read_deadline = None
+                return ok
+            
+            def finish(self):
+                # Простаивающее соединение остается открытым до следующего запроса
+                if not self.idle:
+                    super().finish()
+            
+            def log_message(self, format, *args):
+                if getattr(self.server, 'access_log', True):
+                    super().log_message(format, *args)
+        
+        class TokenServer(HTTPServer):
+            """
+            Продакшен HTTP сервер для TokenHandler вне Vercel.
+            
+            Запросы обрабатываются ограниченным пулом потоков. Поток занят только
+            запросом, который уже начал приходить: новые и простаивающие keep-alive
+            соединения ждут данных в одном селекторе, а строка запроса, заголовки
+            и тело читаются со сроками header_timeout и body_timeout. Поэтому
+            медленные и молчащие клиенты не блокируют остальных. Открытых соединений
+            не больше max_connections, лишние сразу получают 503.
+            Запросы идут через тот же TokenHandler и те же функции выпуска токенов,
+            что и Vercel handler.
+            """
+            
+            allow_reuse_address = True
+            parks_idle_connections = True
+            
+            def __init__(
+                self,
+                server_address: tuple,
+                workers: int = 32,
+                backlog: int = 128,
+                keepalive_timeout: float = 5,
+                access_log: bool = False,
+                handler_class: type = TokenHandler,
+                body_timeout: float = 5,
+                header_timeout: float = 5,
+                max_connections: int = 1024
+            ):
+                # request_queue_size используется в listen() при server_activate
+                self.request_queue_size = backlog
+                self.keepalive_timeout = keepalive_timeout
+                self.body_timeout = body_timeout
+                self.header_timeout = header_timeout
+                self.max_connections = max_connections
+                self.access_log = access_log
+                self.stopping = False
+                super().__init__(server_address, handler_class)
+                self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='token-worker')
+                self._connections = 0
+                self._connections_lock = threading.Lock()
+                # Соединения, ждущие данных: регистрирует и снимает только поток _watch_idle,
+                # остальные передают их через _pending и будят его через _wakeup
+                self._selector = selectors.DefaultSelector()
+                self._pending = []
+                self._pending_lock = threading.Lock()
+                self._wakeup_recv, self._wakeup_send = socket.socketpair()
+                self._wakeup_recv.setblocking(False)
+                self._wakeup_send.setblocking(False)
+                self._selector.register(self._wakeup_recv, selectors.EVENT_READ)
+                self._watching = True
+                self._watcher = threading.Thread(target=self._watch_idle, name='token-idle', daemon=True)
+                self._watcher.start()
+            
+            def process_request(self, request, client_address):
+                with self._connections_lock:
+                    busy = self._connections >= self.max_connections
+                    if not busy:
+                        self._connections += 1
+                if busy:
+                    self._reject_busy(request)
+                    return
+                # Поток пула понадобится, когда клиент начнет присылать запрос
+                self._park(request, client_address, None)
+            
+            def _reject_busy(self, request):
+                if _metrics is not None:
+                    _metrics.request_started(0)
+                    _metrics.request_finished(0, 503)
+                response = _SERVER_BUSY
+                head = ''.join(
+                    [f'HTTP/1.1 {response.status} Service Unavailable\r\n']
+                    + [f'{name}: {value}\r\n' for name, value in response.headers]
+                    + [f'Content-Length: {len(response.body)}\r\nRetry-After: 1\r\nConnection: close\r\n\r\n']
+                )
+                try:
+                    # Ответ меньше буфера сокета: неблокирующая отправка не ждет клиента
+                    request.setblocking(False)
+                    request.sendall(head.encode('latin-1') + response.body)
+                except OSError:
+                    pass
+                self.shutdown_request(request)
+            
+            def _park(self, request, client_address, handler):
+                """Передает соединение селектору до прихода данных или keepalive_timeout"""
+                if self.stopping:
+                    self._close_connection(request, handler)
+                    return
+                with self._pending_lock:
+                    self._pending.append((request, client_address, handler))
+                try:
+                    self._wakeup_send.send(b'\0')
+                except BlockingIOError:
+                    # Поток селектора и так еще не дочитал прошлые пробуждения
+                    pass
+            
+            def _watch_idle(self):
+                deadlines = {}
+                while self._watching:
+                    now = time.monotonic()
+                    timeout = min(deadlines.values(), default=now + 1.0) - now
+                    for key, _ in self._selector.select(max(0.0, min(timeout, 1.0))):
+                        if key.fileobj is self._wakeup_recv:
+                            try:
+                                while self._wakeup_recv.recv(4096):
+                                    pass
+                            except BlockingIOError:
+                                pass
+                            continue
+                        self._selector.unregister(key.fileobj)
+                        del deadlines[key.fileobj]
+                        request, (client_address, handler) = key.fileobj, key.data
+                        self._executor.submit(self._process_request_worker, request, client_address, handler)
+                    with self._pending_lock:
+                        pending, self._pending = self._pending, []
+                    now = time.monotonic()
+                    for request, client_address, handler in pending:
+                        self._selector.register(request, selectors.EVENT_READ, (client_address, handler))
+                        deadlines[request] = now + self.keepalive_timeout
+                    expired = [request for request, deadline in deadlines.items() if deadline <= now]
+                    for request in expired:
+                        _, handler = self._selector.unregister(request).data
+                        del deadlines[request]
+                        self._close_connection(request, handler)
+                for request in deadlines:
+                    _, handler = self._selector.unregister(request).data
+                    self._close_connection(request, handler)
+            
+            def _process_request_worker(self, request, client_address, handler=None):
+                try:
+                    if handler is None:
+                        handler = self.RequestHandlerClass(request, client_address, self)
+                    else:
+                        try:
+                            handler.handle()
+                        finally:
+                            handler.finish()
+                except Exception:
+                    self.handle_error(request, client_address)
+                    if handler is not None:
+                        handler.idle = False
+                if handler is not None and handler.idle:
+                    self._park(request, client_address, handler)
+                else:
+                    self._close_connection(request, None)
+            
+            def _close_connection(self, request, handler):
+                if handler is not None:
+                    handler.idle = False
+                    try:
+                        handler.finish()
+                    except OSError:
+                        pass
+                self.shutdown_request(request)
+                with self._connections_lock:
+                    self._connections -= 1
+            
+            def stop(self):
+                """Перестает принимать соединения; обслуживаемые запросы завершаются"""
+                self.stopping = True
+                self.shutdown()
+            
+            def server_close(self):
+                super().server_close()
+                # Простаивающие соединения закрываются, запросы в работе дорабатывают
+                # и закрывают свои соединения (stopping отключает keep-alive)
+                self.stopping = True
+                self._watching = False
+                try:
+                    self._wakeup_send.send(b'\0')
+                except OSError:
+                    pass
+                self._watcher.join()
+                self._executor.shutdown(wait=True)
+                with self._pending_lock:
+                    pending, self._pending = self._pending, []
+                for request, _, handler in pending:
+                    self._close_connection(request, handler)
+                self._selector.close()
+                self._wakeup_recv.close()
+                self._wakeup_send.close()
+        
+        globals().update(TokenHandler=TokenHandler, TokenServer=TokenServer)
+        return {'TokenHandler': TokenHandler, 'TokenServer': TokenServer}
+
+def __getattr__(name: str):
+    if name in ('TokenHandler', 'TokenServer'):
+        return _server_classes()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def serve(
+    host: str = '127.0.0.1',
+    port: int = 8000,
+    workers: int = 32,
+    backlog: int = 128,
+    keepalive_timeout: float = 5,
+    access_log: bool = False,
+    body_timeout: float = 5,
+    header_timeout: float = 5,
+    max_connections: int = 1024
+):
+    """
+    Запускает TokenServer и блокируется до SIGINT/SIGTERM.
+    Остановка мягкая: новые соединения не принимаются, текущие запросы дорабатывают.
+    """
+    import signal
+    
+    server = _server_classes()['TokenServer'](
+        (host, port),
+        workers=workers,
+        backlog=backlog,
+        keepalive_timeout=keepalive_timeout,
+        access_log=access_log,
+        body_timeout=body_timeout,
+        header_timeout=header_timeout,
+        max_connections=max_connections
+    )
+    
+    def _stop(signum, frame):
+        # shutdown() ждет выхода из serve_forever, поэтому вызываем его из другого потока
+        threading.Thread(target=server.stop, daemon=True).start()
+    
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+    
+    print(f"Token server listening on http://{host}:{server.server_address[1]} ({workers} workers)", flush=True)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+    print("Token server stopped", flush=True)
+
+def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='LiveKit token server')
+    parser.add_argument('--host', default=os.getenv('TOKEN_SERVER_HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('PORT', '8000')))
+    parser.add_argument('--workers', type=int, default=int(os.getenv('TOKEN_SERVER_WORKERS', '32')),
+                        help='Размер пула потоков-обработчиков')
+    parser.add_argument('--backlog', type=int, default=int(os.getenv('TOKEN_SERVER_BACKLOG', '128')),
+                        help='Длина очереди listen()')
+    parser.add_argument('--keepalive-timeout', type=float, default=float(os.getenv('TOKEN_SERVER_KEEPALIVE_TIMEOUT', '5')),
+                        help='Сколько секунд держать простаивающее keep-alive соединение')
+    parser.add_argument('--body-timeout', type=float, default=float(os.getenv('TOKEN_SERVER_BODY_TIMEOUT', '5')),
+                        help='Сколько секунд в сумме ждать тело запроса')
+    parser.add_argument('--header-timeout', type=float, default=float(os.getenv('TOKEN_SERVER_HEADER_TIMEOUT', '5')),
+                        help='Сколько секунд в сумме ждать строку запроса и заголовки')
+    parser.add_argument('--max-connections', type=int, default=int(os.getenv('TOKEN_SERVER_MAX_CONNECTIONS', '1024')),
+                        help='Предел открытых соединений, сверх него - 503')
+    parser.add_argument('--access-log', action='store_true', help='Писать access log в stderr')
+    args = parser.parse_args()
+    
+    serve(
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        backlog=args.backlog,
+        keepalive_timeout=args.keepalive_timeout,
+        access_log=args.access_log,
+        body_timeout=args.body_timeout,
+        header_timeout=args.header_timeout,
+        max_connections=args.max_connections
+    )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,307 @@
+"""
+Неинтерактивная пакетная генерация .cursorrules по манифесту проектов.
+
+Манифест - JSONL (один проект на строку) или YAML (список проектов):
+    {"name": "shop-frontend", "description": "React + Next.js магазин", "clarifications": {"State?": "Redux"}}
+    {"name": "voice-rag", "generator": "rag_livekit", "description": "...", "additional_context": "..."}
+
+Поля проекта:
+    name                уникальное имя файла (без / и ..), по нему строится путь результата
+                        и отслеживается прогресс; по умолчанию - из описания, при совпадении
+                        с суффиксом-хэшем
+    description         описание проекта (обязательно)
+    clarifications      уточнения {вопрос: ответ} для генератора cursorrules
+    generator           cursorrules (по умолчанию, main.py) или rag_livekit (chat_generator.py)
+    additional_context  дополнительный контекст для генератора rag_livekit
+    output              относительный путь результата без .. (по умолчанию <output-dir>/<name>.md)
+
+Запросы идут параллельно в ограниченном пуле потоков через планировщик
+rate_scheduler: он держит бюджеты запросов и токенов в минуту по заголовкам
+ответов, уменьшает число одновременных запросов после 429 и повторяет их
+с задержкой. Завершенные проекты дописываются в файл прогресса, поэтому
+повторный запуск после сбоя продолжает с места остановки.
+
+Правила похожих проектов из rules_index по умолчанию не переиспользуются
+(RULES_REUSE_THRESHOLD здесь не действует): проекты манифеста генерируются
+параллельно, и какой из похожих проектов возьмет чужой результат, зависело бы
+от порядка завершения потоков. Включается явно через --reuse-threshold.
+
+Запуск:
+    python batch_generate.py projects.jsonl --workers 4 --output-dir cursorrules_lib/rules
+"""
+import os
+import re
+import json
+import hashlib
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set
+
+import main as cursorrules
+import chat_generator
+from rate_scheduler import RequestScheduler, RulesGenerationError
+
+GENERATORS = ('cursorrules', 'rag_livekit')
+DEFAULT_OUTPUT_DIR = os.path.join('cursorrules_lib', 'rules')
+
+def load_manifest(path: str) -> List[dict]:
+    """Читает манифест JSONL или YAML и проверяет обязательные поля"""
+    with open(path, encoding='utf-8') as f:
+        if path.endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError("Для YAML манифеста установите PyYAML: pip install pyyaml")
+            projects = yaml.safe_load(f) or []
+        else:
+            projects = [json.loads(line) for line in f if line.strip()]
+    
+    if not isinstance(projects, list):
+        raise ValueError(f"{path}: манифест должен быть списком проектов")
+    
+    names = set()
+    for index, project in enumerate(projects):
+        if not isinstance(project, dict) or not project.get('description'):
+            raise ValueError(f"{path}: проект #{index + 1} должен содержать description")
+        if 'name' not in project:
+            continue
+        name = project['name']
+        if not _is_plain_name(name):
+            raise ValueError(f"{path}: имя проекта #{index + 1} должно быть именем файла без / и ..: {name!r}")
+        if name in names:
+            raise ValueError(f"{path}: повторяющееся имя проекта {name}")
+        names.add(name)
+    
+    for index, project in enumerate(projects):
+        if 'name' not in project:
+            # Имена из описаний не должны совпадать ни друг с другом, ни с заданными явно
+            project['name'] = _unique_name(project['description'], index, names)
+            names.add(project['name'])
+        project.setdefault('generator', 'cursorrules')
+        if project['generator'] not in GENERATORS:
+            raise ValueError(f"{path}: неизвестный generator '{project['generator']}' у проекта {project['name']}")
+        output = project.get('output')
+        if output is not None and not _is_relative_path(output):
+            raise ValueError(f"{path}: output проекта {project['name']} должен быть относительным путем без ..")
+    return projects
+
+def _slugify(text: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '-', text.lower())[:48].strip('-')
+
+def _unique_name(description: str, index: int, taken: Set[str]) -> str:
+    """Имя из описания; при совпадении - с коротким хэшем описания (и номером, если описания одинаковые)"""
+    slug = _slugify(description) or f'project-{index + 1}'
+    if slug not in taken:
+        return slug
+    digest = hashlib.sha256(description.encode('utf-8')).hexdigest()[:8]
+    name = f"{slug[:39].rstrip('-')}-{digest}"
+    return name if name not in taken else f"{name}-{index + 1}"
+
+def _is_plain_name(name) -> bool:
+    return (
+        isinstance(name, str) and name not in ('', '.', '..')
+        and '/' not in name and '\\' not in name and '\0' not in name
+    )
+
+def _is_relative_path(path) -> bool:
+    if not isinstance(path, str) or not path or '\0' in path or os.path.isabs(path):
+        return False
+    return '..' not in re.split(r'[\\/]', path)
+
+def load_progress(path: str) -> Set[str]:
+    """Имена проектов, уже завершенных в прошлых запусках"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Строка, оборванная при сбое
+                continue
+            if record.get('status') == 'done' and os.path.exists(record.get('output', '')):
+                done.add(record['name'])
+            else:
+                done.discard(record.get('name'))
+    return done
+
+class BatchRunner:
+    """
+    Выполняет генерацию для списка проектов в пуле из workers потоков.
+
+    Генераторы (и их HTTP клиенты) общие для всех потоков. Все запросы идут
+    через один RequestScheduler: число одновременных запросов начинается
+    с min(workers, RULES_CONCURRENCY) и подстраивается под лимиты провайдера,
+    не превышая workers.
+    """
+    
+    def __init__(
+        self,
+        output_dir: str = DEFAULT_OUTPUT_DIR,
+        workers: int = 4,
+        max_retries: int = 5,
+        progress_path: Optional[str] = None,
+        use_cache: bool = True,
+        sectioned: bool = False,
+        reuse_threshold: float = 0.0
+    ):
+        self.output_dir = output_dir
+        self.workers = workers
+        self.max_retries = max_retries
+        self.progress_path = progress_path
+        self.use_cache = use_cache
+        self.sectioned = sectioned
+        self.reuse_threshold = reuse_threshold
+        self.scheduler = RequestScheduler.from_env(max_concurrency=workers, max_retries=max_retries)
+        self._generators: Dict[str, object] = {}
+        self._lock = threading.Lock()
+    
+    def _generator(self, kind: str):
+        with self._lock:
+            if kind not in self._generators:
+                if kind == 'rag_livekit':
+                    generator = chat_generator.ChatRulesGenerator(use_cache=self.use_cache, scheduler=self.scheduler)
+                else:
+                    generator = cursorrules.CursorRulesGenerator(
+                        use_cache=self.use_cache, similarity_threshold=self.reuse_threshold, scheduler=self.scheduler
+                    )
+                self._generators[kind] = generator
+            return self._generators[kind]
+    
+    def output_path(self, project: dict) -> str:
+        return project.get('output') or os.path.join(self.output_dir, f"{project['name']}.md")
+    
+    def _generate(self, project: dict) -> str:
+        generator = self._generator(project['generator'])
+        if project['generator'] == 'rag_livekit':
+            return generator.generate_rag_livekit_rules(project['description'], project.get('additional_context', ''))
+        generate = generator.generate_sectioned if self.sectioned else generator.generate_cursorrules
+        return generate(project['description'], project.get('clarifications'))
+    
+    def _record(self, record: dict):
+        if not self.progress_path:
+            return
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            with open(self.progress_path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+    
+    def _run_one(self, project: dict) -> dict:
+        started = time.perf_counter()
+        output = self.output_path(project)
+        try:
+            rules = self._generate(project)
+            if project['generator'] == 'rag_livekit':
+                chat_generator.save_rules_md(rules, output)
+            else:
+                cursorrules.save_rules_md(rules, output, project['description'], project.get('clarifications'))
+            record = {'name': project['name'], 'status': 'done', 'output': output}
+            # last_reused свой у каждого потока, поэтому относится именно к этому проекту
+            reused = getattr(self._generator(project['generator']), 'last_reused', None)
+            if reused:
+                record['reused_from'] = {'query': reused['query'], 'score': round(reused['score'], 3)}
+        except RulesGenerationError as e:
+            record = {'name': project['name'], 'status': 'failed', 'output': output, 'error': str(e), 'error_kind': e.kind}
+        except Exception as e:
+            record = {'name': project['name'], 'status': 'failed', 'output': output, 'error': str(e)}
+        record['seconds'] = round(time.perf_counter() - started, 3)
+        self._record(record)
+        
+        if record['status'] == 'done':
+            reused = f", правила проекта «{record['reused_from']['query']}»" if 'reused_from' in record else ''
+            print(f"[ok] {project['name']} -> {output} ({record['seconds']:.1f} с{reused})", flush=True)
+        else:
+            print(f"[ошибка] {project['name']}: {record['error']}", flush=True)
+        return record
+    
+    def run(self, projects: List[dict], skip: Set[str] = frozenset()) -> dict:
+        """Генерирует правила для всех проектов, кроме skip, и возвращает сводку"""
+        pending = [project for project in projects if project['name'] not in skip]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            records = list(executor.map(self._run_one, pending))
+        wall = time.perf_counter() - started
+        
+        usage = {'requests': 0, 'prompt_tokens': 0, 'cached_prompt_tokens': 0, 'completion_tokens': 0}
+        cache_hits = 0
+        for generator in self._generators.values():
+            for name, value in generator.usage.snapshot().items():
+                usage[name] += value
+        cache = next((g.cache for g in self._generators.values() if g.cache is not None), None)
+        if cache is not None:
+            cache_hits = cache.hits
+        
+        done = sum(1 for r in records if r['status'] == 'done')
+        return {
+            'projects': len(projects),
+            'skipped': len(projects) - len(pending),
+            'done': done,
+            'failed': len(records) - done,
+            'wall_seconds': round(wall, 2),
+            'projects_per_min': round(done / wall * 60, 1) if wall else 0.0,
+            'completion_tokens_per_sec': round(usage['completion_tokens'] / wall, 1) if wall else 0.0,
+            'api_requests': usage['requests'],
+            'prompt_tokens': usage['prompt_tokens'],
+            'cached_prompt_tokens': usage['cached_prompt_tokens'],
+            'completion_tokens': usage['completion_tokens'],
+            'cache_hits': cache_hits,
+            'reused': sum(1 for r in records if 'reused_from' in r),
+            'rate_limited': self.scheduler.rate_limited,
+            'retries': self.scheduler.retries,
+            'concurrency_limit': self.scheduler.stats()['concurrency_limit'],
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('manifest', help='Манифест проектов (.jsonl, .yaml или .yml)')
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument('--workers', type=int, default=4, help='Одновременных запросов к модели')
+    parser.add_argument('--max-retries', type=int, default=5, help='Повторов при 429 и временных ошибках')
+    parser.add_argument('--progress', help='Файл прогресса (по умолчанию <manifest>.progress.jsonl)')
+    parser.add_argument('--restart', action='store_true', help='Игнорировать прогресс прошлых запусков')
+    parser.add_argument('--no-cache', action='store_true', help='Не использовать кэш ответов модели')
+    parser.add_argument('--sectioned', action='store_true',
+                        help='Генерировать cursorrules по разделам: после правок уточнений перезапрашиваются только затронутые разделы')
+    parser.add_argument('--reuse-threshold', type=float, default=0.0,
+                        help='Брать правила похожего проекта из rules_index при сходстве не ниже порога (0 - не брать)')
+    args = parser.parse_args()
+    
+    try:
+        projects = load_manifest(args.manifest)
+        progress_path = args.progress or args.manifest + '.progress.jsonl'
+        if args.restart and os.path.exists(progress_path):
+            os.remove(progress_path)
+        done = load_progress(progress_path)
+        if done:
+            print(f"Продолжаем: {len(done)} из {len(projects)} проектов уже готовы")
+        
+        runner = BatchRunner(
+            output_dir=args.output_dir,
+            workers=args.workers,
+            max_retries=args.max_retries,
+            progress_path=progress_path,
+            use_cache=not args.no_cache,
+            sectioned=args.sectioned,
+            reuse_threshold=args.reuse_threshold,
+        )
+        summary = runner.run(projects, skip=done)
+    except Exception as e:
+        print(f"Ошибка: {str(e)}")
+        print("Убедитесь, что установлена переменная окружения OPENAI_API_KEY")
+        raise SystemExit(1)
+    
+    print(
+        f"\nГотово {summary['done']}/{summary['projects'] - summary['skipped']} проектов "
+        f"(пропущено {summary['skipped']}, ошибок {summary['failed']}) за {summary['wall_seconds']} с: "
+        f"{summary['projects_per_min']} проектов/мин, {summary['completion_tokens_per_sec']} токенов/с"
+    )
+    print(json.dumps(summary, indent=2))
+    raise SystemExit(1 if summary['failed'] else 0)
+
+if __name__ == '__main__':
+    main()
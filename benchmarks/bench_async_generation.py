@@ -0,0 +1,81 @@
+"""
+Бенчмарк AsyncCursorRulesGenerator против CursorRulesGenerator на локальной
+заглушке OpenAI API: время до первого фрагмента при стриминге и пропускная
+способность generate_many при разной конкурентности.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_async_generation.py --projects 16 --token-delay 0.005
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.openai_stub import start_stub
+
+def run(projects: int = 16, token_delay: float = 0.005, completion_tokens: int = 200, concurrency=(1, 4, 16)) -> dict:
+    server, base_url = start_stub(completion_tokens=completion_tokens, token_delay=token_delay)
+    os.environ['OPENAI_BASE_URL'] = base_url
+    os.environ.setdefault('OPENAI_API_KEY', 'stub')
+    # Замеряем запросы к модели, а не повторное использование сохраненных правил и кэш ответов
+    os.environ['RULES_REUSE_THRESHOLD'] = '0'
+    
+    import main as rules_main
+    
+    try:
+        sync_generator = rules_main.CursorRulesGenerator(use_cache=False)
+        start = time.perf_counter()
+        sync_generator.generate_cursorrules('React dashboard')
+        sync_total = time.perf_counter() - start
+        
+        async def streaming() -> tuple:
+            async with rules_main.AsyncCursorRulesGenerator(use_cache=False) as generator:
+                first = []
+                start = time.perf_counter()
+                await generator.generate_cursorrules(
+                    'React dashboard', on_token=lambda text: first or first.append(time.perf_counter() - start)
+                )
+                return first[0], time.perf_counter() - start
+        
+        ttfb, stream_total = asyncio.run(streaming())
+        
+        async def many(limit: int) -> float:
+            async with rules_main.AsyncCursorRulesGenerator(use_cache=False) as generator:
+                descriptions = [f'Project {i}: FastAPI service' for i in range(projects)]
+                start = time.perf_counter()
+                await generator.generate_many(descriptions, concurrency=limit)
+                return time.perf_counter() - start
+        
+        levels = []
+        for limit in concurrency:
+            wall = asyncio.run(many(limit))
+            levels.append({'concurrency': limit, 'wall_s': round(wall, 3), 'projects_per_min': round(projects / wall * 60)})
+    finally:
+        server.shutdown()
+    
+    return {
+        'completion_tokens': completion_tokens,
+        'token_delay_s': token_delay,
+        'sync_full_completion_s': round(sync_total, 3),
+        'stream_time_to_first_token_s': round(ttfb, 4),
+        'stream_full_completion_s': round(stream_total, 3),
+        'generate_many': levels,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--projects', type=int, default=16)
+    parser.add_argument('--token-delay', type=float, default=0.005)
+    parser.add_argument('--completion-tokens', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    args = parser.parse_args()
+    print(json.dumps(run(args.projects, args.token_delay, args.completion_tokens, args.concurrency), indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Бенчмарк общего пула соединений OpenAI клиента: 100 последовательных генераций,
+каждая через новый CursorRulesGenerator, против локальной заглушки API.
+
+Сравниваются:
+- per_generator_client: у каждого генератора свой OpenAI клиент (прежнее поведение);
+- shared_registry: генераторы берут клиента из openai_clients.
+
+Считается число TCP соединений, принятых заглушкой, и время на генерацию.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_client_pool.py --generations 100
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from openai import OpenAI
+
+from benchmarks.openai_stub import start_stub
+
+os.environ.setdefault('OPENAI_API_KEY', 'stub')
+# Замеряем запросы к модели, а не повторное использование сохраненных правил
+os.environ['RULES_REUSE_THRESHOLD'] = '0'
+
+import main as cursorrules
+import openai_clients
+
+def _run_mode(server, generations: int, shared: bool) -> dict:
+    openai_clients.close_clients()
+    with server.stats_lock:
+        server.connections = 0
+    
+    clients = []
+    start = time.perf_counter()
+    for i in range(generations):
+        generator = cursorrules.CursorRulesGenerator(use_cache=False)
+        if not shared:
+            generator.client = OpenAI()
+            clients.append(generator.client)
+        rules = generator.generate_cursorrules(f'Project {i}: FastAPI service')
+        assert rules.startswith('You are an expert')
+    wall = time.perf_counter() - start
+    
+    for client in clients:
+        client.close()
+    return {
+        'generations': generations,
+        'connections': server.connections,
+        'wall_s': round(wall, 3),
+        'ms_per_generation': round(wall / generations * 1000, 3),
+    }
+
+def run(generations: int = 100) -> dict:
+    server, base_url = start_stub(completion_tokens=50)
+    os.environ['OPENAI_BASE_URL'] = base_url
+    try:
+        # Прогрев: импорт, DNS, первые аллокации
+        _run_mode(server, 5, shared=True)
+        per_generator = _run_mode(server, generations, shared=False)
+        shared = _run_mode(server, generations, shared=True)
+    finally:
+        server.shutdown()
+        server.server_close()
+    
+    return {
+        'http2': openai_clients.http2_available(),
+        'per_generator_client': per_generator,
+        'shared_registry': shared,
+        'speedup': round(per_generator['wall_s'] / shared['wall_s'], 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--generations', type=int, default=100)
+    args = parser.parse_args()
+    print(json.dumps(run(args.generations), indent=2))
+
+if __name__ == '__main__':
+    main()
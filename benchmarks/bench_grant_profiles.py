@@ -0,0 +1,176 @@
+"""
+Бенчмарк выбора профиля прав по имени комнаты (GrantProfiles / RoomPatternIndex)
+при большом числе шаблонов.
+
+Шаблоны: 80% префиксов ("tenant-42-support-*") разной длины и 20% точных имен.
+Имена комнат: треть совпадает с точным именем, треть - с префиксом, треть
+не совпадает ни с чем (худший случай для всех способов).
+Способы (мкс на выбор профиля):
+    linear - проход по списку шаблонов с выбором самого длинного совпадения;
+    regex  - одно скомпилированное регулярное выражение-альтернатива
+             (точные имена, затем префиксы от длинных к коротким);
+    index  - RoomPatternIndex (dict точных имен + dict префиксов по длине).
+Плюс выпуск токена с профилем из 1k шаблонов против профиля по умолчанию,
+токенов в секунду.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_grant_profiles.py --patterns 10 100 1000 --lookups 20000
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from api import token as token_api
+
+API_KEY = 'bench-key'
+API_SECRET = 'bench-secret-0123456789abcdef0123456789abcdef'
+WORDS = ('support', 'sales', 'webinar', 'ops', 'class', 'standup', 'interview', 'demo')
+
+def make_patterns(count: int, rng: random.Random) -> dict:
+    """Шаблон -> имя профиля"""
+    profiles = ('listener', 'agent', 'supervisor')
+    patterns = {}
+    while len(patterns) < count:
+        parts = [f'tenant-{rng.randrange(count)}'] + rng.sample(WORDS, rng.randrange(1, 4))
+        name = '-'.join(parts)
+        pattern = name + '-*' if rng.random() < 0.8 else name
+        patterns.setdefault(pattern, profiles[len(patterns) % len(profiles)])
+    return patterns
+
+def make_rooms(patterns: dict, count: int, rng: random.Random) -> list:
+    exact = [pattern for pattern in patterns if not pattern.endswith('*')]
+    prefixes = [pattern[:-1] for pattern in patterns if pattern.endswith('*')]
+    rooms = []
+    for i in range(count):
+        kind = i % 3
+        if kind == 0 and exact:
+            rooms.append(rng.choice(exact))
+        elif kind == 1 and prefixes:
+            rooms.append(rng.choice(prefixes) + f'room-{i}')
+        else:
+            rooms.append(f'unmatched-{rng.choice(WORDS)}-{i}')
+    return rooms
+
+def linear_matcher(patterns: dict, profiles: dict):
+    entries = [(pattern[:-1], True, profiles[name]) if pattern.endswith('*') else (pattern, False, profiles[name])
+               for pattern, name in patterns.items()]
+    
+    def match(room_name):
+        best, best_length = None, -1
+        for key, is_prefix, profile in entries:
+            if is_prefix:
+                if len(key) > best_length and room_name.startswith(key):
+                    best, best_length = profile, len(key)
+            elif key == room_name:
+                return profile
+        return best
+    return match
+
+def regex_matcher(patterns: dict, profiles: dict):
+    exact = [pattern for pattern in patterns if not pattern.endswith('*')]
+    prefixes = sorted((pattern for pattern in patterns if pattern.endswith('*')), key=len, reverse=True)
+    ordered = exact + prefixes
+    values = [profiles[patterns[pattern]] for pattern in ordered]
+    expression = re.compile('|'.join(
+        f'({re.escape(pattern)})$' if not pattern.endswith('*') else f'({re.escape(pattern[:-1])})'
+        for pattern in ordered
+    ))
+    
+    def match(room_name):
+        found = expression.match(room_name)
+        return values[found.lastindex - 1] if found else None
+    return match
+
+def _per_lookup_us(match, rooms: list) -> float:
+    start = time.perf_counter()
+    for room in rooms:
+        match(room)
+    return (time.perf_counter() - start) / len(rooms) * 1e6
+
+def bench_patterns(count: int, lookups: int, seed: int = 1) -> dict:
+    rng = random.Random(seed)
+    patterns = make_patterns(count, rng)
+    rooms = make_rooms(patterns, lookups, rng)
+    
+    start = time.perf_counter()
+    grant_profiles = token_api.GrantProfiles.from_dict({
+        'profiles': {name: {'permissions': {'canPublish': name != 'listener', 'canSubscribe': True}}
+                     for name in ('listener', 'agent', 'supervisor')},
+        'rooms': patterns,
+    })
+    compile_ms = (time.perf_counter() - start) * 1000
+    
+    matchers = {
+        'index': grant_profiles.rooms.match,
+        'linear': linear_matcher(patterns, grant_profiles.profiles),
+    }
+    try:
+        matchers['regex'] = regex_matcher(patterns, grant_profiles.profiles)
+    except (re.error, RecursionError, OverflowError):
+        pass
+    
+    # Все способы должны выбирать одно и то же
+    sample = rooms[:500]
+    reference = [matchers['linear'](room) for room in sample]
+    agree = {name: [match(room) for room in sample] == reference for name, match in matchers.items()}
+    
+    result = {'patterns': count, 'compile_ms': round(compile_ms, 2), 'agree_with_linear': agree}
+    for name, match in matchers.items():
+        # linear и regex растут с числом шаблонов: на больших наборах хватит части комнат
+        lookup_rooms = rooms if name == 'index' or count <= 1000 else rooms[:1000]
+        _per_lookup_us(match, lookup_rooms[:200])
+        result[f'{name}_us'] = round(_per_lookup_us(match, lookup_rooms), 3)
+    return result
+
+def bench_mint(count: int, iterations: int, seed: int = 1) -> dict:
+    rng = random.Random(seed)
+    patterns = make_patterns(count, rng)
+    rooms = make_rooms(patterns, iterations, rng)
+    grant_profiles = token_api.GrantProfiles.from_dict({
+        'profiles': {name: {'permissions': {'canPublish': name != 'listener', 'canSubscribe': True}}
+                     for name in ('listener', 'agent', 'supervisor')},
+        'rooms': patterns,
+    })
+    minter = token_api.TokenMinter(API_KEY, API_SECRET)
+    
+    start = time.perf_counter()
+    for i, room in enumerate(rooms):
+        minter.mint(room, f'user-{i}')
+    default_rate = iterations / (time.perf_counter() - start)
+    
+    start = time.perf_counter()
+    for i, room in enumerate(rooms):
+        minter.mint(room, f'user-{i}', grants=grant_profiles.resolve(room))
+    profile_rate = iterations / (time.perf_counter() - start)
+    
+    return {
+        'patterns': count,
+        'default_profile_tokens_per_sec': round(default_rate),
+        'resolved_profile_tokens_per_sec': round(profile_rate),
+        'overhead_us_per_token': round((1 / profile_rate - 1 / default_rate) * 1e6, 3),
+    }
+
+def run(patterns=(10, 100, 1000), lookups: int = 20000) -> dict:
+    return {
+        'lookups': lookups,
+        'results': [bench_patterns(count, lookups) for count in patterns],
+        'mint': bench_mint(1000, lookups),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--patterns', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--lookups', type=int, default=20000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.patterns, args.lookups), indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Бенчмарк холодного старта api/token.py на основе `python -X importtime`.
+
+Импорт модуля запускается в чистом интерпретаторе (-S: без site, чтобы
+предзагруженные site-модули вроде typing не маскировали регрессии).
+Скрипт завершается с кодом 1, если:
+- медианное время импорта превышает --max-import-ms;
+- на пути подписи импортируется любой из ленивых модулей (jwt, http.server, ...).
+
+Запуск из корня репозитория:
+    python benchmarks/bench_import_time.py --runs 7 --max-import-ms 40
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Модули, которые не должны попадать в холодный старт Vercel функции
+LAZY_MODULES = ('jwt', 'http.server', 'concurrent.futures', 'argparse', 'signal', 'typing', 'logging')
+
+FIRST_TOKEN_SNIPPET = (
+    "import time; started = time.perf_counter(); "
+    "import api.token as t; t.TokenMinter('k', 's').mint('room', 'user'); "
+    "print((time.perf_counter() - started) * 1000)"
+)
+
+def _importtime() -> tuple:
+    """Возвращает (кумулятивное время импорта api.token в мкс, список импортированных модулей)"""
+    result = subprocess.run(
+        [sys.executable, '-S', '-X', 'importtime', '-c', 'import api.token'],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    modules = []
+    cumulative_us = None
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, self_us, total_us, name = (part.strip() for part in line.replace('import time:', '|', 1).split('|'))
+        modules.append(name)
+        if name == 'api.token':
+            cumulative_us = int(total_us)
+    return cumulative_us, modules
+
+def _first_token_ms() -> float:
+    result = subprocess.run(
+        [sys.executable, '-S', '-c', FIRST_TOKEN_SNIPPET],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.strip())
+
+def run(runs: int = 7) -> dict:
+    samples = []
+    modules = []
+    for _ in range(runs):
+        cumulative_us, modules = _importtime()
+        samples.append(cumulative_us)
+    first_token = [_first_token_ms() for _ in range(runs)]
+    
+    return {
+        'runs': runs,
+        'import_ms_median': round(statistics.median(samples) / 1000, 2),
+        'import_ms_min': round(min(samples) / 1000, 2),
+        'first_token_ms_median': round(statistics.median(first_token), 2),
+        'imported_module_count': len(modules),
+        'lazy_modules_imported': [m for m in modules if m in LAZY_MODULES],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--max-import-ms', type=float, default=40.0,
+                        help='Порог медианного времени импорта api.token')
+    args = parser.parse_args()
+    
+    report = run(args.runs)
+    failures = []
+    if report['lazy_modules_imported']:
+        failures.append(f"lazy modules imported at startup: {', '.join(report['lazy_modules_imported'])}")
+    if report['import_ms_median'] > args.max_import_ms:
+        failures.append(f"import time {report['import_ms_median']} ms > {args.max_import_ms} ms")
+    report['failures'] = failures
+    
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
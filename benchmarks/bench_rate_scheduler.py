@@ -0,0 +1,116 @@
+"""
+Бенчмарк планировщика запросов (rate_scheduler) против лимитов провайдера.
+Заглушка OpenAI ограничивает запросы и токены в минуту (бюджет выбирается
+не быстрее чем за --limit-window секунд), добавляет задержку ответа и долю
+случайных 429. Одно и то же число запросов отправляется из пула потоков:
+    naive      - напрямую через SDK с его встроенными повторами (max_retries=2);
+    scheduled  - через RequestScheduler: бюджеты из заголовков, AIMD, повторы с jitter.
+Сравниваются число ошибок, 429 на стороне сервера и пропускная способность
+относительно лимита.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_rate_scheduler.py --requests 100 --rpm-limit 600
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from openai import OpenAI
+
+from benchmarks.openai_stub import start_stub
+from rate_scheduler import RequestScheduler
+
+MESSAGES = [{'role': 'user', 'content': 'Создай .cursorrules для FastAPI сервиса ' * 10}]
+MAX_TOKENS = 100
+
+def _run_phase(server, requests: int, threads: int, send) -> dict:
+    rejected_before = server.rate_limited
+    errors = 0
+    
+    def one(i):
+        nonlocal errors
+        try:
+            send(i)
+        except Exception:
+            errors += 1
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(one, range(requests)))
+    wall = time.perf_counter() - start
+    return {
+        'wall_s': round(wall, 2),
+        'succeeded': requests - errors,
+        'errors': errors,
+        'server_429': server.rate_limited - rejected_before,
+        'requests_per_s': round((requests - errors) / wall, 2),
+    }
+
+def run(
+    requests: int = 100,
+    threads: int = 16,
+    rpm_limit: int = 600,
+    limit_window: float = 1.0,
+    latency: float = 0.2,
+    error_rate: float = 0.02
+) -> dict:
+    report = {
+        'requests': requests,
+        'threads': threads,
+        'rpm_limit': rpm_limit,
+        'limit_requests_per_s': round(rpm_limit / 60, 2),
+        'latency_s': latency,
+        'error_rate': error_rate,
+    }
+    for name in ('naive', 'scheduled'):
+        # Отдельная заглушка на фазу: бюджеты сервера начинают с нуля
+        server, base_url = start_stub(
+            completion_tokens=MAX_TOKENS, first_token_delay=latency,
+            rpm_limit=rpm_limit, limit_window=limit_window, error_rate=error_rate, seed=1
+        )
+        try:
+            if name == 'naive':
+                client = OpenAI(api_key='stub', base_url=base_url, max_retries=2)
+                send = lambda i: client.chat.completions.create(
+                    model='stub', messages=MESSAGES, max_tokens=MAX_TOKENS
+                )
+                report[name] = _run_phase(server, requests, threads, send)
+            else:
+                client = OpenAI(api_key='stub', base_url=base_url, max_retries=0)
+                scheduler = RequestScheduler(concurrency=4, max_concurrency=threads)
+                send = lambda i: scheduler.complete(
+                    client, 0, model='stub', messages=MESSAGES, max_tokens=MAX_TOKENS
+                )
+                report[name] = _run_phase(server, requests, threads, send)
+                report[name].update(
+                    (key, value) for key, value in scheduler.stats().items()
+                    if key in ('concurrency_limit', 'rate_limited', 'retries', 'failed', 'waited_s')
+                )
+            client.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--rpm-limit', type=int, default=600)
+    parser.add_argument('--limit-window', type=float, default=1.0)
+    parser.add_argument('--latency', type=float, default=0.2, help='Секунд до ответа заглушки')
+    parser.add_argument('--error-rate', type=float, default=0.02, help='Доля случайных 429')
+    args = parser.parse_args()
+    print(json.dumps(run(
+        args.requests, args.threads, args.rpm_limit, args.limit_window, args.latency, args.error_rate
+    ), indent=2, ensure_ascii=False))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Бенчмарк индекса похожих запросов (rules_index): скорость добавления записей,
+построения обратного индекса и поиска top-k по N синтетическим описаниям
+проектов. Описания собираются из стека технологий, типа проекта и слов
+предметной области с распределением Ципфа; запросы - перефразировки
+проиндексированных описаний. Отдельно замеряется проверка перед генерацией
+(search с min_score = порог повторного использования). Индекс пишется во
+временный каталог.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_rules_index.py --entries 100000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from rules_index import DEFAULT_REUSE_THRESHOLD, RulesIndex
+
+TECHNOLOGIES = (
+    'React', 'Next.js', 'Vue', 'Angular', 'Svelte', 'TypeScript', 'Python', 'FastAPI', 'Django', 'Flask',
+    'Node.js', 'Express', 'NestJS', 'Go', 'Rust', 'Java', 'Spring', 'Kotlin', 'Swift', 'Flutter',
+    'PostgreSQL', 'MySQL', 'MongoDB', 'Redis', 'Kafka', 'RabbitMQ', 'Docker', 'Kubernetes', 'GraphQL', 'gRPC',
+)
+KINDS = ('дашборд', 'интернет-магазин', 'мобильное приложение', 'API сервис', 'чат-бот', 'CRM', 'блог',
+         'admin panel', 'marketplace', 'landing page', 'ETL pipeline', 'SaaS')
+# Слова предметной области: синтетический словарь из случайных слов (без общих
+# префиксов, как у domain1, domain2, ...), частоты по Ципфу
+_LETTERS = random.Random(0)
+DOMAIN = [''.join(_LETTERS.choices('abcdefghijklmnopqrstuvwxyz', k=_LETTERS.randint(4, 11))) for _ in range(5000)]
+DOMAIN_WEIGHTS = [1 / (rank + 1) for rank in range(len(DOMAIN))]
+
+PARAPHRASES = (('Next.js', 'nextjs'), ('TypeScript', 'TS'), ('PostgreSQL', 'Postgres'),
+               ('admin panel', 'админка'), ('дашборд', 'dashboard'), ('Node.js', 'node'))
+
+def _description(rng: random.Random) -> str:
+    stack = rng.sample(TECHNOLOGIES, rng.randint(2, 5))
+    domain = rng.choices(DOMAIN, DOMAIN_WEIGHTS, k=rng.randint(3, 8))
+    return f"{rng.choice(KINDS)} на {' и '.join(stack)} для {' '.join(domain)}"
+
+def _paraphrase(description: str) -> str:
+    for original, replacement in PARAPHRASES:
+        description = description.replace(original, replacement)
+    return description.replace(' и ', ', ')
+
+def _percentile(samples, fraction: float) -> float:
+    return sorted(samples)[min(len(samples) - 1, int(len(samples) * fraction))]
+
+def run(entries: int = 100000, queries: int = 1000, seed: int = 1) -> dict:
+    rng = random.Random(seed)
+    descriptions = [_description(rng) for _ in range(entries)]
+    
+    with tempfile.TemporaryDirectory() as directory:
+        index = RulesIndex(directory)
+        rules_path = os.path.join(directory, 'rules.md')
+        start = time.perf_counter()
+        for description in descriptions:
+            index.add(description, None, rules_path, description)
+        add_s = time.perf_counter() - start
+        
+        # Повторное открытие: индекс читается из memory-mapped файлов
+        index = RulesIndex(directory)
+        start = time.perf_counter()
+        index.search(descriptions[0])
+        first_search_ms = (time.perf_counter() - start) * 1000
+        
+        targets = rng.sample(range(entries), min(queries, entries))
+        latencies = []
+        reuse_latencies = []
+        found = 0
+        reused = 0
+        for row in targets:
+            query = _paraphrase(descriptions[row])
+            start = time.perf_counter()
+            results = index.search(query, top_k=5)
+            latencies.append((time.perf_counter() - start) * 1000)
+            found += any(entry['query'] == descriptions[row] for _, entry in results)
+            
+            # Проверка перед генерацией: только записи не ниже порога повторного использования
+            start = time.perf_counter()
+            results = index.search(query, top_k=3, min_score=DEFAULT_REUSE_THRESHOLD)
+            reuse_latencies.append((time.perf_counter() - start) * 1000)
+            reused += any(entry['query'] == descriptions[row] for _, entry in results)
+    
+    return {
+        'entries': entries,
+        'queries': len(targets),
+        'add_per_s': round(entries / add_s),
+        'first_search_ms': round(first_search_ms, 1),
+        'search_p50_ms': round(statistics.median(latencies), 3),
+        'search_p99_ms': round(_percentile(latencies, 0.99), 3),
+        'paraphrase_recall_at_5': round(found / len(targets), 3),
+        'reuse_threshold': DEFAULT_REUSE_THRESHOLD,
+        'reuse_lookup_p50_ms': round(statistics.median(reuse_latencies), 3),
+        'reuse_lookup_p99_ms': round(_percentile(reuse_latencies, 0.99), 3),
+        'paraphrase_reuse_rate': round(reused / len(targets), 3),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=1000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.entries, args.queries), indent=2, ensure_ascii=False))
+
+if __name__ == '__main__':
+    main()
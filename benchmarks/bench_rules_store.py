@@ -0,0 +1,205 @@
+"""
+Бенчмарк истории правил (rules_store) против хранения полной копии каждой
+версии (zlib, отдельный файл на версию - то, что дала бы папка с архивом
+перезаписываемых rules.md).
+
+Тексты - правила из rag_livekit_cursorrules.md, livekit_rag_cursorrules.md и
+mm_agent_v2_cursorrules.md, по --projects проектов на каждый. Каждая генерация
+меняет 1-3 раздела (переформулированное правило, новое правило, удаленный
+или новый раздел), доля --repeat-share генераций повторяет прошлый текст
+(например, ответ из кэша или индекса похожих запросов).
+
+Метрики:
+- рост хранилища по мере генераций: байты полных копий и rules_store,
+  отношение stored/logical;
+- put_ms - сохранение версии (с fsync) против записи полной копии;
+- diff - соседние и далекие версии: rules_store.diff и compare (только
+  манифесты) против чтения двух полных копий и difflib.unified_diff по всему
+  тексту;
+- materialize_ms - запись версии в .md и .cursorrules.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_rules_store.py --projects 3 --generations 200
+"""
+import argparse
+import difflib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import zlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from rules_store import RulesStore, parse_markdown, split_sections
+from benchmarks.loadtest_token_server import percentile
+
+SOURCES = ('rag_livekit_cursorrules.md', 'livekit_rag_cursorrules.md', 'mm_agent_v2_cursorrules.md')
+VERBS = ('Use', 'Prefer', 'Always use', 'Consider', 'Avoid ad-hoc', 'Standardize on')
+
+def load_sources() -> list:
+    texts = []
+    for name in SOURCES:
+        with open(os.path.join(ROOT, name), encoding='utf-8') as f:
+            texts.append(parse_markdown(f.read())[2])
+    return texts
+
+def mutate(sections: list, generation: int, rng: random.Random) -> list:
+    """Новая генерация: 1-3 измененных раздела"""
+    sections = list(sections)
+    for _ in range(rng.randint(1, 3)):
+        index = rng.randrange(len(sections))
+        lines = sections[index].split('\n')
+        rules = [i for i, line in enumerate(lines) if line.startswith('- ')]
+        action = rng.random()
+        if action < 0.5 and rules:
+            i = rng.choice(rules)
+            lines[i] = f'- {rng.choice(VERBS)} {lines[i][2:].split(" ", 1)[-1]}'
+            sections[index] = '\n'.join(lines)
+        elif action < 0.75 and rules:
+            lines.insert(rules[-1] + 1, f'- Rule added in generation {generation}')
+            sections[index] = '\n'.join(lines)
+        elif action < 0.85 and len(sections) > 4:
+            del sections[index]
+        else:
+            sections.insert(index, f'## Generation {generation} Notes\n- Rule added in generation {generation}\n\n')
+    return sections
+
+def _write_copy(path: str, text: str):
+    with open(path, 'wb') as f:
+        f.write(zlib.compress(text.encode('utf-8')))
+        f.flush()
+        os.fsync(f.fileno())
+
+def _read_copy(path: str) -> str:
+    with open(path, 'rb') as f:
+        return zlib.decompress(f.read()).decode('utf-8')
+
+def _dir_bytes(directory: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(directory) for name in files)
+
+def _ms(values: list) -> dict:
+    values = sorted(values)
+    return {
+        'p50': round(percentile(values, 0.50) * 1000, 3),
+        'p99': round(percentile(values, 0.99) * 1000, 3),
+    }
+
+def run(projects: int = 3, generations: int = 200, repeat_share: float = 0.2, seed: int = 1) -> dict:
+    rng = random.Random(seed)
+    sources = load_sources()
+    checkpoints = sorted({max(1, generations // 10), max(1, generations // 2), generations})
+    
+    with tempfile.TemporaryDirectory() as directory:
+        store = RulesStore(os.path.join(directory, 'store'))
+        copies = os.path.join(directory, 'copies')
+        os.makedirs(copies)
+        states = [
+            (f'project-{i}', split_sections(sources[i % len(sources)]), [])
+            for i in range(projects * len(sources))
+        ]
+        
+        put_times, copy_times, growth = [], [], []
+        logical = 0
+        for generation in range(1, generations + 1):
+            for project, sections, history in states:
+                if history and rng.random() < repeat_share:
+                    text = history[rng.randrange(len(history))]
+                else:
+                    sections[:] = mutate(sections, generation, rng)
+                    text = ''.join(sections)
+                history.append(text)
+                logical += len(text.encode('utf-8'))
+                
+                start = time.perf_counter()
+                store.put(project, text)
+                put_times.append(time.perf_counter() - start)
+                
+                start = time.perf_counter()
+                _write_copy(os.path.join(copies, f'{project}.{len(history)}'), text)
+                copy_times.append(time.perf_counter() - start)
+            if generation in checkpoints:
+                stats = store.stats()
+                growth.append({
+                    'generations': generation,
+                    'logical_bytes': logical,
+                    'full_copies_zlib_bytes': _dir_bytes(copies),
+                    'store_bytes': stats['stored_bytes'],
+                    'store_blobs': stats['blobs'],
+                    'store_versions': stats['versions'],
+                    'store_to_logical': round(stats['stored_bytes'] / logical, 4),
+                })
+        
+        # Версии в хранилище - только генерации, отличающиеся от предыдущей
+        project, _, history = states[0]
+        versions = store.versions(project)
+        pairs = {
+            'adjacent': [(v.version - 1, v.version) for v in versions[1:]][-50:],
+            'far': [(1, v.version) for v in versions[-10:]],
+        }
+        # Номер версии -> номер полной копии с тем же текстом (копия пишется на каждую генерацию)
+        first_copy = {}
+        for generation, text in enumerate(history, start=1):
+            first_copy.setdefault(text, generation)
+        copy_for = {version.version: first_copy[store.text(project, version.version)] for version in versions}
+        diff = {}
+        for kind, selected in pairs.items():
+            store_times, compare_times, naive_times, changed = [], [], [], 0
+            for old, new in selected:
+                start = time.perf_counter()
+                store.compare(project, old, new)
+                compare_times.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                patch = store.diff(project, old, new)
+                store_times.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                a = _read_copy(os.path.join(copies, f'{project}.{copy_for[old]}')).splitlines(True)
+                b = _read_copy(os.path.join(copies, f'{project}.{copy_for[new]}')).splitlines(True)
+                reference = ''.join(difflib.unified_diff(a, b))
+                naive_times.append(time.perf_counter() - start)
+                changed += bool(patch) == bool(reference)
+            diff[kind] = {
+                'pairs': len(selected),
+                'store_ms': _ms(store_times),
+                'store_compare_ms': _ms(compare_times),
+                'full_copy_difflib_ms': _ms(naive_times),
+                'agree_on_changed': changed,
+            }
+        
+        materialize_times = []
+        for version in versions[-20:]:
+            start = time.perf_counter()
+            store.materialize(project, version.version, [
+                os.path.join(directory, 'out', 'rules.md'), os.path.join(directory, 'out', '.cursorrules')
+            ])
+            materialize_times.append(time.perf_counter() - start)
+        with open(os.path.join(directory, 'out', '.cursorrules'), encoding='utf-8') as f:
+            roundtrip = f.read() == store.text(project, versions[-1].version)
+        
+        return {
+            'projects': len(states),
+            'generations': generations,
+            'growth': growth,
+            'store_to_full_copies': round(growth[-1]['store_bytes'] / growth[-1]['full_copies_zlib_bytes'], 4),
+            'put_ms': _ms(put_times),
+            'full_copy_write_ms': _ms(copy_times),
+            'diff': diff,
+            'materialize_ms': _ms(materialize_times),
+            'materialize_roundtrip': roundtrip,
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--projects', type=int, default=3, help='Проектов на каждый исходный файл правил')
+    parser.add_argument('--generations', type=int, default=200)
+    parser.add_argument('--repeat-share', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    print(json.dumps(run(args.projects, args.generations, args.repeat_share, args.seed), indent=2))
+
+if __name__ == '__main__':
+    main()
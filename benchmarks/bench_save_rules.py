@@ -0,0 +1,84 @@
+"""
+Бенчмарк записи правил через main.save_rules_md (rules_writer): файлов в
+секунду и МБ/с для текста правил типичного размера и для крупного текста.
+Текст передается строкой и потоком мелких фрагментов (как из
+stream_cursorrules); отдельно - запись .md вместе с .cursorrules за один
+проход. Файлы пишутся во временный каталог, каждая запись - с fsync.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_save_rules.py --writes 200 --sizes 20000 1000000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+os.environ.setdefault('OPENAI_API_KEY', 'stub')
+# Измеряется только запись файлов; история версий - в bench_rules_store.py
+os.environ.setdefault('RULES_STORE_DISABLE', '1')
+
+from main import save_rules_md
+
+WORDS = ('используй', 'TypeScript', 'компоненты', 'React', 'тесты', 'pytest', 'типизация', 'async', 'API', 'ошибки')
+# Средний размер фрагмента при стриминге completion
+STREAM_CHUNK_CHARS = 16
+
+def _rules_text(size: int, seed: int = 1) -> str:
+    rng = random.Random(seed)
+    lines = []
+    length = 0
+    while length < size:
+        line = '- ' + ' '.join(rng.choices(WORDS, k=rng.randint(4, 12)))
+        lines.append(line)
+        length += len(line) + 1
+    return '\n'.join(lines)[:size]
+
+def _chunks(text: str):
+    for i in range(0, len(text), STREAM_CHUNK_CHARS):
+        yield text[i:i + STREAM_CHUNK_CHARS]
+
+def _measure(text: str, writes: int, directory: str, stream: bool, with_cursorrules: bool) -> dict:
+    filename = os.path.join(directory, 'rules.md')
+    cursorrules_path = os.path.join(directory, '.cursorrules') if with_cursorrules else None
+    start = time.perf_counter()
+    for _ in range(writes):
+        save_rules_md(_chunks(text) if stream else text, filename, cursorrules_path=cursorrules_path)
+    wall = time.perf_counter() - start
+    written = os.path.getsize(filename) + (os.path.getsize(cursorrules_path) if with_cursorrules else 0)
+    return {
+        'writes_per_sec': round(writes / wall, 1),
+        'mb_per_sec': round(written * writes / wall / 1e6, 2),
+    }
+
+def run(writes: int = 200, sizes=(20000, 1000000)) -> dict:
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            text = _rules_text(size)
+            # Крупные файлы пишутся реже, чтобы прогон занимал сравнимое время
+            count = max(20, writes * min(sizes) // size)
+            results.append({
+                'size_chars': size,
+                'writes': count,
+                'string': _measure(text, count, directory, stream=False, with_cursorrules=False),
+                'stream': _measure(text, count, directory, stream=True, with_cursorrules=False),
+                'string_with_cursorrules': _measure(text, count, directory, stream=False, with_cursorrules=True),
+            })
+    return {'stream_chunk_chars': STREAM_CHUNK_CHARS, 'results': results}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writes', type=int, default=200)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[20000, 1000000])
+    args = parser.parse_args()
+    print(json.dumps(run(args.writes, args.sizes), indent=2, ensure_ascii=False))
+
+if __name__ == '__main__':
+    main()
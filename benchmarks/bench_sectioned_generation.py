@@ -0,0 +1,86 @@
+"""
+Бенчмарк посекционной генерации: время перегенерации .cursorrules после
+изменения одного уточнения - целым документом против генерации по разделам
+с кэшем каждого раздела. Модель заменена локальной заглушкой со скоростью
+token_delay секунд на токен, кэш ответов - временный файл.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_sectioned_generation.py --token-delay 0.002
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.openai_stub import start_stub
+
+os.environ.setdefault('OPENAI_API_KEY', 'stub')
+# Замеряем запросы к модели, а не повторное использование сохраненных правил
+os.environ['RULES_REUSE_THRESHOLD'] = '0'
+
+import main as cursorrules
+from rules_cache import ResponseCache
+from rules_sections import SECTIONS, section_keys
+
+PROJECT = 'SaaS дашборд на Next.js и FastAPI с PostgreSQL'
+CLARIFICATIONS = {
+    'Какой стиль кода принят в команде?': 'ESLint + Prettier, строгий TypeScript',
+    'Как вы тестируете код?': 'pytest и Playwright',
+    'Есть ли требования к безопасности?': 'OAuth2, секреты в Vault',
+    'Какая нагрузка ожидается?': 'до 500 RPS, кэш в Redis',
+}
+EDITED = dict(CLARIFICATIONS, **{'Как вы тестируете код?': 'pytest, Playwright и контрактные тесты'})
+
+def _timed(server, generate, clarifications) -> dict:
+    requests_before = server.requests
+    start = time.perf_counter()
+    rules = generate(PROJECT, clarifications)
+    return {
+        'wall_s': round(time.perf_counter() - start, 3),
+        'model_requests': server.requests - requests_before,
+        'chars': len(rules),
+    }
+
+def run(token_delay: float = 0.002) -> dict:
+    server, base_url = start_stub(completion_tokens=cursorrules.RULES_MAX_TOKENS, token_delay=token_delay)
+    os.environ['OPENAI_BASE_URL'] = base_url
+    with tempfile.TemporaryDirectory() as directory:
+        cache = ResponseCache(os.path.join(directory, 'responses.sqlite3'))
+        generator = cursorrules.CursorRulesGenerator(cache=cache)
+        try:
+            report = {
+                'token_delay_s': token_delay,
+                'sections': len(SECTIONS),
+                'invalidated_sections': section_keys(CLARIFICATIONS, EDITED),
+                'whole_document': {
+                    'initial': _timed(server, generator.generate_cursorrules, CLARIFICATIONS),
+                    'after_edit': _timed(server, generator.generate_cursorrules, EDITED),
+                },
+                'sectioned': {
+                    'initial': _timed(server, generator.generate_sectioned, CLARIFICATIONS),
+                    'after_edit': _timed(server, generator.generate_sectioned, EDITED),
+                },
+            }
+        finally:
+            server.shutdown()
+            server.server_close()
+    
+    report['edit_speedup'] = round(
+        report['whole_document']['after_edit']['wall_s'] / report['sectioned']['after_edit']['wall_s'], 1
+    )
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--token-delay', type=float, default=0.002, help='Секунд на токен в заглушке')
+    args = parser.parse_args()
+    print(json.dumps(run(args.token_delay), indent=2, ensure_ascii=False))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Бенчмарк пакетного выпуска токенов: N одиночных POST против одного
+пакетного POST с N записями к TokenHandler на localhost.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_token_batch.py --sizes 10 100 1000
+"""
+import argparse
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+from http.server import HTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+os.environ.setdefault('LIVEKIT_API_KEY', 'bench-key')
+os.environ.setdefault('LIVEKIT_API_SECRET', 'bench-secret-0123456789abcdef0123456789abcdef')
+
+from api import token as token_api
+
+class _QuietHandler(token_api.TokenHandler):
+    def log_message(self, format, *args):
+        pass
+
+def _post(port: int, payload) -> bytes:
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    body = json.dumps(payload)
+    conn.request('POST', '/', body=body, headers={'Content-Type': 'application/json', 'Cache-Control': 'no-cache'})
+    response = conn.getresponse()
+    data = response.read()
+    conn.close()
+    if response.status != 200:
+        raise RuntimeError(f'HTTP {response.status}: {data[:200]!r}')
+    return data
+
+def run(sizes=(10, 100, 1000)) -> dict:
+    server = HTTPServer(('127.0.0.1', 0), _QuietHandler)
+    port = server.server_address[1]
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    
+    results = []
+    try:
+        for n in sizes:
+            entries = [{'roomName': f'room-{i % 10}', 'participantName': f'agent-{i}', 'ttl': 3600} for i in range(n)]
+            
+            start = time.perf_counter()
+            for entry in entries:
+                _post(port, entry)
+            single_wall = time.perf_counter() - start
+            
+            start = time.perf_counter()
+            data = _post(port, {'batch': entries})
+            batch_wall = time.perf_counter() - start
+            
+            tokens = sum(1 for r in json.loads(data)['results'] if 'token' in r)
+            results.append({
+                'entries': n,
+                'tokens_returned': tokens,
+                'single_wall_s': round(single_wall, 4),
+                'single_tokens_per_sec': round(n / single_wall),
+                'batch_wall_s': round(batch_wall, 4),
+                'batch_tokens_per_sec': round(n / batch_wall),
+                'speedup': round(single_wall / batch_wall, 2),
+            })
+    finally:
+        server.shutdown()
+        server.server_close()
+    
+    return {'stream_threshold': token_api.BATCH_STREAM_THRESHOLD, 'results': results}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000])
+    args = parser.parse_args()
+    print(json.dumps(run(args.sizes), indent=2))
+
+if __name__ == '__main__':
+    main()
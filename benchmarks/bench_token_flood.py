@@ -0,0 +1,223 @@
+"""
+Бенчмарк устойчивости TokenServer к мусорному трафику: латентность
+легитимных запросов (keep-alive клиенты, как в loadtest_token_server)
+без атаки и во время атаки.
+
+Фазы:
+    baseline   - только легитимные клиенты;
+    oversized  - атакующие шлют POST с телом --oversized-mb МБ;
+    slowloris  - атакующие объявляют небольшое тело и присылают его по байту;
+    invalid    - атакующие шлют тела с неверной схемой (длинные имена, управляющие символы, не JSON).
+Атакующие работают в отдельном процессе, чтобы не делить GIL с легитимными клиентами.
+Для каждой фазы: p50/p99 и ошибки легитимных запросов, число атакующих
+запросов и статусы, которыми сервер их отклонил (reset - соединение
+закрыто до ответа).
+
+Запуск из корня репозитория:
+    python benchmarks/bench_token_flood.py --duration 3 --clients 4 --attackers 8
+    python benchmarks/bench_token_flood.py --url http://127.0.0.1:8000
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.loadtest_token_server import percentile, start_server
+
+PHASES = ('baseline', 'oversized', 'slowloris', 'invalid')
+
+INVALID_BODIES = (
+    json.dumps({'roomName': 'r' * 10000, 'participantName': 'user'}).encode('utf-8'),
+    b'{"roomName": "room\\u0000", "participantName": "user"}',
+    b'{"roomName": ' + b'[' * 5000 + b']' * 5000 + b'}',
+    b'not json at all ' * 100,
+)
+
+def _legit_client(host: str, port: int, stop: threading.Event, latencies: list, errors: list, worker_id: int):
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    i = 0
+    while not stop.is_set():
+        body = json.dumps({'roomName': f'room-{worker_id}', 'participantName': f'user-{worker_id}-{i}'})
+        i += 1
+        start = time.perf_counter()
+        try:
+            conn.request('POST', '/', body=body, headers={'Content-Type': 'application/json'})
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+                continue
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(type(e).__name__)
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+
+def _status(sock: socket.socket) -> str:
+    """Код ответа из первой строки или 'reset', если сервер закрыл соединение молча"""
+    try:
+        line = sock.makefile('rb').readline()
+    except OSError:
+        return 'reset'
+    parts = line.split()
+    return parts[1].decode('ascii') if len(parts) > 1 else 'reset'
+
+def _attack_once(host: str, port: int, phase: str, oversized_mb: int, attempt: int) -> str:
+    with socket.create_connection((host, port), timeout=30) as sock:
+        if phase == 'oversized':
+            size = oversized_mb * 1024 * 1024
+            sock.sendall(b'POST / HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n'
+                         b'Content-Length: %d\r\n\r\n' % size)
+            chunk = b'x' * 65536
+            try:
+                for _ in range(size // len(chunk)):
+                    sock.sendall(chunk)
+            except OSError:
+                pass
+        elif phase == 'slowloris':
+            body = json.dumps({'roomName': 'room', 'participantName': 'slow' * 50}).encode('utf-8')
+            sock.sendall(b'POST / HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n'
+                         b'Content-Length: %d\r\n\r\n' % len(body))
+            try:
+                for byte in body:
+                    sock.sendall(bytes((byte,)))
+                    time.sleep(0.2)
+            except OSError:
+                pass
+        else:
+            body = INVALID_BODIES[attempt % len(INVALID_BODIES)]
+            sock.sendall(b'POST / HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n'
+                         b'Connection: close\r\nContent-Length: %d\r\n\r\n%s' % (len(body), body))
+        return _status(sock)
+
+def _attacker(host: str, port: int, phase: str, oversized_mb: int, deadline: float, statuses: Counter):
+    attempt = 0
+    while time.time() < deadline:
+        try:
+            statuses[_attack_once(host, port, phase, oversized_mb, attempt)] += 1
+        except OSError:
+            statuses['reset'] += 1
+        attempt += 1
+
+def _attack_process(host: str, port: int, phase: str, attackers: int, oversized_mb: int, deadline: float, queue):
+    statuses = Counter()
+    threads = [
+        threading.Thread(target=_attacker, args=(host, port, phase, oversized_mb, deadline, statuses), daemon=True)
+        for _ in range(attackers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    queue.put(dict(statuses))
+
+def run_phase(host: str, port: int, phase: str, duration: float, clients: int, attackers: int, oversized_mb: int) -> dict:
+    attack = None
+    queue = multiprocessing.Queue()
+    if phase != 'baseline':
+        attack = multiprocessing.Process(
+            target=_attack_process,
+            args=(host, port, phase, attackers, oversized_mb, time.time() + duration, queue)
+        )
+        attack.start()
+        # Даем атаке разогнаться до начала замера
+        time.sleep(min(0.5, duration / 4))
+    
+    stop = threading.Event()
+    latencies: list = []
+    errors: list = []
+    threads = [
+        threading.Thread(target=_legit_client, args=(host, port, stop, latencies, errors, n))
+        for n in range(clients)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    
+    result = {'phase': phase}
+    latencies.sort()
+    result.update({
+        'requests': len(latencies),
+        'errors': len(errors),
+        'rps': round(len(latencies) / wall),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+    })
+    if attack is not None:
+        statuses = queue.get()
+        attack.join()
+        result['attack_requests'] = sum(statuses.values())
+        result['attack_statuses'] = dict(sorted(statuses.items()))
+    return result
+
+def run(
+    url: str = None,
+    duration: float = 3.0,
+    clients: int = 4,
+    attackers: int = 8,
+    oversized_mb: int = 16,
+    workers: int = 32,
+    body_timeout: float = 2.0
+) -> dict:
+    process = None
+    if url:
+        parts = urlsplit(url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        process, port = start_server(workers, ('--body-timeout', str(body_timeout)))
+        host = '127.0.0.1'
+    
+    try:
+        phases = [run_phase(host, port, phase, duration, clients, attackers, oversized_mb) for phase in PHASES]
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+    
+    baseline = phases[0]
+    for phase in phases[1:]:
+        phase['p99_vs_baseline'] = round(phase['p99_ms'] / baseline['p99_ms'], 2) if baseline['p99_ms'] else None
+    return {
+        'url': url or f'http://{host}:{port}/',
+        'workers': workers,
+        'body_timeout_s': body_timeout,
+        'clients': clients,
+        'attackers': attackers,
+        'oversized_mb': oversized_mb,
+        'phases': phases,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Уже запущенный сервер; без него поднимается python -m api.token')
+    parser.add_argument('--duration', type=float, default=3.0, help='Секунд на фазу')
+    parser.add_argument('--clients', type=int, default=4, help='Легитимных keep-alive клиентов')
+    parser.add_argument('--attackers', type=int, default=8, help='Атакующих соединений одновременно')
+    parser.add_argument('--oversized-mb', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=32)
+    parser.add_argument('--body-timeout', type=float, default=2.0)
+    args = parser.parse_args()
+    print(json.dumps(run(
+        args.url, args.duration, args.clients, args.attackers, args.oversized_mb, args.workers, args.body_timeout
+    ), indent=2))
+
+if __name__ == '__main__':
+    main()
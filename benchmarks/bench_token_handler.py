@@ -0,0 +1,100 @@
+"""
+Бенчмарк Vercel handler из api/token.py: холодный и теплый вызов.
+
+- cold: новый интерпретатор (-S, как в bench_import_time) импортирует api.token
+  и обрабатывает первый POST; замеряется время от начала импорта до ответа,
+  отдельно - сам первый вызов handler;
+- warm: повторные вызовы в одном процессе, p50/p99 на запрос для выпуска
+  нового токена (noCache) и для попадания в кеш токенов.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_token_handler.py --cold-runs 7 --iterations 20000
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+os.environ.setdefault('LIVEKIT_API_KEY', 'bench-key')
+os.environ.setdefault('LIVEKIT_API_SECRET', 'bench-secret-0123456789abcdef0123456789abcdef')
+
+from api import token as token_api
+
+COLD_SNIPPET = (
+    "import time; started = time.perf_counter(); "
+    "import api.token as t; imported = time.perf_counter(); "
+    "R = type('R', (dict,), {'method': 'POST'}); "
+    "response = t.handler(R(body='{\"roomName\": \"room\", \"participantName\": \"user\"}'), None); "
+    "finished = time.perf_counter(); "
+    "assert response['statusCode'] == 200, response; "
+    "print((finished - started) * 1000, (finished - imported) * 1000)"
+)
+
+class _Request(dict):
+    method = 'POST'
+
+def _percentile(samples, fraction: float) -> float:
+    return sorted(samples)[min(len(samples) - 1, int(len(samples) * fraction))]
+
+def _cold() -> tuple:
+    """Возвращает (мс от начала импорта до ответа, мс первого вызова handler)"""
+    result = subprocess.run(
+        [sys.executable, '-S', '-c', COLD_SNIPPET],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    total_ms, first_call_ms = result.stdout.split()
+    return float(total_ms), float(first_call_ms)
+
+def _warm(requests: list) -> list:
+    latencies = []
+    for request in requests:
+        start = time.perf_counter()
+        token_api.handler(request, None)
+        latencies.append((time.perf_counter() - start) * 1e6)
+    return latencies
+
+def run(cold_runs: int = 7, iterations: int = 20000) -> dict:
+    cold = [_cold() for _ in range(cold_runs)]
+    
+    fresh = [
+        _Request(body=json.dumps({'roomName': 'bench-room', 'participantName': f'user-{i}', 'noCache': True}))
+        for i in range(iterations)
+    ]
+    cached = [
+        _Request(body=json.dumps({'roomName': 'bench-room', 'participantName': f'user-{i % 100}'}))
+        for i in range(iterations)
+    ]
+    # Прогрев: минтер, кеш токенов и метрики создаются на первом запросе
+    _warm(fresh[:200])
+    _warm(cached[:200])
+    fresh_latencies = _warm(fresh)
+    cached_latencies = _warm(cached)
+    
+    return {
+        'cold_runs': cold_runs,
+        'iterations': iterations,
+        'cold_total_ms_median': round(statistics.median(total for total, _ in cold), 2),
+        'cold_first_call_ms_median': round(statistics.median(first for _, first in cold), 3),
+        'warm_p50_us': round(statistics.median(fresh_latencies), 2),
+        'warm_p99_us': round(_percentile(fresh_latencies, 0.99), 2),
+        'warm_cached_p50_us': round(statistics.median(cached_latencies), 2),
+        'warm_cached_p99_us': round(_percentile(cached_latencies, 0.99), 2),
+        'warm_requests_per_sec': round(iterations / (sum(fresh_latencies) / 1e6)),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cold-runs', type=int, default=7)
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.cold_runs, args.iterations), indent=2))
+
+if __name__ == '__main__':
+    main()
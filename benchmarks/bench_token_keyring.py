@@ -0,0 +1,206 @@
+"""
+Бенчмарк подписи через keyring (несколько ключей с окнами действия и
+горячей перезагрузкой файла) против одного ключа из окружения:
+- mint: токенов в секунду через TokenMinter и через keyring.minter() + mint
+  (выбор активного ключа на каждый токен), накладные расходы в мкс;
+- handler: Vercel handler (noCache) с ключом из окружения и с keyring;
+- rotation: файл ключей переписывается каждые --rotate-every секунд (новый
+  kid с окном, начинающимся сразу), пока потоки выпускают токены через
+  get_minter. Латентность выпуска p50/p99/max, число перезагрузок, запросы
+  без активного ключа и доля токенов, прошедших проверку TokenVerifier.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_token_keyring.py --iterations 50000 --duration 3
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+API_KEY = 'bench-key'
+API_SECRET = 'bench-secret-0123456789abcdef0123456789abcdef'
+os.environ.setdefault('LIVEKIT_API_KEY', API_KEY)
+os.environ.setdefault('LIVEKIT_API_SECRET', API_SECRET)
+
+from api import token as token_api
+from benchmarks.loadtest_token_server import percentile
+
+class _Request(dict):
+    method = 'POST'
+
+def _write_keyring(path: str, generation: int, now: float):
+    """Текущий ключ generation и предыдущий, выведенный из подписи с этого момента"""
+    keys = [{
+        'kid': f'gen-{generation}',
+        'api_key': f'{API_KEY}-{generation}',
+        'api_secret': f'{API_SECRET}-{generation}',
+        'not_before': now,
+    }]
+    if generation > 0:
+        keys.append({
+            'kid': f'gen-{generation - 1}',
+            'api_key': f'{API_KEY}-{generation - 1}',
+            'api_secret': f'{API_SECRET}-{generation - 1}',
+            'not_after': now,
+        })
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'keys': keys}, f)
+    # Атомарная замена: читатель видит либо старый, либо новый файл целиком
+    os.replace(tmp, path)
+
+def _mint(iterations: int, rounds: int, keyring) -> dict:
+    minter = token_api.TokenMinter(API_KEY, API_SECRET)
+    names = [(f'room-{i % 100}', f'user-{i}') for i in range(iterations)]
+    single, rotating = [], []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for room, participant in names:
+            minter.mint(room, participant)
+        single.append(iterations / (time.perf_counter() - start))
+        start = time.perf_counter()
+        for room, participant in names:
+            keyring.minter().mint(room, participant)
+        rotating.append(iterations / (time.perf_counter() - start))
+    base, with_keyring = max(single), max(rotating)
+    return {
+        'single_key_tokens_per_sec': round(base),
+        'keyring_tokens_per_sec': round(with_keyring),
+        'overhead_us_per_token': round((1 / with_keyring - 1 / base) * 1e6, 3),
+    }
+
+def _handler_rps(iterations: int) -> float:
+    requests = [
+        _Request(body=json.dumps({'roomName': f'room-{i % 100}', 'participantName': f'user-{i}', 'noCache': True}))
+        for i in range(iterations)
+    ]
+    start = time.perf_counter()
+    for request in requests:
+        token_api.handler(request, None)
+    return iterations / (time.perf_counter() - start)
+
+def _use_keyring(keyring):
+    token_api._keyring = keyring
+    token_api._keyring_loaded = True
+    token_api._minter = None
+    token_api._verifier = None
+
+def _handler(iterations: int, rounds: int, keyring) -> dict:
+    _handler_rps(500)
+    single, rotating = [], []
+    for _ in range(rounds):
+        _use_keyring(None)
+        single.append(_handler_rps(iterations))
+        _use_keyring(keyring)
+        rotating.append(_handler_rps(iterations))
+    _use_keyring(None)
+    return {
+        'single_key_rps': round(max(single)),
+        'keyring_rps': round(max(rotating)),
+    }
+
+def _rotation(path: str, duration: float, rotate_every: float, threads: int, poll_interval: float) -> dict:
+    _write_keyring(path, 0, time.time())
+    keyring = token_api.TokenKeyring(path, poll_interval=poll_interval)
+    verifier = token_api.TokenVerifier(None, None, cache_size=0, keyring=keyring)
+    _use_keyring(keyring)
+    
+    stop = threading.Event()
+    results = [([], [], []) for _ in range(threads)]
+    
+    def worker(latencies: list, tokens: list, failures: list):
+        i = 0
+        while not stop.is_set():
+            start = time.perf_counter()
+            minter = token_api.get_minter()
+            if minter is None:
+                failures.append(i)
+            else:
+                token = minter.mint('room', f'user-{i}')
+                latencies.append(time.perf_counter() - start)
+                if i % 50 == 0:
+                    tokens.append(token)
+            i += 1
+    
+    workers = [threading.Thread(target=worker, args=result) for result in results]
+    for thread in workers:
+        thread.start()
+    generation = 0
+    deadline = time.time() + duration
+    while time.time() < deadline:
+        time.sleep(rotate_every)
+        generation += 1
+        _write_keyring(path, generation, time.time())
+    stop.set()
+    for thread in workers:
+        thread.join()
+    
+    latencies = sorted(value for result in results for value in result[0])
+    tokens = [token for result in results for token in result[1]]
+    failures = sum(len(result[2]) for result in results)
+    # Проверяем по последнему файлу: в нем текущий и предыдущий ключи,
+    # токены более старых поколений ожидаемо отклоняются как unknown_key
+    reasons = {}
+    for token in tokens:
+        try:
+            verifier.verify(token)
+            reason = 'ok'
+        except token_api.TokenVerificationError as e:
+            reason = e.reason
+        reasons[reason] = reasons.get(reason, 0) + 1
+    _use_keyring(None)
+    return {
+        'duration_s': duration,
+        'rotations': generation,
+        'reloads': keyring.reloads,
+        'threads': threads,
+        'tokens': len(latencies),
+        'no_active_key': failures,
+        'mint_p50_us': round(percentile(latencies, 0.50) * 1e6, 2),
+        'mint_p99_us': round(percentile(latencies, 0.99) * 1e6, 2),
+        'mint_max_us': round(latencies[-1] * 1e6, 2) if latencies else None,
+        'verified_sample': reasons,
+        'last_error': keyring.last_error,
+    }
+
+def run(
+    iterations: int = 20000,
+    rounds: int = 3,
+    duration: float = 2.0,
+    rotate_every: float = 0.1,
+    threads: int = 4,
+    poll_interval: float = 0.05
+) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'keyring.json')
+        _write_keyring(path, 0, time.time())
+        keyring = token_api.TokenKeyring(path)
+        return {
+            'iterations': iterations,
+            'mint': _mint(iterations, rounds, keyring),
+            'handler': _handler(iterations, rounds, keyring),
+            'rotation': _rotation(path, duration, rotate_every, threads, poll_interval),
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--duration', type=float, default=2.0, help='Секунд ротации под нагрузкой')
+    parser.add_argument('--rotate-every', type=float, default=0.1, help='Интервал перезаписи файла ключей')
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--poll-interval', type=float, default=0.05)
+    args = parser.parse_args()
+    print(json.dumps(run(
+        args.iterations, args.rounds, args.duration, args.rotate_every, args.threads, args.poll_interval
+    ), indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Бенчмарк накладных расходов метрик: Vercel handler с включенными
+метриками (хуки стадий, гистограммы, счетчики) против выключенных.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_token_metrics.py --iterations 50000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+os.environ.setdefault('LIVEKIT_API_KEY', 'bench-key')
+os.environ.setdefault('LIVEKIT_API_SECRET', 'bench-secret-0123456789abcdef0123456789abcdef')
+
+from api import token as token_api
+
+class _Request(dict):
+    method = 'POST'
+
+def _requests_per_second(iterations: int) -> float:
+    requests = [
+        _Request(body=json.dumps({'roomName': 'bench-room', 'participantName': f'user-{i}', 'noCache': True}))
+        for i in range(iterations)
+    ]
+    start = time.perf_counter()
+    for request in requests:
+        token_api.handler(request, None)
+    return iterations / (time.perf_counter() - start)
+
+def run(iterations: int = 20000, rounds: int = 3) -> dict:
+    metrics = token_api.get_metrics() or token_api.TokenMetrics()
+    
+    def enable():
+        token_api._metrics = metrics
+        if metrics.observe_stage not in token_api._stage_hooks:
+            token_api.add_stage_hook(metrics.observe_stage)
+    
+    def disable():
+        token_api._metrics = None
+        if metrics.observe_stage in token_api._stage_hooks:
+            token_api.remove_stage_hook(metrics.observe_stage)
+    
+    _requests_per_second(500)
+    
+    # Чередуем режимы и берем лучший результат, чтобы сгладить шум
+    without, with_metrics = [], []
+    for _ in range(rounds):
+        disable()
+        without.append(_requests_per_second(iterations))
+        enable()
+        with_metrics.append(_requests_per_second(iterations))
+    
+    base, instrumented = max(without), max(with_metrics)
+    return {
+        'iterations': iterations,
+        'rps_without_metrics': round(base),
+        'rps_with_metrics': round(instrumented),
+        'overhead_us_per_request': round((1 / instrumented - 1 / base) * 1e6, 2),
+        'overhead_percent': round((base / instrumented - 1) * 100, 1),
+        'recorded_requests': sum(metrics.snapshot()['requests_by_status'].values()),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+    print(json.dumps(run(args.iterations, args.rounds), indent=2))
+
+if __name__ == '__main__':
+    main()
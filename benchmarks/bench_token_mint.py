@@ -0,0 +1,67 @@
+"""
+Микробенчмарк выпуска LiveKit токенов: generate_livekit_token (PyJWT)
+против TokenMinter (предвычисленные HMAC-ключ и фрагменты claims).
+
+Запуск из корня репозитория:
+    python benchmarks/bench_token_mint.py --iterations 50000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from api import token as token_api
+
+API_KEY = 'bench-key'
+API_SECRET = 'bench-secret-0123456789abcdef0123456789abcdef'
+
+def _tokens_per_second(mint, iterations: int) -> float:
+    start = time.perf_counter()
+    for i in range(iterations):
+        mint('bench-room', f'user-{i}')
+    return iterations / (time.perf_counter() - start)
+
+def check_identical() -> bool:
+    """Проверяет, что минтер выдает тот же токен, что и PyJWT-путь"""
+    minter = token_api.TokenMinter(API_KEY, API_SECRET)
+    for _ in range(3):
+        now = int(time.time())
+        reference = token_api.generate_livekit_token(API_KEY, API_SECRET, 'room-ю', 'участник "1"')
+        if now == int(time.time()):
+            return reference == minter.mint('room-ю', 'участник "1"', now=now)
+    return False
+
+def run(iterations: int = 20000) -> dict:
+    minter = token_api.TokenMinter(API_KEY, API_SECRET)
+    
+    def pyjwt_mint(room_name, participant_name):
+        return token_api.generate_livekit_token(API_KEY, API_SECRET, room_name, participant_name)
+    
+    # Прогрев
+    _tokens_per_second(pyjwt_mint, 200)
+    _tokens_per_second(minter.mint, 200)
+    
+    baseline = _tokens_per_second(pyjwt_mint, iterations)
+    engine = _tokens_per_second(minter.mint, iterations)
+    
+    return {
+        'iterations': iterations,
+        'identical_output': check_identical(),
+        'pyjwt_tokens_per_sec': round(baseline),
+        'minter_tokens_per_sec': round(engine),
+        'speedup': round(engine / baseline, 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.iterations), indent=2))
+
+if __name__ == '__main__':
+    main()
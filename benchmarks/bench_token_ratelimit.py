@@ -0,0 +1,133 @@
+"""
+Бенчмарк квот выпуска токенов (TokenRateLimiter):
+- overhead: Vercel handler с квотами по источнику и комнате (лимиты не
+  достигаются) против handler без квот, мкс на запрос, и время одного
+  LocalRateLimitBackend.hit;
+- shared_backend: несколько лимитеров ("инстансов") с общим бэкендом -
+  в сумме пропускается не больше лимита;
+- sliding_window: при постоянной перегрузке максимум пропущенных запросов
+  в любом окне не превышает лимит.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_token_ratelimit.py --iterations 50000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+os.environ.setdefault('LIVEKIT_API_KEY', 'bench-key')
+os.environ.setdefault('LIVEKIT_API_SECRET', 'bench-secret-0123456789abcdef0123456789abcdef')
+
+from api import token as token_api
+
+class _Request(dict):
+    method = 'POST'
+
+def _requests_per_second(iterations: int) -> float:
+    requests = [
+        _Request(
+            body=json.dumps({'roomName': f'room-{i % 1000}', 'participantName': f'user-{i}', 'noCache': True}),
+            headers={'origin': f'https://site-{i % 100}.example'}
+        )
+        for i in range(iterations)
+    ]
+    start = time.perf_counter()
+    for request in requests:
+        token_api.handler(request, None)
+    return iterations / (time.perf_counter() - start)
+
+def _overhead(iterations: int, rounds: int) -> dict:
+    limiter = token_api.TokenRateLimiter(origin_limit=(10 ** 9, 60), room_limit=(10 ** 9, 60))
+    
+    def use(value):
+        token_api._rate_limiter = value
+        token_api._rate_limiter_loaded = True
+    
+    _requests_per_second(500)
+    without, with_limits = [], []
+    for _ in range(rounds):
+        use(None)
+        without.append(_requests_per_second(iterations))
+        use(limiter)
+        with_limits.append(_requests_per_second(iterations))
+    use(None)
+    
+    backend = token_api.LocalRateLimitBackend()
+    keys = [f'o:https://site-{i % 100}.example' for i in range(iterations)]
+    now = time.time()
+    start = time.perf_counter()
+    for key in keys:
+        backend.hit(key, 1, 10 ** 9, 60, now)
+    hit_us = (time.perf_counter() - start) / iterations * 1e6
+    
+    base, limited = max(without), max(with_limits)
+    return {
+        'rps_without_limits': round(base),
+        'rps_with_limits': round(limited),
+        'overhead_us_per_request': round((1 / limited - 1 / base) * 1e6, 2),
+        'backend_hit_us': round(hit_us, 3),
+    }
+
+def _shared_backend(instances: int, limit: int, requests: int) -> dict:
+    # Общий объект бэкенда - стенд-ин для общего хранилища нескольких инстансов
+    backend = token_api.LocalRateLimitBackend()
+    limiters = [token_api.TokenRateLimiter(origin_limit=(limit, 60), backend=backend) for _ in range(instances)]
+    now = time.time()
+    allowed = [0] * instances
+    for i in range(requests):
+        result = limiters[i % instances].check('https://abuser.example', None, now=now + i * 0.001)
+        allowed[i % instances] += result.allowed
+    return {
+        'instances': instances,
+        'limit': limit,
+        'requests': requests,
+        'allowed_total': sum(allowed),
+        'allowed_per_instance': allowed,
+    }
+
+def _sliding_window(limit: int, window: float, rate: float, duration: float) -> dict:
+    """Постоянный поток rate запросов/с в модельном времени; максимум пропущенных в любом окне"""
+    backend = token_api.LocalRateLimitBackend()
+    accepted = []
+    for i in range(int(rate * duration)):
+        now = i / rate
+        if backend.hit('r:room', 1, limit, window, now).allowed:
+            accepted.append(now)
+    worst = 0
+    tail = 0
+    for head, moment in enumerate(accepted):
+        while accepted[tail] <= moment - window:
+            tail += 1
+        worst = max(worst, head - tail + 1)
+    return {
+        'limit': limit,
+        'window_s': window,
+        'offered_per_window': round(rate * window),
+        'accepted': len(accepted),
+        'max_accepted_in_any_window': worst,
+        'accepted_per_window_avg': round(len(accepted) / (duration / window), 1),
+    }
+
+def run(iterations: int = 20000, rounds: int = 3) -> dict:
+    return {
+        'iterations': iterations,
+        'overhead': _overhead(iterations, rounds),
+        'shared_backend': _shared_backend(instances=4, limit=100, requests=1000),
+        'sliding_window': _sliding_window(limit=100, window=10.0, rate=50.0, duration=120.0),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+    print(json.dumps(run(args.iterations, args.rounds), indent=2))
+
+if __name__ == '__main__':
+    main()
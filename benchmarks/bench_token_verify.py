@@ -0,0 +1,85 @@
+"""
+Бенчмарк проверки токенов: TokenVerifier против jwt.decode (PyJWT), который
+каждый сервис вызывал со своей копией секрета.
+
+Режимы (проверок в секунду по N разным токенам):
+    pyjwt_decode     - jwt.decode с проверкой подписи, exp и aud;
+    verifier_nocache - TokenVerifier без кеша (каждый раз HMAC и разбор claims);
+    verifier_first   - TokenVerifier с кешем, первая проверка каждого токена;
+    verifier_cached  - повторные проверки тех же токенов (попадания в кеш);
+    endpoint_cached  - Vercel handler на пути /verify с попаданиями в кеш.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_token_verify.py --tokens 10000 --rounds 5
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+API_KEY = 'bench-key'
+API_SECRET = 'bench-secret-0123456789abcdef0123456789abcdef'
+os.environ.setdefault('LIVEKIT_API_KEY', API_KEY)
+os.environ.setdefault('LIVEKIT_API_SECRET', API_SECRET)
+
+from api import token as token_api
+
+class _Request(dict):
+    method = 'POST'
+
+def _per_second(verify, tokens: list) -> float:
+    start = time.perf_counter()
+    for token in tokens:
+        verify(token)
+    return len(tokens) / (time.perf_counter() - start)
+
+def run(tokens: int = 10000, rounds: int = 5) -> dict:
+    import jwt
+    
+    minter = token_api.TokenMinter(API_KEY, API_SECRET)
+    issued = [minter.mint(f'room-{i % 100}', f'user-{i}') for i in range(tokens)]
+    
+    def pyjwt_decode(token):
+        return jwt.decode(token, API_SECRET, algorithms=['HS256'], audience='livekit')
+    
+    uncached = token_api.TokenVerifier(API_KEY, API_SECRET, cache_size=0)
+    cached = token_api.TokenVerifier(API_KEY, API_SECRET, cache_size=tokens)
+    
+    # Прогрев
+    _per_second(pyjwt_decode, issued[:200])
+    _per_second(uncached.verify, issued[:200])
+    
+    results = {
+        'tokens': tokens,
+        'pyjwt_decode_per_sec': round(_per_second(pyjwt_decode, issued)),
+        'verifier_nocache_per_sec': round(_per_second(uncached.verify, issued)),
+    }
+    cached.clear()
+    results['verifier_first_per_sec'] = round(_per_second(cached.verify, issued))
+    results['verifier_cached_per_sec'] = round(max(_per_second(cached.verify, issued) for _ in range(rounds)))
+    
+    token_api._verifier = cached
+    requests = [_Request(body=json.dumps({'token': token}), path='/api/token/verify') for token in issued]
+    start = time.perf_counter()
+    for request in requests:
+        token_api.handler(request, None)
+    results['endpoint_cached_per_sec'] = round(tokens / (time.perf_counter() - start))
+    
+    results['cache'] = cached.stats()
+    results['speedup_cached_vs_pyjwt'] = round(results['verifier_cached_per_sec'] / results['pyjwt_decode_per_sec'], 1)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tokens', type=int, default=10000)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(run(args.tokens, args.rounds), indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,269 @@
+"""
+Локальная заглушка сервера LiveKit (LIVEKIT_URL) для нагрузочных и soak
+тестов эндпоинта токенов без облака LiveKit.
+
+Принимает WebSocket подключения на /rtc?access_token=<jwt> (как клиентский
+SDK; токен можно передать и заголовком Authorization: Bearer). Токен
+проверяется TokenVerifier с кредами из окружения (LIVEKIT_API_KEY/SECRET или
+LIVEKIT_KEYRING_FILE): недействительный получает HTTP 401 с причиной в теле.
+Без кредов (или с --no-verify) claims берутся из токена без проверки подписи.
+После рукопожатия заглушка шлет текстовый кадр
+{"join": {"room": ..., "participant": {"identity": ...}}}, отвечает на ping
+и держит соединение до закрытия клиентом или hold секунд. Медиа нет.
+
+Запуск отдельным процессом:
+    python benchmarks/livekit_stub.py --port 7880
+    LIVEKIT_URL=ws://127.0.0.1:7880 python -m api.token --port 8000
+
+Или из кода:
+    server, url = start_stub(hold=1.0)
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import struct
+import sys
+import threading
+from urllib.parse import parse_qs, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+WS_GUID = b'258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+OP_TEXT = 0x1
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+MAX_HEADER_BYTES = 16384
+
+def accept_key(key: bytes) -> bytes:
+    """Sec-WebSocket-Accept для Sec-WebSocket-Key (RFC 6455)"""
+    return base64.b64encode(hashlib.sha1(key.strip() + WS_GUID).digest())
+
+def encode_frame(opcode: int, payload: bytes = b'', mask: bytes = None) -> bytes:
+    """Один кадр с FIN; клиент обязан маскировать кадры (mask - 4 байта), сервер - нет"""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack('!BB', 0x80 | opcode, length)
+    elif length < 65536:
+        header = struct.pack('!BBH', 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+    if mask is None:
+        return header + payload
+    masked = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+    return header[:1] + bytes((header[1] | 0x80,)) + header[2:] + mask + masked
+
+async def read_frame(reader: asyncio.StreamReader) -> tuple:
+    """Читает кадр и возвращает (opcode, payload) с уже снятой маской"""
+    first, second = await reader.readexactly(2)
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack('!H', await reader.readexactly(2))[0]
+    elif length == 127:
+        length = struct.unpack('!Q', await reader.readexactly(8))[0]
+    mask = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(length)
+    if mask is not None:
+        payload = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+    return first & 0x0F, payload
+
+async def read_http_head(reader: asyncio.StreamReader) -> tuple:
+    """Стартовая строка и заголовки (имена в нижнем регистре) HTTP запроса или ответа"""
+    head = await reader.readuntil(b'\r\n\r\n')
+    if len(head) > MAX_HEADER_BYTES:
+        raise ValueError('HTTP head is too large')
+    lines = head.decode('latin-1').split('\r\n')
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(':')
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    return lines[0], headers
+
+def unverified_claims(token: str) -> dict:
+    """Payload JWT без проверки подписи; {} для неразборчивого токена"""
+    try:
+        payload = token.split('.')[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+    except (IndexError, ValueError):
+        return {}
+    return claims if isinstance(claims, dict) else {}
+
+class LiveKitStub:
+    """WebSocket сервер-заглушка; счетчики подключений читаются через stats()"""
+    
+    def __init__(self, verifier=None, hold: float = 30.0):
+        self.verifier = verifier
+        self.hold = hold
+        self.connections = 0
+        self.joined = 0
+        self.rejected = {}
+        self.active = 0
+        self.peak_active = 0
+        self._lock = threading.Lock()
+    
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'connections': self.connections,
+                'joined': self.joined,
+                'rejected': dict(self.rejected),
+                'active': self.active,
+                'peak_active': self.peak_active,
+            }
+    
+    def _reject(self, writer, status: str, reason: str):
+        with self._lock:
+            self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        body = json.dumps({'error': reason}).encode('utf-8')
+        writer.write(
+            f'HTTP/1.1 {status}\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\n'
+            f'Connection: close\r\n\r\n'.encode('ascii') + body
+        )
+    
+    def _authorize(self, path: str, headers: dict) -> tuple:
+        """(claims, None) для действующего токена или (None, причина отказа)"""
+        query = parse_qs(urlsplit(path).query)
+        token = (query.get('access_token') or [''])[0]
+        authorization = headers.get('authorization', '')
+        if not token and authorization.lower().startswith('bearer '):
+            token = authorization[7:].strip()
+        if not token:
+            return None, 'missing_token'
+        if self.verifier is None:
+            return unverified_claims(token), None
+        from api.token import TokenVerificationError
+        try:
+            return self.verifier.verify(token), None
+        except TokenVerificationError as e:
+            return None, e.reason
+    
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        with self._lock:
+            self.connections += 1
+        try:
+            try:
+                request_line, headers = await read_http_head(reader)
+            except (ValueError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                return
+            parts = request_line.split()
+            if len(parts) < 2 or parts[0] != 'GET' or headers.get('upgrade', '').lower() != 'websocket':
+                self._reject(writer, '400 Bad Request', 'not_websocket')
+                return
+            claims, reason = self._authorize(parts[1], headers)
+            if claims is None:
+                self._reject(writer, '401 Unauthorized', reason)
+                return
+            
+            writer.write(
+                b'HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                b'Sec-WebSocket-Accept: ' + accept_key(headers.get('sec-websocket-key', '').encode('ascii')) +
+                b'\r\n\r\n'
+            )
+            join = {'join': {
+                'room': claims.get('room'),
+                'participant': {'identity': claims.get('sub')},
+                'serverVersion': 'stub',
+            }}
+            writer.write(encode_frame(OP_TEXT, json.dumps(join).encode('utf-8')))
+            await writer.drain()
+            with self._lock:
+                self.joined += 1
+                self.active += 1
+                self.peak_active = max(self.peak_active, self.active)
+            try:
+                await asyncio.wait_for(self._session(reader, writer), self.hold)
+            except asyncio.TimeoutError:
+                writer.write(encode_frame(OP_CLOSE, struct.pack('!H', 1000)))
+            finally:
+                with self._lock:
+                    self.active -= 1
+        except (OSError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            try:
+                await writer.drain()
+            except OSError:
+                pass
+            writer.close()
+    
+    async def _session(self, reader, writer):
+        while True:
+            opcode, payload = await read_frame(reader)
+            if opcode == OP_PING:
+                writer.write(encode_frame(OP_PONG, payload))
+            elif opcode == OP_CLOSE:
+                writer.write(encode_frame(OP_CLOSE, payload[:2]))
+                return
+
+class StubServer:
+    """Заглушка в собственном event loop в фоновом потоке (не делит loop с генератором нагрузки)"""
+    
+    def __init__(self, stub: LiveKitStub, port: int = 0):
+        self.stub = stub
+        self.loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        self._server = None
+        
+        def serve():
+            asyncio.set_event_loop(self.loop)
+            self._server = self.loop.run_until_complete(
+                asyncio.start_server(stub.handle, '127.0.0.1', port, backlog=1024)
+            )
+            ready.set()
+            self.loop.run_forever()
+        
+        self._thread = threading.Thread(target=serve, daemon=True)
+        self._thread.start()
+        ready.wait()
+        self.port = self._server.sockets[0].getsockname()[1]
+    
+    def stats(self) -> dict:
+        return self.stub.stats()
+    
+    def close(self):
+        def stop():
+            self._server.close()
+            self.loop.stop()
+        self.loop.call_soon_threadsafe(stop)
+        self._thread.join(timeout=5)
+
+def default_verifier():
+    """TokenVerifier с кредами из окружения; None - принимать любой токен"""
+    from api.token import TokenVerifier
+    return TokenVerifier.from_env()
+
+def start_stub(port: int = 0, verify: bool = True, hold: float = 30.0) -> tuple:
+    """Запускает заглушку в фоновом потоке и возвращает (server, url для LIVEKIT_URL)"""
+    server = StubServer(LiveKitStub(default_verifier() if verify else None, hold), port)
+    return server, f'ws://127.0.0.1:{server.port}'
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=7880)
+    parser.add_argument('--hold', type=float, default=30.0, help='Сколько секунд держать соединение')
+    parser.add_argument('--no-verify', action='store_true', help='Принимать любой токен')
+    args = parser.parse_args()
+    
+    verifier = None if args.no_verify else default_verifier()
+    stub = LiveKitStub(verifier, args.hold)
+    
+    async def serve():
+        server = await asyncio.start_server(stub.handle, '127.0.0.1', args.port, backlog=1024)
+        mode = 'verifying tokens' if verifier is not None else 'accepting any token'
+        print(f'LiveKit stub listening on ws://127.0.0.1:{args.port} ({mode})', flush=True)
+        async with server:
+            await server.serve_forever()
+    
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
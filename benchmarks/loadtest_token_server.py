@@ -0,0 +1,115 @@
+"""
+Нагрузочный тест TokenServer на localhost: p50/p99 латентности и RPS
+при растущей конкурентности. Каждый клиент держит keep-alive соединение.
+
+Без --url сам поднимает `python -m api.token` в отдельном процессе.
+
+Запуск из корня репозитория:
+    python benchmarks/loadtest_token_server.py --concurrency 1 8 32 64 --requests 200
+    python benchmarks/loadtest_token_server.py --url http://127.0.0.1:8000
+"""
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def start_server(workers: int, extra_args=(), extra_env: dict = None) -> tuple:
+    """Запускает TokenServer в подпроцессе и возвращает (процесс, порт)"""
+    env = dict(os.environ)
+    env.update(extra_env or {})
+    env.setdefault('LIVEKIT_API_KEY', 'bench-key')
+    env.setdefault('LIVEKIT_API_SECRET', 'bench-secret-0123456789abcdef0123456789abcdef')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'api.token', '--port', '0', '--workers', str(workers), *extra_args],
+        cwd=ROOT, env=env, stdout=subprocess.PIPE, text=True
+    )
+    # Первая строка: "Token server listening on http://127.0.0.1:PORT (...)"
+    line = process.stdout.readline()
+    port = int(line.split('http://', 1)[1].split(' ', 1)[0].rsplit(':', 1)[1])
+    return process, port
+
+def percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def _client(host: str, port: int, path: str, requests: int, latencies: list, errors: list, worker_id: int):
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    for i in range(requests):
+        body = json.dumps({'roomName': f'room-{worker_id % 16}', 'participantName': f'load-{worker_id}-{i}'})
+        start = time.perf_counter()
+        try:
+            conn.request('POST', path, body=body, headers={'Content-Type': 'application/json'})
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(type(e).__name__)
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+
+def run_level(host: str, port: int, path: str, concurrency: int, requests: int) -> dict:
+    latencies: list = []
+    errors: list = []
+    threads = [
+        threading.Thread(target=_client, args=(host, port, path, requests, latencies, errors, n))
+        for n in range(concurrency)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    
+    latencies.sort()
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'rps': round(len(latencies) / wall),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+def run(url: str = None, concurrency=(1, 8, 32, 64), requests: int = 200, workers: int = 32) -> dict:
+    process = None
+    if url:
+        parts = urlsplit(url)
+        host, port, path = parts.hostname, parts.port or 80, parts.path or '/'
+    else:
+        process, port = start_server(workers)
+        host, path = '127.0.0.1', '/'
+    
+    try:
+        levels = [run_level(host, port, path, c, requests) for c in concurrency]
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+    
+    return {'url': url or f'http://{host}:{port}{path}', 'workers': workers, 'levels': levels}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Адрес уже запущенного сервера')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32, 64])
+    parser.add_argument('--requests', type=int, default=200, help='Запросов на одного клиента')
+    parser.add_argument('--workers', type=int, default=32, help='Потоков сервера (если запускаем его сами)')
+    args = parser.parse_args()
+    print(json.dumps(run(args.url, args.concurrency, args.requests, args.workers), indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,277 @@
+"""
+Локальная детерминированная заглушка OpenAI Chat Completions API для
+бенчмарков и ручных проверок генераторов правил без сети.
+
+Поддерживает POST /v1/chat/completions в обычном и потоковом (stream=true, SSE)
+режимах. Ответ зависит только от сообщений запроса, задержки настраиваются.
+
+Лимиты провайдера эмулируются: с rpm_limit / tpm_limit заглушка ведет бюджеты
+запросов и токенов (промпт + max_tokens) в минуту, отдает заголовки
+x-ratelimit-* и отвечает 429 с retry-after-ms при превышении. limit_window -
+за сколько секунд бюджет можно выбрать разом (60 - весь минутный лимит,
+1 - "60 RPM" как 1 запрос в секунду). error_rate - доля случайных 429
+независимо от бюджетов.
+
+Запуск отдельным процессом:
+    python benchmarks/openai_stub.py --port 8787 --token-delay 0.01
+    OPENAI_BASE_URL=http://127.0.0.1:8787/v1 OPENAI_API_KEY=stub python main.py
+
+Или из кода:
+    server, base_url = start_stub(token_delay=0.01)
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = (
+    'Use', 'typed', 'interfaces', 'for', 'all', 'modules', 'and', 'keep', 'functions', 'small',
+    'Prefer', 'composition', 'over', 'inheritance', 'Write', 'tests', 'before', 'refactoring',
+    'Validate', 'inputs', 'at', 'boundaries', 'Cache', 'expensive', 'calls', 'Document', 'public', 'APIs',
+)
+
+def completion_pieces(messages: list, tokens: int) -> list:
+    """
+    Детерминированный ответ из tokens фрагментов: одинаковые сообщения дают
+    одинаковый текст. Каждые 12 слов начинается новая строка.
+    """
+    digest = hashlib.sha256(json.dumps(messages, sort_keys=True).encode('utf-8')).digest()
+    words = ['You', 'are', 'an', 'expert', 'in', f'stub-{digest[:4].hex()}.']
+    for i in range(max(0, tokens - len(words))):
+        words.append(WORDS[(digest[i % len(digest)] + i) % len(WORDS)])
+    return [
+        word if i == 0 else ('\n' if i % 12 == 0 else ' ') + word
+        for i, word in enumerate(words[:tokens])
+    ]
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    
+    def setup(self):
+        super().setup()
+        with self.server.stats_lock:
+            self.server.connections += 1
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def do_POST(self):
+        with self.server.stats_lock:
+            self.server.active += 1
+            self.server.max_active = max(self.server.max_active, self.server.active)
+        try:
+            self._complete()
+        finally:
+            with self.server.stats_lock:
+                self.server.active -= 1
+    
+    def _complete(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {'error': {'message': f'Unknown path {self.path}', 'type': 'invalid_request_error'}})
+            return
+        
+        request = json.loads(body)
+        server = self.server
+        tokens = min(int(request.get('max_tokens') or server.completion_tokens), server.completion_tokens)
+        pieces = completion_pieces(request.get('messages', []), tokens)
+        messages = request.get('messages', [])
+        prompt_tokens = sum(len(str(m.get('content', ''))) for m in messages) // 4
+        model = request.get('model', 'stub')
+        
+        limit_headers, retry_after = server.admit(prompt_tokens + int(request.get('max_tokens') or tokens))
+        if retry_after is not None:
+            time.sleep(server.first_token_delay)
+            self._send_json(429, {'error': {
+                'message': 'Rate limit reached (stub)', 'type': 'requests', 'code': 'rate_limit_exceeded',
+            }}, dict(limit_headers, **{'retry-after-ms': str(int(retry_after * 1000))}))
+            return
+        
+        # Кэш префикса как у провайдера: от 1024 токенов, блоками по 128,
+        # если первое сообщение уже встречалось
+        prefix = str(messages[0].get('content', '')) if messages else ''
+        with server.stats_lock:
+            prefix_seen = prefix in server.seen_prefixes
+            server.seen_prefixes.add(prefix)
+        cached_tokens = 0
+        if prefix_seen and prompt_tokens >= 1024:
+            cached_tokens = min(prompt_tokens, len(prefix) // 4) // 128 * 128
+        usage = {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': tokens,
+            'total_tokens': prompt_tokens + tokens,
+            'prompt_tokens_details': {'cached_tokens': cached_tokens},
+        }
+        
+        time.sleep(server.first_token_delay)
+        if request.get('stream'):
+            include_usage = (request.get('stream_options') or {}).get('include_usage')
+            self._stream(model, pieces, usage if include_usage else None, limit_headers)
+            return
+        
+        time.sleep(server.token_delay * tokens)
+        self._send_json(200, {
+            'id': 'chatcmpl-stub',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': ''.join(pieces)},
+                'finish_reason': 'stop',
+            }],
+            'usage': usage,
+        }, limit_headers)
+    
+    def _send_json(self, status: int, payload: dict, headers: dict = None):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(b'%X\r\n%s\r\n' % (len(data), data))
+        self.wfile.flush()
+    
+    def _stream(self, model: str, pieces: list, usage: dict = None, headers: dict = None):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        
+        def event(delta: dict, finish_reason=None, usage=None) -> bytes:
+            chunk = {
+                'id': 'chatcmpl-stub',
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [] if usage else [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}],
+            }
+            if usage:
+                chunk['usage'] = usage
+            return b'data: ' + json.dumps(chunk).encode('utf-8') + b'\n\n'
+        
+        self._write_chunk(event({'role': 'assistant', 'content': ''}))
+        for i, piece in enumerate(pieces):
+            if i:
+                time.sleep(self.server.token_delay)
+            self._write_chunk(event({'content': piece}))
+        self._write_chunk(event({}, 'stop'))
+        if usage:
+            self._write_chunk(event({}, usage=usage))
+        self._write_chunk(b'data: [DONE]\n\n')
+        self.wfile.write(b'0\r\n\r\n')
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    
+    def __init__(
+        self,
+        address,
+        completion_tokens: int = 200,
+        first_token_delay: float = 0.0,
+        token_delay: float = 0.0,
+        rpm_limit: int = 0,
+        tpm_limit: int = 0,
+        limit_window: float = 60.0,
+        error_rate: float = 0.0,
+        seed: int = 0
+    ):
+        super().__init__(address, StubHandler)
+        self.completion_tokens = completion_tokens
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.requests = 0
+        self.rate_limited = 0
+        self.connections = 0
+        # Одновременно обрабатываемые запросы: сейчас и максимум за все время
+        self.active = 0
+        self.max_active = 0
+        self.seen_prefixes = set()
+        self.stats_lock = threading.Lock()
+        self.limits = {'requests': rpm_limit, 'tokens': tpm_limit}
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        now = time.monotonic()
+        # Емкость бюджета: сколько пополняется за limit_window секунд
+        self._capacity = {name: limit * limit_window / 60.0 for name, limit in self.limits.items() if limit}
+        self._budgets = {name: [capacity, now] for name, capacity in self._capacity.items()}
+    
+    def admit(self, cost: int) -> tuple:
+        """
+        Списывает запрос и его токены из бюджетов на минуту.
+        Возвращает (заголовки x-ratelimit-*, None) или (заголовки, секунды до повтора) для 429.
+        """
+        amounts = {'requests': 1, 'tokens': cost}
+        with self.stats_lock:
+            now = time.monotonic()
+            wait = 0.0
+            for name, budget in self._budgets.items():
+                limit, capacity = self.limits[name], self._capacity[name]
+                budget[0] = min(capacity, budget[0] + (now - budget[1]) * limit / 60.0)
+                budget[1] = now
+                wait = max(wait, (min(amounts[name], capacity) - budget[0]) * 60.0 / limit)
+            injected = self.error_rate and self._random.random() < self.error_rate
+            if wait <= 0 and not injected:
+                for name, budget in self._budgets.items():
+                    budget[0] -= min(amounts[name], self._capacity[name])
+            headers = {}
+            for name, budget in self._budgets.items():
+                limit, capacity = self.limits[name], self._capacity[name]
+                headers[f'x-ratelimit-limit-{name}'] = str(limit)
+                headers[f'x-ratelimit-remaining-{name}'] = str(max(0, int(budget[0])))
+                headers[f'x-ratelimit-reset-{name}'] = f'{(capacity - budget[0]) * 60.0 / limit:.3f}s'
+            if wait > 0 or injected:
+                self.rate_limited += 1
+                return headers, max(wait, 0.05)
+            self.requests += 1
+            return headers, None
+
+def start_stub(port: int = 0, **options) -> tuple:
+    """Запускает заглушку в фоновом потоке и возвращает (server, base_url)"""
+    server = StubServer(('127.0.0.1', port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}/v1'
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8787)
+    parser.add_argument('--completion-tokens', type=int, default=200)
+    parser.add_argument('--first-token-delay', type=float, default=0.0, help='Секунд до первого токена')
+    parser.add_argument('--token-delay', type=float, default=0.0, help='Секунд на каждый следующий токен')
+    parser.add_argument('--rpm-limit', type=int, default=0, help='Лимит запросов в минуту (0 - без лимита)')
+    parser.add_argument('--tpm-limit', type=int, default=0, help='Лимит токенов в минуту (0 - без лимита)')
+    parser.add_argument('--limit-window', type=float, default=60.0, help='За сколько секунд можно выбрать бюджет разом')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Доля случайных ответов 429')
+    args = parser.parse_args()
+    
+    server = StubServer(
+        ('127.0.0.1', args.port),
+        completion_tokens=args.completion_tokens,
+        first_token_delay=args.first_token_delay,
+        token_delay=args.token_delay,
+        rpm_limit=args.rpm_limit,
+        tpm_limit=args.tpm_limit,
+        limit_window=args.limit_window,
+        error_rate=args.error_rate,
+    )
+    print(f'OpenAI stub listening on http://127.0.0.1:{server.server_address[1]}/v1', flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
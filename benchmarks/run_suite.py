@@ -0,0 +1,292 @@
+"""
+Сводный прогон бенчмарков репозитория с единым JSON отчетом и сравнением
+с сохраненным базовым отчетом.
+
+Каждый бенчмарк запускается в отдельном процессе (run() модуля из benchmarks/
+с параметрами быстрого прогона), из его отчета берутся ключевые метрики:
+    token_mint     - generate_livekit_token (PyJWT) и TokenMinter, токенов/с
+    token_handler  - Vercel handler: холодный старт и теплые вызовы
+    token_http     - TokenServer по HTTP: p50/p99 и RPS при конкурентности 1 и 16
+    import_time    - время импорта api.token
+    generation     - генерация правил против локальной заглушки OpenAI
+    save_rules     - запись правил через save_rules_md
+    rules_index    - поиск похожих запросов
+    token_keyring  - подпись через keyring и выпуск во время ротации ключей
+    grant_profiles - выбор профиля прав по имени комнаты среди 1000 шаблонов
+    token_soak     - всплеск запросов к TokenServer с проверкой токенов и подключением к заглушке LiveKit
+    rules_store    - история правил: размер хранилища против полных копий, сохранение, diff, materialize
+С --repeat N каждый бенчмарк прогоняется N раз, в отчет идет медиана метрики.
+
+С --baseline отчет сравнивается с базовым: метрика считается регрессией,
+если она хуже базовой больше чем на --threshold (доля; для шумных метрик,
+см. NOISY_METRICS, допуск удваивается). При регрессиях код выхода 1.
+Базовый отчет имеет смысл только для той же машины: снимайте его там же,
+где будет сравнение.
+
+Запуск из корня репозитория:
+    python benchmarks/run_suite.py --repeat 3 --output benchmarks/baseline.json
+    python benchmarks/run_suite.py --baseline benchmarks/baseline.json --threshold 0.2
+    python benchmarks/run_suite.py --only token_mint token_handler --baseline benchmarks/baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RUNNER_SNIPPET = (
+    "import importlib, json, sys; "
+    "module = importlib.import_module('benchmarks.' + sys.argv[1]); "
+    "print(json.dumps(module.run(**json.loads(sys.argv[2]))))"
+)
+
+HIGHER = 'higher'
+LOWER = 'lower'
+# Шумные метрики: хвосты латентности, холодный старт, HTTP через loopback
+# (зависит от планировщика ОС) и вызовы по несколько микросекунд.
+# Допуск для них в NOISY_TOLERANCE_FACTOR раз шире
+NOISY_METRICS = ('p99', 'cold', 'token_http.', 'token_soak.', 'warm_cached_p50_us')
+NOISY_TOLERANCE_FACTOR = 2.0
+
+def _levels(report: dict, key: str, metrics) -> dict:
+    """Метрики по уровням конкурентности: c<уровень>.<метрика>"""
+    return {
+        f"c{level['concurrency']}.{metric}": level[metric]
+        for level in report[key] for metric in metrics
+    }
+
+def _save_rules_metrics(report: dict) -> dict:
+    values = {}
+    for result in report['results']:
+        for mode in ('string', 'stream', 'string_with_cursorrules'):
+            values[f"{result['size_chars']}.{mode}.mb_per_sec"] = result[mode]['mb_per_sec']
+    return values
+
+# Имя -> (модуль в benchmarks, параметры run(), извлечение метрик из отчета)
+BENCHMARKS = {
+    'token_mint': (
+        'bench_token_mint', {'iterations': 20000},
+        lambda r: {
+            'generate_livekit_token_per_sec': r['pyjwt_tokens_per_sec'],
+            'minter_tokens_per_sec': r['minter_tokens_per_sec'],
+        },
+    ),
+    'token_handler': (
+        'bench_token_handler', {'cold_runs': 7, 'iterations': 20000},
+        lambda r: {key: r[key] for key in (
+            'cold_total_ms_median', 'warm_p50_us', 'warm_p99_us', 'warm_cached_p50_us', 'warm_requests_per_sec'
+        )},
+    ),
+    'token_http': (
+        'loadtest_token_server', {'concurrency': [1, 16], 'requests': 300, 'workers': 32},
+        lambda r: _levels(r, 'levels', ('p50_ms', 'p99_ms', 'rps')),
+    ),
+    'import_time': (
+        'bench_import_time', {'runs': 7},
+        lambda r: {'import_ms_median': r['import_ms_median']},
+    ),
+    'generation': (
+        'bench_async_generation',
+        {'projects': 16, 'token_delay': 0.001, 'completion_tokens': 100, 'concurrency': [1, 8]},
+        lambda r: dict(
+            sync_full_completion_s=r['sync_full_completion_s'],
+            stream_time_to_first_token_s=r['stream_time_to_first_token_s'],
+            stream_full_completion_s=r['stream_full_completion_s'],
+            **_levels(r, 'generate_many', ('projects_per_min',)),
+        ),
+    ),
+    'save_rules': (
+        'bench_save_rules', {'writes': 200, 'sizes': [20000, 1000000]},
+        _save_rules_metrics,
+    ),
+    'rules_index': (
+        'bench_rules_index', {'entries': 20000, 'queries': 300},
+        lambda r: {key: r[key] for key in (
+            'add_per_s', 'search_p50_ms', 'reuse_lookup_p50_ms', 'paraphrase_recall_at_5'
+        )},
+    ),
+    'token_keyring': (
+        'bench_token_keyring', {'iterations': 20000, 'duration': 1.0},
+        lambda r: {
+            'keyring_tokens_per_sec': r['mint']['keyring_tokens_per_sec'],
+            'rotation_mint_p99_us': r['rotation']['mint_p99_us'],
+        },
+    ),
+    'grant_profiles': (
+        'bench_grant_profiles', {'patterns': [1000], 'lookups': 5000},
+        lambda r: {
+            'index_lookup_us': r['results'][0]['index_us'],
+            'resolved_profile_tokens_per_sec': r['mint']['resolved_profile_tokens_per_sec'],
+        },
+    ),
+    'token_soak': (
+        'soak_token_endpoint',
+        {'pattern': 'burst', 'duration': 2.0, 'rate': 20.0, 'burst_size': 200, 'validate': True, 'connect': True},
+        lambda r: {
+            'burst_p50_ms': r['p50_ms'],
+            'burst_p99_ms': r['p99_ms'],
+            'failed_requests': r['offered'] - r['ok'],
+        },
+    ),
+    'rules_store': (
+        'bench_rules_store', {'projects': 1, 'generations': 100},
+        lambda r: {
+            'store_to_full_copies': r['store_to_full_copies'],
+            'put_p50_ms': r['put_ms']['p50'],
+            'adjacent_diff_p50_ms': r['diff']['adjacent']['store_ms']['p50'],
+            'materialize_p50_ms': r['materialize_ms']['p50'],
+        },
+    ),
+}
+
+def direction(metric: str) -> str:
+    """Какое направление изменения метрики - улучшение (по суффиксу имени)"""
+    if metric.endswith(('_per_sec', '_per_s', '_per_min', '.rps', '_rate', 'recall_at_5')):
+        return HIGHER
+    return LOWER
+
+def tolerance(metric: str, threshold: float) -> float:
+    if any(marker in metric for marker in NOISY_METRICS):
+        return threshold * NOISY_TOLERANCE_FACTOR
+    return threshold
+
+def run_benchmark(name: str) -> dict:
+    """Прогоняет бенчмарк в отдельном процессе и возвращает его полный отчет"""
+    module, params, _ = BENCHMARKS[name]
+    result = subprocess.run(
+        [sys.executable, '-c', RUNNER_SNIPPET, module, json.dumps(params)],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{module} завершился с кодом {result.returncode}:\n{result.stderr[-2000:]}")
+    # Бенчмарк может печатать свое; отчет - последняя строка
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def _git_commit() -> str:
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True)
+    except OSError:
+        return ''
+    return result.stdout.strip()
+
+def run(names=None, repeat: int = 1, log=None) -> dict:
+    """
+    Прогоняет бенчмарки names (по умолчанию все) repeat раз и возвращает отчет:
+    metrics - плоский словарь "бенчмарк.метрика" -> медиана значения,
+    reports - полные отчеты последнего прогона каждого бенчмарка.
+    """
+    names = list(names or BENCHMARKS)
+    samples = {}
+    reports = {}
+    durations = {}
+    for name in names:
+        extract = BENCHMARKS[name][2]
+        start = time.perf_counter()
+        for attempt in range(repeat):
+            if log:
+                log(f"{name} ({attempt + 1}/{repeat})...")
+            reports[name] = run_benchmark(name)
+            for metric, value in extract(reports[name]).items():
+                samples.setdefault(f"{name}.{metric}", []).append(value)
+        durations[name] = round(time.perf_counter() - start, 1)
+    
+    return {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'repeat': repeat,
+            'duration_s': durations,
+        },
+        'metrics': {metric: statistics.median(values) for metric, values in samples.items()},
+        'reports': reports,
+    }
+
+def compare(current: dict, baseline: dict, threshold: float) -> dict:
+    """
+    Сравнивает metrics двух отчетов. Для каждой общей метрики - относительное
+    изменение (положительное - улучшение) и признак регрессии.
+    """
+    rows = []
+    for metric, base in baseline['metrics'].items():
+        if metric not in current['metrics']:
+            continue
+        value = current['metrics'][metric]
+        better = direction(metric)
+        if base == 0:
+            change = 0.0 if value == 0 else (1.0 if (value > 0) == (better == HIGHER) else -1.0)
+        else:
+            change = (value - base) / abs(base)
+            if better == LOWER:
+                change = -change
+        allowed = tolerance(metric, threshold)
+        rows.append({
+            'metric': metric,
+            'baseline': base,
+            'current': value,
+            'better': better,
+            'change': round(change, 4),
+            'tolerance': allowed,
+            'regression': change < -allowed,
+        })
+    return {
+        'baseline_commit': baseline.get('meta', {}).get('commit', ''),
+        'threshold': threshold,
+        'compared': len(rows),
+        'missing': sorted(set(baseline['metrics']) - set(current['metrics'])),
+        'regressions': [row for row in rows if row['regression']],
+        'rows': rows,
+    }
+
+def format_comparison(comparison: dict) -> str:
+    lines = [f"{'метрика':<58} {'база':>12} {'сейчас':>12} {'изменение':>10}"]
+    for row in comparison['rows']:
+        mark = '  РЕГРЕССИЯ' if row['regression'] else ''
+        lines.append(
+            f"{row['metric']:<58} {row['baseline']:>12} {row['current']:>12} {row['change'] * 100:>+9.1f}%{mark}"
+        )
+    lines.append(
+        f"Регрессий: {len(comparison['regressions'])} из {comparison['compared']} "
+        f"(порог {comparison['threshold'] * 100:.0f}%, для шумных метрик "
+        f"{comparison['threshold'] * NOISY_TOLERANCE_FACTOR * 100:.0f}%)"
+    )
+    return '\n'.join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help='Прогнать только эти бенчмарки')
+    parser.add_argument('--repeat', type=int, default=1, help='Прогонов каждого бенчмарка (берется медиана)')
+    parser.add_argument('--output', help='Сохранить отчет в файл (например, как новый базовый)')
+    parser.add_argument('--baseline', help='Базовый отчет для сравнения')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Допустимое ухудшение метрики относительно базового отчета (доля)')
+    args = parser.parse_args()
+    
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    
+    report = run(args.only, max(1, args.repeat), log=lambda message: print(message, file=sys.stderr))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    
+    comparison = None
+    if baseline is not None:
+        comparison = compare(report, baseline, args.threshold)
+        report['comparison'] = comparison
+        print(format_comparison(comparison), file=sys.stderr)
+    
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    sys.exit(1 if comparison and comparison['regressions'] else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,490 @@
+"""
+Генератор нагрузки и soak тест эндпоинта токенов: воспроизводит "500 виджетов
+открылись в 9:00" против TokenServer (TokenHandler по HTTP) или Vercel handler.
+
+Нагрузка открытая (open loop): запросы отправляются по расписанию прихода
+независимо от того, успел ли ответить сервер, поэтому очередь на стороне
+сервера видна в латентности. Латентность считается от запланированного
+момента прихода, а не от фактической отправки.
+Шаблоны прихода (--pattern):
+    constant - --rate запросов/с все --duration секунд;
+    ramp     - от --rate до --peak-rate линейно за --duration;
+    burst    - фон --rate плюс всплески по --burst-size одновременных запросов
+               каждые --burst-every секунд (по умолчанию один всплеск в середине).
+С --poisson интервалы между приходами экспоненциальные вместо равных.
+
+Для каждого запроса (по желанию):
+    --validate - токен проверяется TokenVerifier (подпись, exp, комната, sub);
+    --connect  - WebSocket подключение к url из ответа с этим токеном до кадра join.
+Без --url сервер токенов поднимается в подпроцессе, а с --connect еще и
+заглушка LiveKit (livekit_stub.py), адрес которой передается серверу как LIVEKIT_URL.
+С внешним --url заглушку запускайте сами и укажите ее в LIVEKIT_URL сервера,
+а для --validate задайте те же LIVEKIT_API_KEY/SECRET, что у сервера.
+
+Отчет: итоги (латентность p50/p95/p99/max, ошибки по видам, достигнутый RPS)
+и временной ряд по --interval секунд (запросы, ошибки, p50/p99, пик запросов
+в полете, латентность подключения). --csv пишет ряд в CSV, --output - весь
+отчет в JSON.
+
+Запуск из корня репозитория:
+    python benchmarks/soak_token_endpoint.py --pattern burst --rate 20 --burst-size 500 --duration 10 --validate --connect
+    python benchmarks/soak_token_endpoint.py --pattern ramp --rate 10 --peak-rate 500 --duration 30 --csv ramp.csv
+    python benchmarks/soak_token_endpoint.py --pattern constant --rate 100 --duration 3600 --url http://127.0.0.1:8000/ --output soak.json
+    python benchmarks/soak_token_endpoint.py --target handler --pattern burst --burst-size 200 --duration 5
+"""
+import argparse
+import asyncio
+import base64
+import csv
+import json
+import os
+import random
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# Те же креды, что start_server передает серверу: нужны для --validate и заглушки
+os.environ.setdefault('LIVEKIT_API_KEY', 'bench-key')
+os.environ.setdefault('LIVEKIT_API_SECRET', 'bench-secret-0123456789abcdef0123456789abcdef')
+
+from benchmarks.livekit_stub import OP_CLOSE, OP_TEXT, accept_key, encode_frame, read_frame, read_http_head, start_stub
+from benchmarks.loadtest_token_server import percentile, start_server
+
+PATTERNS = ('constant', 'ramp', 'burst')
+TARGETS = ('http', 'handler')
+CSV_FIELDS = (
+    't_s', 'offered', 'completed', 'ok', 'errors', 'p50_ms', 'p99_ms', 'max_ms',
+    'connect_p50_ms', 'in_flight_peak', 'error_kinds',
+)
+
+def arrival_times(
+    pattern: str,
+    duration: float,
+    rate: float,
+    peak_rate: float = None,
+    burst_size: int = 0,
+    burst_every: float = None,
+    poisson: bool = False,
+    seed: int = 0
+) -> list:
+    """Моменты прихода запросов (секунды от начала) по шаблону"""
+    rng = random.Random(seed)
+    times = []
+    if rate > 0:
+        t = 0.0
+        while t < duration:
+            times.append(t)
+            current = rate
+            if pattern == 'ramp':
+                current = rate + ((peak_rate or rate) - rate) * t / duration
+            t += rng.expovariate(current) if poisson else 1.0 / current
+    if pattern == 'burst' and burst_size > 0:
+        every = burst_every or duration / 2
+        moment = every if every < duration else duration / 2
+        while moment < duration:
+            times.extend([moment] * burst_size)
+            moment += every
+    times.sort()
+    return times
+
+class HttpPool:
+    """Keep-alive HTTP/1.1 соединения к серверу токенов, не больше size одновременно"""
+    
+    def __init__(self, host: str, port: int, path: str, size: int, timeout: float):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.timeout = timeout
+        self.opened = 0
+        self._idle = []
+        self._slots = asyncio.Semaphore(size)
+    
+    async def _open(self):
+        self.opened += 1
+        return await asyncio.open_connection(self.host, self.port)
+    
+    async def _exchange(self, connection, body: bytes) -> tuple:
+        reader, writer = connection
+        writer.write(
+            b'POST %s HTTP/1.1\r\nHost: %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n%s'
+            % (self.path.encode('ascii'), self.host.encode('ascii'), len(body), body)
+        )
+        status_line, headers = await read_http_head(reader)
+        payload = await reader.readexactly(int(headers.get('content-length', 0)))
+        keep = headers.get('connection', '').lower() != 'close'
+        return int(status_line.split()[1]), payload, keep
+    
+    async def post(self, body: bytes) -> tuple:
+        """(код ответа, тело); соединение, закрытое сервером между запросами, переоткрывается один раз"""
+        async with self._slots:
+            reused = bool(self._idle)
+            connection = self._idle.pop() if reused else await self._open()
+            try:
+                status, payload, keep = await asyncio.wait_for(self._exchange(connection, body), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                connection[1].close()
+                if not reused:
+                    raise
+                connection = await self._open()
+                try:
+                    status, payload, keep = await asyncio.wait_for(self._exchange(connection, body), self.timeout)
+                except BaseException:
+                    connection[1].close()
+                    raise
+            except BaseException:
+                connection[1].close()
+                raise
+            if keep:
+                self._idle.append(connection)
+            else:
+                connection[1].close()
+            return status, payload
+    
+    def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+class HandlerTarget:
+    """Vercel handler в пуле потоков процесса генератора"""
+    
+    class _Request(dict):
+        method = 'POST'
+    
+    def __init__(self, workers: int):
+        from api import token as token_api
+        self._handler = token_api.handler
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+    
+    def _call(self, body: bytes) -> tuple:
+        response = self._handler(self._Request(body=body, headers={'origin': 'soak'}), None)
+        payload = response['body']
+        return response['statusCode'], payload.encode('utf-8') if isinstance(payload, str) else payload
+    
+    async def post(self, body: bytes) -> tuple:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._call, body)
+    
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+async def ws_join(url: str, token: str, timeout: float) -> dict:
+    """Подключается к LIVEKIT_URL как клиентский SDK (/rtc?access_token=...) и ждет кадр join"""
+    parts = urlsplit(url)
+    secure = parts.scheme in ('wss', 'https')
+    port = parts.port or (443 if secure else 80)
+    reader, writer = await asyncio.open_connection(parts.hostname, port, ssl=True if secure else None)
+    try:
+        key = base64.b64encode(os.urandom(16))
+        path = parts.path.rstrip('/') + '/rtc?access_token=' + quote(token)
+        writer.write(
+            f'GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+            f'Sec-WebSocket-Version: 13\r\nSec-WebSocket-Key: {key.decode("ascii")}\r\n\r\n'.encode('ascii')
+        )
+        status_line, headers = await asyncio.wait_for(read_http_head(reader), timeout)
+        status = status_line.split()[1] if len(status_line.split()) > 1 else '?'
+        if status != '101':
+            raise ConnectionRefusedError(f'ws_{status}')
+        if headers.get('sec-websocket-accept', '').encode('ascii') != accept_key(key):
+            raise ConnectionRefusedError('ws_bad_accept')
+        opcode, payload = await asyncio.wait_for(read_frame(reader), timeout)
+        if opcode != OP_TEXT:
+            raise ConnectionRefusedError('ws_no_join')
+        writer.write(encode_frame(OP_CLOSE, b'\x03\xe8', mask=os.urandom(4)))
+        return json.loads(payload).get('join', {})
+    finally:
+        writer.close()
+
+class LoadRun:
+    """Один прогон: расписание, запросы в полете и собранные результаты"""
+    
+    def __init__(self, target, arrivals: list, options: dict, verifier=None):
+        self.target = target
+        self.arrivals = arrivals
+        self.options = options
+        self.verifier = verifier
+        self.records = []
+        self.dropped = []
+        self.in_flight = 0
+        self.peaks = {}
+        self.start = 0.0
+    
+    def _bucket(self, offset: float) -> int:
+        return int(offset // self.options['interval'])
+    
+    async def _one(self, index: int, offset: float):
+        loop = asyncio.get_running_loop()
+        room = f"{self.options['room_prefix']}-{index % self.options['rooms']}"
+        participant = f'widget-{index}'
+        request = {'roomName': room, 'participantName': participant}
+        if self.options['no_cache']:
+            request['noCache'] = True
+        connect_latency = None
+        try:
+            status, payload = await self.target.post(json.dumps(request).encode('utf-8'))
+            if status != 200:
+                outcome = f'http_{status}'
+            else:
+                outcome = 'ok'
+                data = json.loads(payload)
+                if self.verifier is not None:
+                    outcome = self._validate(data.get('token'), room, participant)
+                if outcome == 'ok' and self.options['connect']:
+                    connected = loop.time()
+                    join = await ws_join(data['url'], data['token'], self.options['timeout'])
+                    connect_latency = loop.time() - connected
+                    if join.get('room') != room:
+                        outcome = 'ws_wrong_room'
+        except asyncio.TimeoutError:
+            outcome = 'timeout'
+        except ConnectionRefusedError as e:
+            outcome = str(e.args[0]) if e.args and str(e.args[0]).startswith('ws_') else 'ConnectionRefusedError'
+        except (OSError, ValueError, asyncio.IncompleteReadError) as e:
+            outcome = type(e).__name__
+        latency = loop.time() - (self.start + offset)
+        self.records.append((offset, latency, outcome, connect_latency))
+    
+    def _validate(self, token, room: str, participant: str) -> str:
+        from api.token import TokenVerificationError
+        try:
+            claims = self.verifier.verify(token, room_name=room)
+        except TokenVerificationError as e:
+            return f'invalid_token_{e.reason}'
+        return 'ok' if claims.get('sub') == participant else 'invalid_token_wrong_subject'
+    
+    async def _tracked(self, index: int, offset: float):
+        self.in_flight += 1
+        bucket = self._bucket(asyncio.get_running_loop().time() - self.start)
+        self.peaks[bucket] = max(self.peaks.get(bucket, 0), self.in_flight)
+        try:
+            await self._one(index, offset)
+        finally:
+            self.in_flight -= 1
+    
+    async def run(self) -> float:
+        loop = asyncio.get_running_loop()
+        tasks = set()
+        self.start = loop.time()
+        for index, offset in enumerate(self.arrivals):
+            delay = self.start + offset - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if self.in_flight >= self.options['max_in_flight']:
+                # Генератор сам не успевает: считаем, а не копим бесконечную очередь
+                self.dropped.append(offset)
+                continue
+            task = asyncio.ensure_future(self._tracked(index, offset))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+        return loop.time() - self.start
+
+def _kinds(outcomes) -> dict:
+    kinds = {}
+    for outcome in outcomes:
+        if outcome != 'ok':
+            kinds[outcome] = kinds.get(outcome, 0) + 1
+    return dict(sorted(kinds.items()))
+
+def build_series(records: list, dropped: list, peaks: dict, interval: float) -> list:
+    buckets = {}
+    for record in records:
+        buckets.setdefault(int(record[0] // interval), []).append(record)
+    dropped_per_bucket = {}
+    for offset in dropped:
+        bucket = int(offset // interval)
+        dropped_per_bucket[bucket] = dropped_per_bucket.get(bucket, 0) + 1
+    last = max(list(buckets) + list(dropped_per_bucket) + [0])
+    series = []
+    for bucket in range(last + 1):
+        rows = buckets.get(bucket, [])
+        latencies = sorted(row[1] for row in rows)
+        connects = sorted(row[3] for row in rows if row[3] is not None)
+        kinds = _kinds(row[2] for row in rows)
+        if dropped_per_bucket.get(bucket):
+            kinds['dropped'] = dropped_per_bucket[bucket]
+        ok = sum(1 for row in rows if row[2] == 'ok')
+        series.append({
+            't_s': round(bucket * interval, 3),
+            'offered': len(rows) + dropped_per_bucket.get(bucket, 0),
+            'completed': len(rows),
+            'ok': ok,
+            'errors': len(rows) - ok + dropped_per_bucket.get(bucket, 0),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+            'max_ms': round(latencies[-1] * 1000, 3) if latencies else 0.0,
+            'connect_p50_ms': round(percentile(connects, 0.50) * 1000, 3) if connects else None,
+            'in_flight_peak': peaks.get(bucket, 0),
+            'error_kinds': kinds,
+        })
+    return series
+
+def write_csv(path: str, series: list):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        for row in series:
+            row = dict(row)
+            row['error_kinds'] = ';'.join(f'{kind}:{count}' for kind, count in row['error_kinds'].items())
+            writer.writerow(row)
+
+def run(
+    url: str = None,
+    target: str = 'http',
+    pattern: str = 'burst',
+    duration: float = 10.0,
+    rate: float = 20.0,
+    peak_rate: float = None,
+    burst_size: int = 500,
+    burst_every: float = None,
+    poisson: bool = False,
+    validate: bool = False,
+    connect: bool = False,
+    connections: int = 32,
+    max_in_flight: int = 5000,
+    rooms: int = 50,
+    no_cache: bool = False,
+    interval: float = 1.0,
+    timeout: float = 30.0,
+    workers: int = 32,
+    seed: int = 0
+) -> dict:
+    if pattern not in PATTERNS:
+        raise ValueError(f'Unknown pattern {pattern!r}, expected one of {PATTERNS}')
+    if target not in TARGETS:
+        raise ValueError(f'Unknown target {target!r}, expected one of {TARGETS}')
+    
+    arrivals = arrival_times(pattern, duration, rate, peak_rate, burst_size, burst_every, poisson, seed)
+    stub = process = None
+    stub_url = None
+    if connect and not url:
+        stub, stub_url = start_stub(hold=1.0)
+    
+    if target == 'handler':
+        if stub_url:
+            os.environ['LIVEKIT_URL'] = stub_url
+        make_target = lambda: HandlerTarget(connections)
+        endpoint = 'api.token.handler'
+    else:
+        if url:
+            parts = urlsplit(url)
+            host, port, path = parts.hostname, parts.port or 80, parts.path or '/'
+        else:
+            extra_env = {'LIVEKIT_URL': stub_url} if stub_url else {}
+            process, port = start_server(workers, extra_env=extra_env)
+            host, path = '127.0.0.1', '/'
+        make_target = lambda: HttpPool(host, port, path, connections, timeout)
+        endpoint = f'http://{host}:{port}{path}'
+    
+    verifier = None
+    if validate:
+        from api.token import TokenVerifier
+        verifier = TokenVerifier.from_env()
+        if verifier is not None:
+            verifier.cache_size = 0
+    
+    options = {
+        'interval': interval, 'rooms': rooms, 'room_prefix': f'soak-{os.getpid()}', 'no_cache': no_cache,
+        'connect': connect, 'timeout': timeout, 'max_in_flight': max_in_flight,
+    }
+    
+    async def drive():
+        load_target = make_target()
+        load = LoadRun(load_target, arrivals, options, verifier)
+        try:
+            wall = await load.run()
+        finally:
+            load_target.close()
+        return load, wall, getattr(load_target, 'opened', None)
+    
+    try:
+        load, wall, opened = asyncio.run(drive())
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+        if stub is not None:
+            stub_stats = stub.stats()
+            stub.close()
+    
+    latencies = sorted(record[1] for record in load.records)
+    connects = sorted(record[3] for record in load.records if record[3] is not None)
+    kinds = _kinds(record[2] for record in load.records)
+    if load.dropped:
+        kinds['dropped'] = len(load.dropped)
+    ok = sum(1 for record in load.records if record[2] == 'ok')
+    offered = len(arrivals)
+    report = {
+        'endpoint': endpoint,
+        'pattern': pattern,
+        'duration_s': duration,
+        'rate': rate,
+        'peak_rate': peak_rate if pattern == 'ramp' else None,
+        'burst_size': burst_size if pattern == 'burst' else None,
+        'validate': verifier is not None,
+        'connect': connect,
+        'connections': connections,
+        'server_workers': workers if process is not None else None,
+        'offered': offered,
+        'completed': len(load.records),
+        'ok': ok,
+        'error_rate': round((offered - ok) / offered, 4) if offered else 0.0,
+        'errors': kinds,
+        'wall_s': round(wall, 3),
+        'achieved_rps': round(ok / wall, 1) if wall else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'max_ms': round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        'connect_p50_ms': round(percentile(connects, 0.50) * 1000, 3) if connects else None,
+        'connect_p99_ms': round(percentile(connects, 0.99) * 1000, 3) if connects else None,
+        'connections_opened': opened,
+    }
+    if stub is not None:
+        report['livekit_stub'] = stub_stats
+    report['series'] = build_series(load.records, load.dropped, load.peaks, interval)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Уже запущенный сервер токенов; без него поднимается python -m api.token')
+    parser.add_argument('--target', choices=TARGETS, default='http', help='http - TokenServer, handler - Vercel handler')
+    parser.add_argument('--pattern', choices=PATTERNS, default='burst')
+    parser.add_argument('--duration', type=float, default=10.0, help='Секунд расписания прихода')
+    parser.add_argument('--rate', type=float, default=20.0, help='Запросов/с (для ramp - начальная)')
+    parser.add_argument('--peak-rate', type=float, help='Конечная интенсивность ramp, запросов/с')
+    parser.add_argument('--burst-size', type=int, default=500, help='Одновременных запросов во всплеске')
+    parser.add_argument('--burst-every', type=float, help='Секунд между всплесками (по умолчанию один в середине)')
+    parser.add_argument('--poisson', action='store_true', help='Экспоненциальные интервалы между приходами')
+    parser.add_argument('--validate', action='store_true', help='Проверять каждый токен TokenVerifier')
+    parser.add_argument('--connect', action='store_true', help='Подключаться с токеном к LIVEKIT_URL (заглушке)')
+    parser.add_argument('--connections', type=int, default=32, help='Одновременных HTTP соединений (потоков для handler)')
+    parser.add_argument('--max-in-flight', type=int, default=5000, help='Сверх этого запросы считаются dropped')
+    parser.add_argument('--rooms', type=int, default=50, help='Сколько разных комнат')
+    parser.add_argument('--no-cache', action='store_true', help='Передавать "noCache": true')
+    parser.add_argument('--interval', type=float, default=1.0, help='Шаг временного ряда, секунд')
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--workers', type=int, default=32, help='Потоков сервера (если запускаем его сами)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--csv', help='Записать временной ряд в CSV')
+    parser.add_argument('--output', help='Записать отчет в JSON')
+    args = parser.parse_args()
+    
+    report = run(
+        args.url, args.target, args.pattern, args.duration, args.rate, args.peak_rate, args.burst_size,
+        args.burst_every, args.poisson, args.validate, args.connect, args.connections, args.max_in_flight,
+        args.rooms, args.no_cache, args.interval, args.timeout, args.workers, args.seed
+    )
+    if args.csv:
+        write_csv(args.csv, report['series'])
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -1,25 +1,20 @@
 import os
-from typing import Dict, Optional
-from openai import OpenAI
+from typing import Iterable, Optional, Union
+from openai_clients import get_client
+from prompt_builder import PromptBuilder, truncate_to_tokens
+from rules_cache import ResponseCache, TokenUsage, get_response_cache, cached_completion
+from rules_writer import markdown_output, tee_chunks, write_rules
+from rules_store import get_rules_store, project_for_path
+from rate_scheduler import RequestScheduler, RulesGenerationError, get_scheduler
 
-class ChatRulesGenerator:
-    def __init__(self, api_key: Optional[str] = None):
-        """
-        Инициализация генератора с OpenAI API ключом.
-        """
-        if api_key:
-            self.client = OpenAI(api_key=api_key)
-        else:
-            api_key = os.getenv('OPENAI_API_KEY')
-            if not api_key:
-                raise ValueError("OpenAI API key не найден. Передайте api_key или установите переменную окружения OPENAI_API_KEY")
-            self.client = OpenAI(api_key=api_key)
-    
-    def generate_rag_livekit_rules(self, project_description: str, additional_context: str = "") -> str:
-        """
-        Генерирует специализированные .cursorrules для RAG проекта с LiveKit.
-        """
-        system_prompt = """Ты эксперт по созданию .cursorrules файлов для IDE Cursor, специализирующийся на RAG (Retrieval-Augmented Generation) системах с LiveKit.
+# Параметры запросов к модели
+RAG_MODEL = "gpt-4o"
+RAG_MAX_TOKENS = 2500
+RAG_TEMPERATURE = 0.7
+
+# Статический префикс: system prompt вместе с неизменным описанием архитектуры.
+# Собирается один раз и идет первым, чтобы провайдер переиспользовал кэш префикса
+RAG_SYSTEM_PROMPT = """Ты эксперт по созданию .cursorrules файлов для IDE Cursor, специализирующийся на RAG (Retrieval-Augmented Generation) системах с LiveKit.
 
 Твоя задача - создать максимально полезный .cursorrules файл для проекта RAG с LiveKit, основываясь на:
 1. Архитектуре из примера: https://github.com/avijeett007/kno2gether-webrtc-agent/tree/develop/RAG
@@ -36,15 +31,6 @@ class ChatRulesGenerator:
 - Паттерны для агентов реального времени
 - Безопасность и производительность для RAG систем
 
-Формат ответа: только текст .cursorrules, без дополнительных пояснений."""
-
-        user_prompt = f"""Создай .cursorrules для RAG проекта с LiveKit:
-
-Описание проекта: {project_description}
-
-Дополнительный контекст:
-{additional_context}
-
 Архитектура проекта включает:
 - Python Voice Agent с LiveKit
 - RAG система с LlamaIndex
@@ -54,32 +40,85 @@ class ChatRulesGenerator:
 - WebRTC для реального времени
 - Векторные базы данных для хранения знаний
 
+Формат ответа: только текст .cursorrules, без дополнительных пояснений."""
+
+RAG_PROMPT = PromptBuilder(RAG_SYSTEM_PROMPT, RAG_MODEL)
+
+RAG_USER_TEMPLATE = """Создай .cursorrules для RAG проекта с LiveKit:
+
+Описание проекта: {project_description}
+
+Дополнительный контекст:
+{additional_context}
+
 Создай максимально релевантные правила для эффективной разработки такой системы."""
 
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "developer", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=2500,
-                temperature=0.7
-            )
-            
-            return response.choices[0].message.content.strip()
-            
-        except Exception as e:
-            return f"Ошибка при генерации правил: {str(e)}"
+class ChatRulesGenerator:
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        cache: Optional[ResponseCache] = None,
+        use_cache: bool = True,
+        scheduler: Optional[RequestScheduler] = None
+    ):
+        """
+        Инициализация генератора с OpenAI API ключом.
+        Ответы модели кэшируются на диске (rules_cache), use_cache=False отключает кэш.
+        Запросы идут через общий планировщик лимитов (rate_scheduler), повторы делает он.
+        """
+        self.cache = (cache or get_response_cache()) if use_cache else None
+        self.usage = TokenUsage()
+        self.scheduler = scheduler or get_scheduler()
+        self.client = get_client(api_key).with_options(max_retries=0)
+    
+    def generate_rag_livekit_rules(
+        self,
+        project_description: str,
+        additional_context: str = ""
+    ) -> str:
+        """
+        Генерирует специализированные .cursorrules для RAG проекта с LiveKit.
+        Ошибка API после всех повторов - RulesGenerationError.
+        """
+        # Дополнительный контекст обрезается, если промпт не влезает в бюджет входных токенов
+        budget = RAG_PROMPT.available_tokens(
+            RAG_USER_TEMPLATE.format(project_description=project_description, additional_context='')
+        )
+        fitted_context = truncate_to_tokens(additional_context, budget, RAG_MODEL)
+        prompt = RAG_PROMPT.build(
+            RAG_USER_TEMPLATE.format(project_description=project_description, additional_context=fitted_context),
+            trimmed=fitted_context != additional_context
+        )
+        
+        content = cached_completion(
+            self.client,
+            self.cache,
+            RAG_MODEL,
+            prompt.messages,
+            max_tokens=RAG_MAX_TOKENS,
+            temperature=RAG_TEMPERATURE,
+            usage=self.usage,
+            estimated_tokens=prompt.estimated_tokens,
+            scheduler=self.scheduler
+        )
+        return content.strip()
 
-def save_rules_md(rules_text: str, filename: str = 'rag_livekit_rules.md'):
+def save_rules_md(rules_text: Union[str, Iterable[str]], filename: str = 'rag_livekit_rules.md'):
     """
-    Сохраняет итоговые правила в .md-файл.
+    Сохраняет итоговые правила (строку или фрагменты) в .md-файл атомарно, см. rules_writer,
+    и новой версией в историю rules_store.
     """
-    os.makedirs(os.path.dirname(filename) if os.path.dirname(filename) else '.', exist_ok=True)
-    
-    with open(filename, 'w', encoding='utf-8') as f:
-        f.write(f"# RAG LiveKit Cursor Rules\n\n```\n{rules_text}\n```\n")
+    store = get_rules_store()
+    parts = None
+    if store is not None and not isinstance(rules_text, str):
+        parts = []
+        rules_text = tee_chunks(rules_text, parts)
+    write_rules(rules_text, [markdown_output(filename, "# RAG LiveKit Cursor Rules")])
+    if parts is not None:
+        rules_text = ''.join(parts)
+    if store is not None:
+        store.put(project_for_path(filename), rules_text, "# RAG LiveKit Cursor Rules",
+                  meta={'path': os.path.abspath(filename)})
 
 def main():
     try:
@@ -107,12 +146,16 @@ def main():
         print("Генерирую .cursorrules для RAG проекта с LiveKit...")
         
         # Генерируем правила
-        rules = generator.generate_rag_livekit_rules(project_description, additional_context)
-        print('\nСгенерированные правила для RAG + LiveKit проекта:\n')
-        print(rules)
+        try:
+            rules = generator.generate_rag_livekit_rules(project_description, additional_context)
+            print('\nСгенерированные правила для RAG + LiveKit проекта:\n')
+            print(rules)
+        except RulesGenerationError as e:
+            print(f"\nОшибка при генерации правил: {e}")
+            rules = None
         
         # Сохраняем файл
-        while True:
+        while rules:
             answer = input('\nСохранить в rag_livekit_rules.md? (y/n): ').strip().lower()
             if answer == 'y':
                 save_rules_md(rules, 'rag_livekit_rules.md')
@@ -123,6 +166,13 @@ def main():
                 break
             else:
                 print("Пожалуйста, введите 'y' для сохранения или 'n' для отмены.")
+        
+        if generator.usage.requests:
+            print(generator.usage.report())
+        if generator.cache is not None:
+            print(generator.cache.report())
+        if generator.scheduler.rate_limited or generator.scheduler.failed:
+            print(generator.scheduler.report())
                 
     except Exception as e:
         print(f"Ошибка: {str(e)}")
@@ -1,37 +1,29 @@
 import os
-from typing import List, Dict, Optional, Tuple
-from openai import OpenAI
+import time
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Tuple, Callable, AsyncIterator, Iterable, Union
+from openai_clients import get_client, create_async_client
+from prompt_builder import Prompt, PromptBuilder, fit_clarifications
+from rules_sections import SECTIONS, SECTION_SYSTEM_PROMPT, build_section_prompt, merge_sections
+from rules_index import get_rules_index, reuse_threshold
+from rules_writer import markdown_output, plain_output, tee_chunks, write_rules
+from rules_store import get_rules_store, project_for_path
+from rules_cache import (
+    ResponseCache, TokenUsage, get_response_cache, key_for_messages, cached_completion, completion_text
+)
+from rate_scheduler import RequestScheduler, RulesGenerationError, get_scheduler
 
-class CursorRulesGenerator:
-    def __init__(self, api_key: Optional[str] = None):
-        """
-        Инициализация генератора с OpenAI API ключом.
-        Если api_key не передан, пытается взять из переменной окружения OPENAI_API_KEY.
-        """
-        if api_key:
-            self.client = OpenAI(api_key=api_key)
-        else:
-            # Попытка взять из переменной окружения
-            api_key = os.getenv('OPENAI_API_KEY')
-            if not api_key:
-                raise ValueError("OpenAI API key не найден. Передайте api_key или установите переменную окружения OPENAI_API_KEY")
-            self.client = OpenAI(api_key=api_key)
-    
-    def generate_cursorrules(self, user_query: str, clarifications: Optional[Dict[str, str]] = None) -> str:
-        """
-        Генерирует .cursorrules с помощью OpenAI GPT-4.1.
-        """
-        # Создаем контекст для LLM
-        context = f"Пользователь описал свой проект: {user_query}"
-        
-        if clarifications:
-            context += "\n\nДополнительные уточнения:"
-            for question, answer in clarifications.items():
-                if answer.strip():
-                    context += f"\n- {question}: {answer}"
-        
-        # Промпт для генерации .cursorrules
-        system_prompt = """Ты эксперт по написанию .cursorrules файлов для IDE Cursor.
+# Параметры запросов к модели
+RULES_MODEL = "gpt-4.1"  # Используем GPT-4.1 как в примере
+RULES_MAX_TOKENS = 2000
+RULES_TEMPERATURE = 0.7
+QUESTIONS_MAX_TOKENS = 500
+QUESTIONS_TEMPERATURE = 0.8
+
+# Промпт для генерации .cursorrules
+RULES_SYSTEM_PROMPT = """Ты эксперт по написанию .cursorrules файлов для IDE Cursor.
 
 .cursorrules файлы - это инструкции для AI-ассистента в Cursor IDE, которые определяют как он должен действовать при работе с кодом.
 
@@ -98,33 +90,8 @@ Testing and Documentation
 - Follow PEP 8 coding standards
 ```"""
 
-        user_prompt = f"""Создай .cursorrules файл для следующего проекта:
-
-{context}
-
-Сгенерируй максимально релевантные и полезные правила для этого проекта."""
-
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4.1",  # Используем GPT-4.1 как в примере
-                messages=[
-                    {"role": "developer", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=2000,
-                temperature=0.7
-            )
-            
-            return response.choices[0].message.content.strip()
-            
-        except Exception as e:
-            return f"Ошибка при генерации правил: {str(e)}"
-
-    def get_clarifying_questions(self, user_query: str) -> List[str]:
-        """
-        Генерирует уточняющие вопросы с помощью OpenAI GPT-4.1.
-        """
-        system_prompt = """Ты помощник, который задает уточняющие вопросы для лучшего понимания проекта разработки.
+# Промпт для уточняющих вопросов
+QUESTIONS_SYSTEM_PROMPT = """Ты помощник, который задает уточняющие вопросы для лучшего понимания проекта разработки.
 
 Твоя задача:
 1. Проанализировать описание проекта пользователя
@@ -134,36 +101,440 @@ Testing and Documentation
 
 Формат ответа: каждый вопрос на новой строке, без нумерации."""
 
-        user_prompt = f"""Пользователь описал свой проект: {user_query}
+# Статические префиксы промптов: собираются один раз и идут первыми в каждом запросе,
+# чтобы провайдер мог переиспользовать кэш префикса между запросами
+RULES_PROMPT = PromptBuilder(RULES_SYSTEM_PROMPT, RULES_MODEL)
+QUESTIONS_PROMPT = PromptBuilder(QUESTIONS_SYSTEM_PROMPT, RULES_MODEL)
+SECTIONS_PROMPT = PromptBuilder(SECTION_SYSTEM_PROMPT, RULES_MODEL)
+
+RULES_USER_TEMPLATE = """Создай .cursorrules файл для следующего проекта:
+
+{context}
+
+Сгенерируй максимально релевантные и полезные правила для этого проекта."""
+
+QUESTIONS_USER_TEMPLATE = """Пользователь описал свой проект: {user_query}
 
 Какие уточняющие вопросы помогут лучше понять проект для создания качественных правил разработки?"""
 
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4.1",  # Используем GPT-4.1 как в примере
-                messages=[
-                    {"role": "developer", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=500,
-                temperature=0.8
+CLARIFICATIONS_HEADER = "\n\nДополнительные уточнения:"
+
+# Запись индекса, правила которой вернул последний вызов генератора, - своя у каждого
+# потока и задачи asyncio. Значение - (метка генератора, запись): генераторов много, переменная одна
+_last_reused: contextvars.ContextVar = contextvars.ContextVar('last_reused', default=(None, None))
+
+def _build_rules_prompt(user_query: str, clarifications: Optional[Dict[str, str]] = None) -> Prompt:
+    """
+    Собирает промпт для генерации .cursorrules (общий для sync и async генераторов).
+    Уточнения обрезаются, если промпт не влезает в бюджет входных токенов.
+    """
+    # Создаем контекст для LLM
+    context = f"Пользователь описал свой проект: {user_query}"
+    trimmed = False
+    
+    if clarifications:
+        answered = {q: a for q, a in clarifications.items() if a.strip()}
+        budget = RULES_PROMPT.available_tokens(RULES_USER_TEMPLATE.format(context=context), CLARIFICATIONS_HEADER)
+        fitted = fit_clarifications(answered, budget, RULES_MODEL)
+        trimmed = fitted != answered
+        if fitted:
+            context += CLARIFICATIONS_HEADER
+            for question, answer in fitted.items():
+                context += f"\n- {question}: {answer}"
+    
+    return RULES_PROMPT.build(RULES_USER_TEMPLATE.format(context=context), trimmed)
+
+def _build_questions_prompt(user_query: str) -> Prompt:
+    """
+    Собирает промпт для генерации уточняющих вопросов.
+    """
+    return QUESTIONS_PROMPT.build(QUESTIONS_USER_TEMPLATE.format(user_query=user_query))
+
+def _find_reusable(
+    user_query: str,
+    clarifications: Optional[Dict[str, str]],
+    threshold: float
+) -> Optional[Tuple[float, str, dict]]:
+    """Ранее сохраненные правила для похожего проекта (rules_index), если сходство не ниже threshold"""
+    if threshold <= 0:
+        return None
+    return get_rules_index().find_reusable(user_query, clarifications, threshold)
+
+def _parse_questions(text: str) -> List[str]:
+    """Ответ модели: каждый вопрос на новой строке"""
+    questions = text.strip().split('\n')
+    return [q.strip() for q in questions if q.strip()]
+
+class CursorRulesGenerator:
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        cache: Optional[ResponseCache] = None,
+        use_cache: bool = True,
+        usage: Optional[TokenUsage] = None,
+        similarity_threshold: Optional[float] = None,
+        scheduler: Optional[RequestScheduler] = None
+    ):
+        """
+        Инициализация генератора с OpenAI API ключом.
+        Если api_key не передан, пытается взять из переменной окружения OPENAI_API_KEY.
+        Ответы модели кэшируются на диске (rules_cache), use_cache=False отключает кэш.
+        Если для похожего проекта уже сохранены правила (rules_index) со сходством
+        не ниже similarity_threshold (по умолчанию RULES_REUSE_THRESHOLD, без него 0),
+        они возвращаются без запроса к модели; 0 отключает повторное использование.
+        Запросы идут через общий планировщик лимитов (rate_scheduler).
+        """
+        self.cache = (cache or get_response_cache()) if use_cache else None
+        self.usage = usage or TokenUsage()
+        self.similarity_threshold = reuse_threshold() if similarity_threshold is None else similarity_threshold
+        # last_reused свой у каждого потока: генератор общий для потоков batch_generate
+        self._reuse_owner = object()
+        self.scheduler = scheduler or get_scheduler()
+        # Клиент общий для процесса: один пул keep-alive соединений на все генераторы.
+        # Повторы делает планировщик
+        self.client = get_client(api_key).with_options(max_retries=0)
+    
+    @property
+    def last_reused(self) -> Optional[dict]:
+        """Запись индекса, правила которой вернул последний вызов generate_cursorrules в этом потоке (или None)"""
+        owner, entry = _last_reused.get()
+        return entry if owner is self._reuse_owner else None
+    
+    def generate_cursorrules(
+        self,
+        user_query: str,
+        clarifications: Optional[Dict[str, str]] = None
+    ) -> str:
+        """
+        Генерирует .cursorrules с помощью OpenAI GPT-4.1.
+        Ошибка API после всех повторов - RulesGenerationError.
+        """
+        _last_reused.set((self._reuse_owner, None))
+        reusable = _find_reusable(user_query, clarifications, self.similarity_threshold)
+        if reusable is not None:
+            score, rules, entry = reusable
+            _last_reused.set((self._reuse_owner, dict(entry, score=score)))
+            return rules
+        
+        prompt = _build_rules_prompt(user_query, clarifications)
+        content = cached_completion(
+            self.client,
+            self.cache,
+            RULES_MODEL,
+            prompt.messages,
+            RULES_MAX_TOKENS,
+            RULES_TEMPERATURE,
+            usage=self.usage,
+            estimated_tokens=prompt.estimated_tokens,
+            scheduler=self.scheduler
+        )
+        return content.strip()
+
+    def generate_sectioned(
+        self,
+        user_query: str,
+        clarifications: Optional[Dict[str, str]] = None
+    ) -> str:
+        """
+        Генерирует .cursorrules по разделам (rules_sections) параллельно.
+        Каждый раздел кэшируется отдельно, поэтому после изменения одного
+        уточнения заново запрашиваются только зависящие от него разделы.
+        """
+        def generate_section(section) -> str:
+            prompt = build_section_prompt(SECTIONS_PROMPT, section, user_query, clarifications)
+            return cached_completion(
+                self.client,
+                self.cache,
+                RULES_MODEL,
+                prompt.messages,
+                section.max_tokens,
+                RULES_TEMPERATURE,
+                usage=self.usage,
+                estimated_tokens=prompt.estimated_tokens,
+                scheduler=self.scheduler
             )
-            
-            questions = response.choices[0].message.content.strip().split('\n')
-            return [q.strip() for q in questions if q.strip()]
-            
-        except Exception as e:
-            return [f"Ошибка при генерации вопросов: {str(e)}"]
-
-def save_rules_md(rules_text: str, filename: str = 'rules.md'):
+        
+        with ThreadPoolExecutor(max_workers=len(SECTIONS)) as executor:
+            texts = executor.map(generate_section, SECTIONS)
+            return merge_sections({section.key: text for section, text in zip(SECTIONS, texts)})
+    
+    def get_clarifying_questions(self, user_query: str) -> List[str]:
+        """
+        Генерирует уточняющие вопросы с помощью OpenAI GPT-4.1.
+        """
+        prompt = _build_questions_prompt(user_query)
+        content = cached_completion(
+            self.client,
+            self.cache,
+            RULES_MODEL,
+            prompt.messages,
+            QUESTIONS_MAX_TOKENS,
+            QUESTIONS_TEMPERATURE,
+            usage=self.usage,
+            estimated_tokens=prompt.estimated_tokens,
+            scheduler=self.scheduler
+        )
+        return _parse_questions(content)
+
+class AsyncCursorRulesGenerator:
     """
-    Сохраняет итоговые правила в .md-файл.
+    Асинхронный вариант CursorRulesGenerator на AsyncOpenAI.
+    
+    generate_cursorrules стримит ответ модели и отдает фрагменты по мере поступления,
+    generate_many генерирует правила для многих проектов параллельно
+    с ограничением числа одновременных запросов.
     """
-    # Создаем директорию если не существует
-    os.makedirs(os.path.dirname(filename), exist_ok=True)
     
-    with open(filename, 'w', encoding='utf-8') as f:
-        f.write(f"# Cursor Rules\n\n```\n{rules_text}\n```\n")
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        max_concurrency: int = 4,
+        cache: Optional[ResponseCache] = None,
+        use_cache: bool = True,
+        usage: Optional[TokenUsage] = None,
+        similarity_threshold: Optional[float] = None,
+        scheduler: Optional[RequestScheduler] = None
+    ):
+        """
+        Инициализация генератора с OpenAI API ключом.
+        Если api_key не передан, пытается взять из переменной окружения OPENAI_API_KEY.
+        Ответы модели кэшируются на диске (rules_cache), use_cache=False отключает кэш.
+        Правила похожего проекта из rules_index переиспользуются, как в CursorRulesGenerator.
+        Запросы идут через общий планировщик лимитов (rate_scheduler), повторы делает он.
+        """
+        self.cache = (cache or get_response_cache()) if use_cache else None
+        self.usage = usage or TokenUsage()
+        self.similarity_threshold = reuse_threshold() if similarity_threshold is None else similarity_threshold
+        # last_reused свой у каждой задачи asyncio: generate_many запускает проекты параллельно
+        self._reuse_owner = object()
+        self.scheduler = scheduler or get_scheduler()
+        self.client = create_async_client(api_key).with_options(max_retries=0)
+        self.max_concurrency = max_concurrency
+    
+    @property
+    def last_reused(self) -> Optional[dict]:
+        """Запись индекса, правила которой вернул последний вызов в этой задаче asyncio (или None)"""
+        owner, entry = _last_reused.get()
+        return entry if owner is self._reuse_owner else None
+    
+    async def aclose(self):
+        """Закрывает HTTP соединения клиента (до закрытия event loop)"""
+        await self.client.close()
+    
+    async def __aenter__(self) -> 'AsyncCursorRulesGenerator':
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+    
+    async def _complete(self, prompt: Prompt, max_tokens: int, temperature: float) -> str:
+        """Асинхронный аналог rules_cache.cached_completion"""
+        key = None
+        if self.cache is not None:
+            key = key_for_messages(RULES_MODEL, prompt.messages, temperature, max_tokens)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        
+        started = time.perf_counter()
+        response = await self.scheduler.acomplete(
+            self.client,
+            prompt.estimated_tokens + max_tokens,
+            model=RULES_MODEL,
+            messages=prompt.messages,
+            max_tokens=max_tokens,
+            temperature=temperature
+        )
+        
+        self.usage.add(response.usage, prompt.estimated_tokens)
+        content = completion_text(response)
+        if key is not None:
+            self.cache.put(key, content, time.perf_counter() - started)
+        return content
+    
+    async def get_clarifying_questions(self, user_query: str) -> List[str]:
+        """
+        Генерирует уточняющие вопросы с помощью OpenAI GPT-4.1.
+        """
+        content = await self._complete(
+            _build_questions_prompt(user_query), QUESTIONS_MAX_TOKENS, QUESTIONS_TEMPERATURE
+        )
+        return _parse_questions(content)
+    
+    async def stream_cursorrules(
+        self,
+        user_query: str,
+        clarifications: Optional[Dict[str, str]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Стримит текст .cursorrules фрагментами по мере генерации.
+        Правила похожего проекта из rules_index и ответ из кэша отдаются одним фрагментом, полностью полученный
+        ответ модели сохраняется в кэш. Ошибки API - RulesGenerationError.
+        """
+        _last_reused.set((self._reuse_owner, None))
+        reusable = _find_reusable(user_query, clarifications, self.similarity_threshold)
+        if reusable is not None:
+            score, rules, entry = reusable
+            _last_reused.set((self._reuse_owner, dict(entry, score=score)))
+            yield rules
+            return
+        
+        prompt = _build_rules_prompt(user_query, clarifications)
+        key = None
+        if self.cache is not None:
+            key = key_for_messages(RULES_MODEL, prompt.messages, RULES_TEMPERATURE, RULES_MAX_TOKENS)
+            cached = self.cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+        
+        started = time.perf_counter()
+        stream = self.scheduler.astream(
+            self.client,
+            prompt.estimated_tokens + RULES_MAX_TOKENS,
+            model=RULES_MODEL,
+            messages=prompt.messages,
+            max_tokens=RULES_MAX_TOKENS,
+            temperature=RULES_TEMPERATURE,
+            # Последний фрагмент потока несет usage с числом закэшированных входных токенов
+            stream_options={"include_usage": True}
+        )
+        parts = []
+        usage = None
+        try:
+            async for chunk in stream:
+                if chunk.usage is not None:
+                    usage = chunk.usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+        finally:
+            # Если потребитель остановился раньше, поток закрывается сразу и освобождает слот планировщика
+            await stream.aclose()
+        
+        self.usage.add(usage, prompt.estimated_tokens)
+        if not parts:
+            raise RulesGenerationError("Модель вернула пустой ответ", 'empty')
+        if key is not None:
+            self.cache.put(key, ''.join(parts), time.perf_counter() - started)
+    
+    async def generate_cursorrules(
+        self,
+        user_query: str,
+        clarifications: Optional[Dict[str, str]] = None,
+        on_token: Optional[Callable[[str], None]] = None
+    ) -> str:
+        """
+        Генерирует .cursorrules со стримингом: on_token вызывается для каждого
+        фрагмента сразу по приходу, итоговый текст возвращается целиком.
+        """
+        parts = []
+        async for text in self.stream_cursorrules(user_query, clarifications):
+            parts.append(text)
+            if on_token:
+                on_token(text)
+        return ''.join(parts).strip()
+    
+    async def generate_sectioned(
+        self,
+        user_query: str,
+        clarifications: Optional[Dict[str, str]] = None
+    ) -> str:
+        """
+        Генерирует .cursorrules по разделам (rules_sections) параллельно,
+        не больше max_concurrency запросов одновременно.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async def generate_section(section) -> str:
+            prompt = build_section_prompt(SECTIONS_PROMPT, section, user_query, clarifications)
+            async with semaphore:
+                return await self._complete(prompt, section.max_tokens, RULES_TEMPERATURE)
+        
+        texts = await asyncio.gather(*(generate_section(section) for section in SECTIONS))
+        return merge_sections({section.key: text for section, text in zip(SECTIONS, texts)})
+    
+    async def generate_many(
+        self,
+        projects: Iterable[Union[str, Tuple[str, Optional[Dict[str, str]]]]],
+        concurrency: Optional[int] = None
+    ) -> List[Union[str, RulesGenerationError]]:
+        """
+        Генерирует .cursorrules для многих проектов параллельно.
+        
+        Args:
+            projects: Описания проектов или пары (описание, уточнения)
+            concurrency: Максимум одновременных запросов (по умолчанию max_concurrency)
+        
+        Returns:
+            Правила (или RulesGenerationError для проекта с ошибкой) в том же порядке, что и projects
+        """
+        semaphore = asyncio.Semaphore(concurrency or self.max_concurrency)
+        
+        async def generate_one(project) -> Union[str, RulesGenerationError]:
+            user_query, clarifications = (project, None) if isinstance(project, str) else project
+            async with semaphore:
+                try:
+                    return await self.generate_cursorrules(user_query, clarifications)
+                except RulesGenerationError as e:
+                    return e
+        
+        return await asyncio.gather(*(generate_one(project) for project in projects))
+
+def save_rules_md(
+    rules_text: Union[str, Iterable[str]],
+    filename: str = 'rules.md',
+    user_query: Optional[str] = None,
+    clarifications: Optional[Dict[str, str]] = None,
+    cursorrules_path: Optional[str] = None
+):
+    """
+    Сохраняет итоговые правила в .md-файл (атомарно, см. rules_writer).
+    rules_text - строка или фрагменты, например поток из stream_cursorrules.
+    С cursorrules_path тот же текст за один проход пишется и в голый .cursorrules.
+    Сохраненный текст становится новой версией проекта с именем файла в rules_store.
+    Если передано описание проекта, результат добавляется в индекс похожих запросов (rules_index)
+    вместе с sha256 текста и номером версии.
+    """
+    store = get_rules_store()
+    parts = None
+    if not isinstance(rules_text, str) and (store is not None or user_query):
+        # Для истории и индекса нужен весь текст: фрагменты копятся по мере записи в файлы
+        parts = []
+        rules_text = tee_chunks(rules_text, parts)
+    outputs = [markdown_output(filename, "# Cursor Rules")]
+    if cursorrules_path:
+        outputs.append(plain_output(cursorrules_path))
+    write_rules(rules_text, outputs)
+    if parts is not None:
+        rules_text = ''.join(parts)
+    
+    version = None
+    if store is not None:
+        meta = {'path': os.path.abspath(filename)}
+        if user_query:
+            meta['query'] = user_query
+        stored = store.put(project_for_path(filename), rules_text, "# Cursor Rules", meta=meta)
+        version = (stored.project, stored.version)
+    if user_query:
+        get_rules_index().add(user_query, clarifications, filename, rules_text, version)
+
+async def _stream_rules_to_console(
+    user_query: str,
+    clarifications: Dict[str, str],
+    usage: Optional[TokenUsage] = None
+) -> str:
+    """Генерирует правила, печатая фрагменты в консоль по мере поступления"""
+    async with AsyncCursorRulesGenerator(usage=usage) as generator:
+        rules = await generator.generate_cursorrules(
+            user_query,
+            clarifications,
+            on_token=lambda text: print(text, end='', flush=True)
+        )
+        if generator.last_reused:
+            print(f"\n\n(Правила взяты из похожего проекта «{generator.last_reused['query']}», "
+                  f"сходство {generator.last_reused['score']:.2f})")
+        return rules
 
 def main():
     try:
@@ -171,10 +542,14 @@ def main():
         
         user_query = input('Опишите ваш проект или пожелания: ')
         
-        # Генерируем уточняющие вопросы
-        questions = generator.get_clarifying_questions(user_query)
+        # Генерируем уточняющие вопросы: без них правила все равно можно сгенерировать
+        try:
+            questions = generator.get_clarifying_questions(user_query)
+        except RulesGenerationError as e:
+            print(f"\nОшибка при генерации вопросов: {e}")
+            questions = []
         
-        if questions and not any("Ошибка" in q for q in questions):
+        if questions:
             print('\nУточняющие вопросы:')
             for i, q in enumerate(questions, 1):
                 print(f"{i}. {q}")
@@ -188,20 +563,22 @@ def main():
             clarifications = {q: (answers[i] if i < len(answers) else "") for i, q in enumerate(questions)}
         else:
             clarifications = {}
-            if questions and any("Ошибка" in q for q in questions):
-                print(f"\nОшибка при генерации вопросов: {questions[0]}")
         
-        # Генерируем правила
-        rules = generator.generate_cursorrules(user_query, clarifications)
+        # Генерируем правила: текст печатается по мере стриминга
         print('\nСгенерированные правила:\n')
-        print(rules)
+        try:
+            rules = asyncio.run(_stream_rules_to_console(user_query, clarifications, generator.usage))
+        except RulesGenerationError as e:
+            print(f"\nОшибка при генерации правил: {e}")
+            rules = None
+        print()
         
         # Сохраняем файл
-        while True:
+        while rules:
             answer = input('\nСохранить в rules.md? (y/n): ').strip().lower()
             if answer == 'y':
                 rules_path = os.path.join('cursorrules_lib', 'rules', 'rules.md')
-                save_rules_md(rules, filename=rules_path)
+                save_rules_md(rules, filename=rules_path, user_query=user_query, clarifications=clarifications)
                 print(f'Сохранено в {rules_path}')
                 break
             elif answer == 'n':
@@ -209,6 +586,13 @@ def main():
                 break
             else:
                 print("Пожалуйста, введите 'y' для сохранения или 'n' для отмены.")
+        
+        if generator.usage.requests:
+            print(generator.usage.report())
+        if generator.cache is not None:
+            print(generator.cache.report())
+        if generator.scheduler.rate_limited or generator.scheduler.failed:
+            print(generator.scheduler.report())
                 
     except Exception as e:
         print(f"Ошибка: {str(e)}")
@@ -0,0 +1,81 @@
+"""
+Общий для процесса реестр OpenAI клиентов.
+
+Генераторы правил берут клиента отсюда, поэтому несколько генераторов
+в одном процессе (или генераторы, создаваемые в цикле) используют один
+пул keep-alive соединений и не повторяют TCP/TLS рукопожатия.
+
+Настройка пула через переменные окружения:
+    OPENAI_MAX_CONNECTIONS     максимум соединений в пуле (по умолчанию 100)
+    OPENAI_MAX_KEEPALIVE       сколько простаивающих соединений держать открытыми (по умолчанию 20)
+    OPENAI_KEEPALIVE_EXPIRY    сколько секунд держать простаивающее соединение (по умолчанию 120)
+    OPENAI_HTTP2               HTTP/2, если установлен пакет h2 (по умолчанию 1, 0 - отключить)
+"""
+import os
+import atexit
+import threading
+from typing import Dict, Optional, Tuple
+
+import httpx
+from openai import OpenAI, AsyncOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient
+
+_clients: Dict[Tuple[str, Optional[str], int], OpenAI] = {}
+_clients_lock = threading.Lock()
+
+def resolve_api_key(api_key: Optional[str] = None) -> str:
+    """Ключ из аргумента или OPENAI_API_KEY"""
+    api_key = api_key or os.getenv('OPENAI_API_KEY')
+    if not api_key:
+        raise ValueError("OpenAI API key не найден. Передайте api_key или установите переменную окружения OPENAI_API_KEY")
+    return api_key
+
+def http2_available() -> bool:
+    if os.getenv('OPENAI_HTTP2', '1') in ('', '0'):
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def connection_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=int(os.getenv('OPENAI_MAX_CONNECTIONS', 100)),
+        max_keepalive_connections=int(os.getenv('OPENAI_MAX_KEEPALIVE', 20)),
+        keepalive_expiry=float(os.getenv('OPENAI_KEEPALIVE_EXPIRY', 120)),
+    )
+
+def get_client(api_key: Optional[str] = None, base_url: Optional[str] = None) -> OpenAI:
+    """
+    OpenAI клиент для (api_key, base_url), общий для всего процесса.
+    Без base_url клиент берет OPENAI_BASE_URL или адрес API по умолчанию.
+    """
+    api_key = resolve_api_key(api_key)
+    # После fork пул соединений родителя использовать нельзя
+    key = (api_key, base_url, os.getpid())
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                http_client = DefaultHttpxClient(limits=connection_limits(), http2=http2_available())
+                client = OpenAI(api_key=api_key, base_url=base_url, http_client=http_client)
+                _clients[key] = client
+    return client
+
+def create_async_client(api_key: Optional[str] = None, base_url: Optional[str] = None) -> AsyncOpenAI:
+    """
+    AsyncOpenAI клиент с теми же настройками пула. Асинхронный пул привязан
+    к event loop, поэтому клиент не кэшируется: владелец закрывает его сам.
+    """
+    http_client = DefaultAsyncHttpxClient(limits=connection_limits(), http2=http2_available())
+    return AsyncOpenAI(api_key=resolve_api_key(api_key), base_url=base_url, http_client=http_client)
+
+@atexit.register
+def close_clients():
+    """Закрывает пулы соединений всех клиентов реестра"""
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
@@ -0,0 +1,135 @@
+"""
+Сборка промптов для генераторов правил.
+
+Статическая часть (system prompt с примерами) собирается один раз и всегда
+идет первой, байт в байт одинаковой, чтобы кэширование префикса промпта
+на стороне провайдера срабатывало между запросами. Динамическая часть
+(описание проекта, уточнения) идет после нее.
+
+Размер промпта считается локально до отправки: через tiktoken, если он
+установлен, иначе по консервативной оценке от длины текста. Уточнения,
+не влезающие в бюджет, обрезаются.
+
+Бюджет входных токенов задается RULES_INPUT_TOKEN_BUDGET (по умолчанию 8000).
+"""
+import os
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+DEFAULT_INPUT_TOKEN_BUDGET = 8000
+
+# Служебные токены chat формата: на каждое сообщение и на начало ответа
+_MESSAGE_OVERHEAD = 4
+_REPLY_OVERHEAD = 3
+
+_TRUNCATION_MARK = '…'
+
+@lru_cache(maxsize=None)
+def _encoding(model: Optional[str]):
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model or '')
+    except KeyError:
+        return tiktoken.get_encoding('o200k_base')
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """
+    Число токенов текста. Без tiktoken - оценка сверху: ~4 символа ASCII
+    или ~2 символа остальных алфавитов (кириллица) на токен.
+    """
+    encoding = _encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text))
+    ascii_chars = sum(1 for c in text if c < '\x80')
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars + 1) // 2
+
+def truncate_to_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> str:
+    """Обрезает текст до max_tokens токенов, помечая обрезку многоточием"""
+    if max_tokens <= 0:
+        return ''
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    # Бинарный поиск по длине: count_tokens монотонна по префиксу
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(text[:middle] + _TRUNCATION_MARK, model) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low].rstrip() + _TRUNCATION_MARK
+
+def fit_clarifications(
+    clarifications: Dict[str, str],
+    max_tokens: int,
+    model: Optional[str] = None
+) -> Dict[str, str]:
+    """
+    Уменьшает уточнения до max_tokens токенов. Пустые ответы отбрасываются,
+    затем самые длинные ответы обрезаются до равной доли бюджета. Вопросы,
+    которым не хватило места даже на обрезанный ответ, отбрасываются с конца.
+    """
+    items = [(q, a) for q, a in clarifications.items() if a.strip()]
+    sizes = [count_tokens(f"\n- {q}: {a}", model) for q, a in items]
+    if sum(sizes) <= max_tokens:
+        return dict(items)
+    
+    while items:
+        question_sizes = [count_tokens(f"\n- {q}: ", model) for q, _ in items]
+        answer_budget = (max_tokens - sum(question_sizes)) // len(items)
+        if answer_budget > 0:
+            break
+        items.pop()
+    if not items:
+        return {}
+    
+    # Короткие ответы остаются целыми, их неиспользованная доля переходит длинным
+    answer_sizes = sorted((count_tokens(a, model), i) for i, (_, a) in enumerate(items))
+    remaining = max_tokens - sum(question_sizes)
+    fitted = {}
+    for position, (size, i) in enumerate(answer_sizes):
+        share = remaining // (len(answer_sizes) - position)
+        question, answer = items[i]
+        fitted[question] = answer if size <= share else truncate_to_tokens(answer, share, model)
+        remaining -= min(size, share)
+    return {q: fitted[q] for q, _ in items}
+
+class Prompt:
+    """Готовые сообщения chat.completions и локальная оценка их размера в токенах"""
+    
+    __slots__ = ('messages', 'estimated_tokens', 'trimmed')
+    
+    def __init__(self, messages: List[Dict[str, str]], estimated_tokens: int, trimmed: bool = False):
+        self.messages = messages
+        self.estimated_tokens = estimated_tokens
+        self.trimmed = trimmed
+
+class PromptBuilder:
+    """
+    Промпт с неизменным префиксом: system сообщение создается один раз
+    и переиспользуется во всех запросах, меняется только user сообщение.
+    """
+    
+    def __init__(self, system_prompt: str, model: str, role: str = 'developer', input_budget: Optional[int] = None):
+        self.model = model
+        self.system_message = {'role': role, 'content': system_prompt}
+        self.prefix_tokens = count_tokens(system_prompt, model) + _MESSAGE_OVERHEAD + _REPLY_OVERHEAD
+        self._input_budget = input_budget
+    
+    @property
+    def input_budget(self) -> int:
+        if self._input_budget is not None:
+            return self._input_budget
+        return int(os.getenv('RULES_INPUT_TOKEN_BUDGET', DEFAULT_INPUT_TOKEN_BUDGET))
+    
+    def available_tokens(self, *fixed_parts: str) -> int:
+        """Сколько токенов бюджета остается на переменную часть после префикса и fixed_parts"""
+        used = self.prefix_tokens + _MESSAGE_OVERHEAD + sum(count_tokens(part, self.model) for part in fixed_parts)
+        return self.input_budget - used
+    
+    def build(self, user_prompt: str, trimmed: bool = False) -> Prompt:
+        tokens = self.prefix_tokens + _MESSAGE_OVERHEAD + count_tokens(user_prompt, self.model)
+        return Prompt([self.system_message, {'role': 'user', 'content': user_prompt}], tokens, trimmed)
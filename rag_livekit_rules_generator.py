@@ -1,4 +1,13 @@
 import os
+from typing import Optional
+
+from rules_writer import markdown_output, plain_output, write_rules
+from rules_store import get_rules_store, project_for_path
+
+RULES_PREAMBLE = (
+    "Специализированные правила для разработки RAG систем с LiveKit\n"
+    "на основе архитектуры из https://github.com/avijeett007/kno2gether-webrtc-agent/tree/develop/RAG\n\n"
+)
 
 def generate_rag_livekit_cursorrules() -> str:
     """
@@ -107,17 +116,24 @@ def generate_rag_livekit_cursorrules() -> str:
 
     return rules
 
-def save_rules_md(rules_text: str, filename: str = 'rag_livekit_cursorrules.md'):
+def save_rules_md(
+    rules_text: str,
+    filename: str = 'rag_livekit_cursorrules.md',
+    cursorrules_path: Optional[str] = None
+):
     """
-    Сохраняет итоговые правила в .md-файл.
+    Сохраняет итоговые правила в .md-файл, а с cursorrules_path - за тот же
+    проход и в голый .cursorrules. Запись атомарная, см. rules_writer.
+    Текст сохраняется и новой версией в историю rules_store.
     """
-    os.makedirs(os.path.dirname(filename) if os.path.dirname(filename) else '.', exist_ok=True)
-    
-    with open(filename, 'w', encoding='utf-8') as f:
-        f.write(f"# RAG LiveKit Cursor Rules\n\n")
-        f.write(f"Специализированные правила для разработки RAG систем с LiveKit\n")
-        f.write(f"на основе архитектуры из https://github.com/avijeett007/kno2gether-webrtc-agent/tree/develop/RAG\n\n")
-        f.write(f"```\n{rules_text}\n```\n")
+    outputs = [markdown_output(filename, "# RAG LiveKit Cursor Rules", RULES_PREAMBLE)]
+    if cursorrules_path:
+        outputs.append(plain_output(cursorrules_path))
+    write_rules(rules_text, outputs)
+    store = get_rules_store()
+    if store is not None:
+        store.put(project_for_path(filename), rules_text, "# RAG LiveKit Cursor Rules", RULES_PREAMBLE,
+                  meta={'path': os.path.abspath(filename)})
 
 def main():
     print("Генерирую специализированные .cursorrules для RAG проекта с LiveKit...")
@@ -134,12 +150,9 @@ def main():
     while True:
         answer = input('\nСохранить в rag_livekit_cursorrules.md? (y/n): ').strip().lower()
         if answer == 'y':
-            save_rules_md(rules, 'rag_livekit_cursorrules.md')
+            # .md и .cursorrules для прямого использования в Cursor пишутся за один проход
+            save_rules_md(rules, 'rag_livekit_cursorrules.md', cursorrules_path='.cursorrules')
             print('Сохранено в rag_livekit_cursorrules.md')
-            
-            # Также создаем .cursorrules файл для прямого использования
-            with open('.cursorrules', 'w', encoding='utf-8') as f:
-                f.write(rules)
             print('Также сохранено в .cursorrules для прямого использования в Cursor')
             break
         elif answer == 'n':
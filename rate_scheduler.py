@@ -0,0 +1,445 @@
+"""
+Планировщик запросов к модели с учетом лимитов провайдера.
+
+Все запросы генераторов правил в процессе идут через один RequestScheduler:
+    - бюджеты запросов и токенов в минуту (token bucket) берутся из заголовков
+      x-ratelimit-limit-* / x-ratelimit-remaining-* каждого ответа; запрос ждет,
+      пока в бюджете не хватит места на его оценку (промпт + max_tokens);
+    - число одновременных запросов подстраивается по AIMD: до первого 429
+      +1 после каждого успешного ответа (медленный старт, удвоение за волну),
+      затем +1/limit; после 429 - вдвое меньше (один раз на волну 429:
+      ответы на запросы, начатые до прошлого снижения, его не повторяют);
+    - после 429 все запросы ждут retry-after, сам запрос повторяется
+      с экспоненциальной задержкой со случайным разбросом (full jitter);
+    - ошибка после всех повторов - RulesGenerationError с видом ошибки,
+      HTTP статусом и числом попыток вместо строки "Ошибка ...".
+
+Настройка:
+    RULES_RPM_LIMIT          лимит запросов в минуту до первого ответа с заголовками (по умолчанию не задан)
+    RULES_TPM_LIMIT          лимит токенов в минуту, аналогично
+    RULES_CONCURRENCY        начальное число одновременных запросов (по умолчанию 8)
+    RULES_MAX_CONCURRENCY    потолок числа одновременных запросов (по умолчанию 32)
+    RULES_MAX_RETRIES        повторов при 429 и временных ошибках (по умолчанию 5)
+
+Клиент OpenAI при этом должен создаваться с max_retries=0: повторы делает планировщик.
+"""
+import os
+import time
+import random
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Dict, Mapping, Optional
+
+import openai
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_MAX_CONCURRENCY = 32
+DEFAULT_MAX_RETRIES = 5
+
+# Пауза всех запросов после 429 без retry-after
+_DEFAULT_PAUSE = 1.0
+
+def _response_headers(error: BaseException) -> Optional[Mapping[str, str]]:
+    response = getattr(error, 'response', None)
+    return response.headers if response is not None else None
+
+def retry_after(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """Секунды из retry-after-ms или retry-after (дата в retry-after не поддерживается)"""
+    if headers is None:
+        return None
+    for name, scale in (('retry-after-ms', 0.001), ('retry-after', 1.0)):
+        value = headers.get(name)
+        if value is None:
+            continue
+        try:
+            return max(0.0, float(value) * scale)
+        except ValueError:
+            continue
+    return None
+
+class RulesGenerationError(Exception):
+    """
+    Ошибка запроса к модели после всех повторов.
+
+    kind: rate_limit, quota, timeout, connection, server, auth, request, empty
+    (модель не вернула текст) или unknown.
+    """
+    
+    RETRYABLE = frozenset(('rate_limit', 'timeout', 'connection', 'server'))
+    
+    def __init__(
+        self,
+        message: str,
+        kind: str = 'unknown',
+        status: Optional[int] = None,
+        retry_after: Optional[float] = None,
+        attempts: int = 1,
+        request_id: Optional[str] = None
+    ):
+        super().__init__(message)
+        self.kind = kind
+        self.status = status
+        self.retry_after = retry_after
+        self.attempts = attempts
+        self.request_id = request_id
+    
+    @property
+    def retryable(self) -> bool:
+        return self.kind in self.RETRYABLE
+    
+    @classmethod
+    def from_exception(cls, error: BaseException, attempts: int = 1) -> 'RulesGenerationError':
+        if isinstance(error, cls):
+            return error
+        status = getattr(error, 'status_code', None)
+        if isinstance(error, openai.RateLimitError):
+            # 429 из-за исчерпанной квоты повторять бесполезно
+            kind = 'quota' if getattr(error, 'code', None) == 'insufficient_quota' else 'rate_limit'
+        elif isinstance(error, openai.APITimeoutError):
+            kind = 'timeout'
+        elif isinstance(error, openai.APIConnectionError):
+            kind = 'connection'
+        elif isinstance(error, openai.InternalServerError) or (status or 0) >= 500:
+            kind = 'server'
+        elif isinstance(error, (openai.AuthenticationError, openai.PermissionDeniedError)):
+            kind = 'auth'
+        elif isinstance(error, openai.APIStatusError):
+            kind = 'request'
+        else:
+            kind = 'unknown'
+        return cls(
+            str(error), kind, status, retry_after(_response_headers(error)), attempts,
+            getattr(error, 'request_id', None)
+        )
+    
+    def __str__(self) -> str:
+        status = f" {self.status}" if self.status else ''
+        attempts = f", попыток: {self.attempts}" if self.attempts > 1 else ''
+        return f"[{self.kind}{status}{attempts}] {super().__str__()}"
+
+class TokenBucket:
+    """Бюджет на минуту: до capacity единиц, пополняется равномерно capacity/60 в секунду"""
+    
+    __slots__ = ('capacity', 'rate', 'level', 'updated')
+    
+    def __init__(self, capacity: float, period: float = 60.0):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self.level = self.capacity
+        self.updated = time.monotonic()
+    
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def wait_time(self, amount: float, now: float) -> float:
+        """Сколько ждать, пока в бюджете появится amount (запрос больше емкости ждет полного бюджета)"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+    
+    def take(self, amount: float, now: float):
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+    
+    def sync(self, limit: float, remaining: float, now: float):
+        """Сверка с заголовками ответа: локальный остаток не больше серверного"""
+        if limit != self.capacity:
+            self.capacity = float(limit)
+            self.rate = self.capacity / 60.0
+        self._refill(now)
+        self.level = min(self.level, float(remaining))
+
+def _header_number(headers: Mapping[str, str], name: str) -> Optional[float]:
+    try:
+        return float(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+class RequestScheduler:
+    """
+    Общий для потоков и event loop'ов планировщик запросов. Его можно
+    использовать напрямую (complete, acomplete, astream) или через
+    rules_cache.cached_completion(scheduler=...).
+    """
+    
+    def __init__(
+        self,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        rpm_limit: Optional[float] = None,
+        tpm_limit: Optional[float] = None,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.limit = float(min(max(1, concurrency), self.max_concurrency))
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.requests_budget = TokenBucket(rpm_limit) if rpm_limit else None
+        self.tokens_budget = TokenBucket(tpm_limit) if tpm_limit else None
+        self.in_flight = 0
+        self.completed = 0
+        self.rate_limited = 0
+        self.retries = 0
+        self.failed = 0
+        self.waited = 0.0
+        self._pause_until = 0.0
+        self._last_decrease = 0.0
+        self._slow_start = True
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._async_waiters = []
+    
+    @classmethod
+    def from_env(cls, **overrides) -> 'RequestScheduler':
+        """Настройки из переменных окружения; overrides - параметры конструктора поверх них"""
+        settings = dict(
+            concurrency=int(os.getenv('RULES_CONCURRENCY', DEFAULT_CONCURRENCY)),
+            max_concurrency=int(os.getenv('RULES_MAX_CONCURRENCY', DEFAULT_MAX_CONCURRENCY)),
+            rpm_limit=float(os.getenv('RULES_RPM_LIMIT', 0)) or None,
+            tpm_limit=float(os.getenv('RULES_TPM_LIMIT', 0)) or None,
+            max_retries=int(os.getenv('RULES_MAX_RETRIES', DEFAULT_MAX_RETRIES)),
+        )
+        settings.update(overrides)
+        return cls(**settings)
+    
+    # Слоты и бюджеты
+    
+    def _try_acquire(self, cost: float, now: float) -> Optional[float]:
+        """0 - слот занят и бюджеты списаны, иначе сколько ждать (None - до освобождения слота)"""
+        if now < self._pause_until:
+            return self._pause_until - now
+        if self.in_flight >= int(self.limit):
+            return None
+        wait = 0.0
+        for bucket, amount in ((self.requests_budget, 1), (self.tokens_budget, cost)):
+            if bucket is not None:
+                wait = max(wait, bucket.wait_time(amount, now))
+        if wait > 0:
+            return wait
+        for bucket, amount in ((self.requests_budget, 1), (self.tokens_budget, cost)):
+            if bucket is not None:
+                bucket.take(amount, now)
+        self.in_flight += 1
+        return 0.0
+    
+    def _notify(self):
+        self._condition.notify_all()
+        for loop, future in self._async_waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+            except RuntimeError:
+                # Event loop ожидающего уже закрыт
+                pass
+        self._async_waiters.clear()
+    
+    def acquire(self, cost: float = 0) -> float:
+        """Ждет слот и место в бюджетах, возвращает время начала запроса для release"""
+        started = time.monotonic()
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                wait = self._try_acquire(cost, now)
+                if wait == 0.0:
+                    self.waited += now - started
+                    return now
+                self._condition.wait(wait)
+    
+    async def acquire_async(self, cost: float = 0) -> float:
+        """Асинхронный acquire: ожидание не блокирует event loop"""
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = self._try_acquire(cost, now)
+                if wait == 0.0:
+                    self.waited += now - started
+                    return now
+                future = loop.create_future()
+                self._async_waiters.append((loop, future))
+            try:
+                await asyncio.wait((future,), timeout=wait)
+            finally:
+                if not future.done():
+                    with self._lock:
+                        if (loop, future) in self._async_waiters:
+                            self._async_waiters.remove((loop, future))
+    
+    def _sync_limits(self, headers: Mapping[str, str], now: float):
+        for attribute, suffix in (('requests_budget', 'requests'), ('tokens_budget', 'tokens')):
+            limit = _header_number(headers, f'x-ratelimit-limit-{suffix}')
+            remaining = _header_number(headers, f'x-ratelimit-remaining-{suffix}')
+            if not limit or remaining is None:
+                continue
+            bucket = getattr(self, attribute)
+            if bucket is None:
+                bucket = TokenBucket(limit)
+                setattr(self, attribute, bucket)
+            bucket.sync(limit, remaining, now)
+    
+    def release(
+        self,
+        started: float,
+        headers: Optional[Mapping[str, str]] = None,
+        error: Optional[RulesGenerationError] = None,
+        finished: bool = True
+    ):
+        """
+        Освобождает слот. Успешный ответ (finished без error) увеличивает число
+        одновременных запросов, 429 - уменьшает и приостанавливает все запросы.
+        finished=False - запрос прерван без ответа (отмена), лимиты не меняются.
+        """
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if headers is not None:
+                self._sync_limits(headers, now)
+            if error is None and finished:
+                self.completed += 1
+                step = 1.0 if self._slow_start else 1.0 / self.limit
+                self.limit = min(float(self.max_concurrency), self.limit + step)
+            elif error is not None and error.kind == 'rate_limit':
+                self.rate_limited += 1
+                self._slow_start = False
+                if started >= self._last_decrease:
+                    self.limit = max(1.0, self.limit / 2)
+                    self._last_decrease = now
+                pause = error.retry_after if error.retry_after is not None else _DEFAULT_PAUSE
+                self._pause_until = max(self._pause_until, now + pause)
+            self._notify()
+    
+    def retry_delay(self, attempt: int, error: RulesGenerationError) -> float:
+        """Задержка перед повтором: не меньше retry-after, плюс случайная доля экспоненты"""
+        jitter = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        return (error.retry_after or 0.0) + jitter
+    
+    def _failed(self, attempt: int, error: RulesGenerationError) -> bool:
+        """Учитывает ошибку; True - повторов больше не будет"""
+        with self._lock:
+            if error.retryable and attempt < self.max_retries:
+                self.retries += 1
+                return False
+            self.failed += 1
+            return True
+    
+    # Запросы
+    
+    def complete(self, client, cost: float = 0, **params) -> Any:
+        """chat.completions.create с ожиданием бюджета и повторами; ошибка - RulesGenerationError"""
+        for attempt in range(self.max_retries + 1):
+            started = self.acquire(cost)
+            try:
+                raw = client.chat.completions.with_raw_response.create(**params)
+            except Exception as e:
+                error = RulesGenerationError.from_exception(e, attempt + 1)
+                self.release(started, _response_headers(e), error)
+                if self._failed(attempt, error):
+                    raise error from e
+                time.sleep(self.retry_delay(attempt, error))
+                continue
+            except BaseException:
+                self.release(started, finished=False)
+                raise
+            self.release(started, raw.headers)
+            return raw.parse()
+    
+    async def acomplete(self, client, cost: float = 0, **params) -> Any:
+        """Асинхронный complete для AsyncOpenAI клиента"""
+        for attempt in range(self.max_retries + 1):
+            started = await self.acquire_async(cost)
+            try:
+                raw = await client.chat.completions.with_raw_response.create(**params)
+            except Exception as e:
+                error = RulesGenerationError.from_exception(e, attempt + 1)
+                self.release(started, _response_headers(e), error)
+                if self._failed(attempt, error):
+                    raise error from e
+                await asyncio.sleep(self.retry_delay(attempt, error))
+                continue
+            except BaseException:
+                self.release(started, finished=False)
+                raise
+            self.release(started, raw.headers)
+            return raw.parse()
+    
+    async def astream(self, client, cost: float = 0, **params) -> AsyncIterator[Any]:
+        """
+        Потоковый запрос: фрагменты chat.completion.chunk. Повторяется только
+        открытие потока; ошибка посреди потока сразу RulesGenerationError.
+        Слот занят, пока поток не дочитан или не закрыт.
+        """
+        for attempt in range(self.max_retries + 1):
+            started = await self.acquire_async(cost)
+            try:
+                raw = await client.chat.completions.with_raw_response.create(stream=True, **params)
+                stream = raw.parse()
+            except Exception as e:
+                error = RulesGenerationError.from_exception(e, attempt + 1)
+                self.release(started, _response_headers(e), error)
+                if self._failed(attempt, error):
+                    raise error from e
+                await asyncio.sleep(self.retry_delay(attempt, error))
+                continue
+            except BaseException:
+                self.release(started, finished=False)
+                raise
+            break
+        
+        try:
+            async for chunk in stream:
+                yield chunk
+        except Exception as e:
+            error = RulesGenerationError.from_exception(e, attempt + 1)
+            self.release(started, raw.headers, error)
+            self._failed(self.max_retries, error)
+            raise error from e
+        except BaseException:
+            # Потребитель остановился раньше или задачу отменили: соединение закрывается сразу
+            self.release(started, raw.headers, finished=False)
+            await stream.close()
+            raise
+        self.release(started, raw.headers)
+    
+    # Статистика
+    
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                'concurrency_limit': round(self.limit, 2),
+                'in_flight': self.in_flight,
+                'completed': self.completed,
+                'rate_limited': self.rate_limited,
+                'retries': self.retries,
+                'failed': self.failed,
+                'waited_s': round(self.waited, 3),
+                'rpm_limit': self.requests_budget.capacity if self.requests_budget else None,
+                'tpm_limit': self.tokens_budget.capacity if self.tokens_budget else None,
+            }
+    
+    def report(self) -> str:
+        stats = self.stats()
+        return (
+            f"Планировщик: {stats['completed']} запросов, 429: {stats['rate_limited']}, "
+            f"повторов: {stats['retries']}, ошибок: {stats['failed']}, "
+            f"параллельно до {stats['concurrency_limit']:g}, ожидание {stats['waited_s']:.1f} с"
+        )
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler() -> RequestScheduler:
+    """Общий для процесса планировщик: лимиты провайдера одни на все генераторы"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = RequestScheduler.from_env()
+    return _scheduler
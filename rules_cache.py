@@ -0,0 +1,362 @@
+"""
+Персистентный кэш ответов модели для генераторов правил.
+
+Ключ - sha256 от (model, system prompt, user prompt, temperature, max_tokens),
+значения хранятся в SQLite, поэтому кэш переживает перезапуски и безопасно
+используется несколькими процессами одновременно (WAL + busy timeout).
+
+Настройка через переменные окружения:
+    RULES_CACHE_PATH       путь к файлу базы (по умолчанию ~/.cache/cursorrules/responses.sqlite3)
+    RULES_CACHE_MAX_MB     предельный размер ответов в кэше, вытеснение по LRU (по умолчанию 64)
+    RULES_CACHE_TTL        время жизни записи в секундах (по умолчанию без ограничения)
+    RULES_CACHE_BYPASS=1   не читать кэш: каждый запрос идет в модель, ответ перезаписывает запись
+    RULES_CACHE_DISABLE=1  полностью отключить кэш
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+
+from rate_scheduler import RulesGenerationError
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'cursorrules', 'responses.sqlite3')
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Меняется при несовместимом изменении формата ключа или значения
+_KEY_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    latency REAL NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access);
+CREATE TABLE IF NOT EXISTS totals (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO totals (name, value) SELECT 'bytes', COALESCE(SUM(size), 0) FROM responses;
+"""
+
+def make_key(model: str, system_prompt: str, user_prompt: str, temperature: float, max_tokens: int) -> str:
+    """Ключ кэша: sha256 от всех параметров, влияющих на ответ"""
+    payload = json.dumps(
+        [_KEY_VERSION, model, system_prompt, user_prompt, float(temperature), int(max_tokens)],
+        ensure_ascii=False, separators=(',', ':')
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def key_for_messages(model: str, messages: List[Dict[str, str]], temperature: float, max_tokens: int) -> str:
+    """Ключ кэша для сообщений chat.completions (system/developer + user)"""
+    system_prompt = '\n'.join(m['content'] for m in messages if m['role'] in ('system', 'developer'))
+    user_prompt = '\n'.join(m['content'] for m in messages if m['role'] == 'user')
+    return make_key(model, system_prompt, user_prompt, temperature, max_tokens)
+
+class ResponseCache:
+    """
+    LRU кэш ответов модели на SQLite с ограничением по суммарному размеру и опциональным TTL.
+
+    Каждая операция - короткая транзакция, соединения открываются отдельно
+    для каждого потока и процесса. Суммарный размер ответов хранится в таблице
+    totals и меняется в тех же транзакциях, поэтому put не суммирует всю таблицу.
+    Статистика (попадания, промахи, сэкономленное время) считается для текущего процесса.
+    """
+    
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        ttl: Optional[float] = None,
+        bypass: bool = False
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bypass = bypass
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.saved_seconds = 0.0
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        with conn:
+            conn.executescript(_SCHEMA)
+    
+    @classmethod
+    def from_env(cls) -> 'ResponseCache':
+        ttl = os.getenv('RULES_CACHE_TTL')
+        return cls(
+            path=os.getenv('RULES_CACHE_PATH', DEFAULT_CACHE_PATH),
+            max_bytes=int(float(os.getenv('RULES_CACHE_MAX_MB', DEFAULT_MAX_BYTES / 1024 / 1024)) * 1024 * 1024),
+            ttl=float(ttl) if ttl else None,
+            bypass=os.getenv('RULES_CACHE_BYPASS', '') not in ('', '0'),
+        )
+    
+    def _connection(self) -> sqlite3.Connection:
+        # После fork соединение родителя использовать нельзя
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+    
+    def get(self, key: str) -> Optional[str]:
+        """Возвращает ответ из кэша или None (промах, истекший TTL, режим bypass)"""
+        if self.bypass:
+            with self._stats_lock:
+                self.bypassed += 1
+            return None
+        
+        now = time.time()
+        conn = self._connection()
+        row = conn.execute('SELECT value, latency, created FROM responses WHERE key = ?', (key,)).fetchone()
+        if row is not None and self.ttl is not None and row[2] + self.ttl < now:
+            self._delete_expired(conn, key, now - self.ttl)
+            row = None
+        
+        if row is None:
+            with self._stats_lock:
+                self.misses += 1
+            return None
+        
+        conn.execute('UPDATE responses SET last_access = ? WHERE key = ?', (now, key))
+        with self._stats_lock:
+            self.hits += 1
+            self.saved_seconds += row[1]
+        return row[0]
+    
+    def put(self, key: str, value: str, latency: float = 0.0):
+        """Сохраняет ответ и время, которое заняла генерация, затем вытесняет старые записи"""
+        size = len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        
+        now = time.time()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            old = conn.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            conn.execute(
+                'INSERT OR REPLACE INTO responses (key, value, size, latency, created, last_access) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (key, value, size, latency, now, now)
+            )
+            total = self._add_total(conn, size - (old[0] if old else 0))
+            self._evict(conn, total)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+    
+    def _add_total(self, conn: sqlite3.Connection, delta: int) -> int:
+        """Меняет суммарный размер ответов на delta и возвращает новое значение"""
+        conn.execute("UPDATE totals SET value = value + ? WHERE name = 'bytes'", (delta,))
+        return conn.execute("SELECT value FROM totals WHERE name = 'bytes'").fetchone()[0]
+    
+    def _delete_expired(self, conn: sqlite3.Connection, key: str, created_before: float):
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Запись мог уже удалить или перезаписать другой процесс
+            row = conn.execute(
+                'SELECT size FROM responses WHERE key = ? AND created < ?', (key, created_before)
+            ).fetchone()
+            if row is not None:
+                conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self._add_total(conn, -row[0])
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+    
+    def _evict(self, conn: sqlite3.Connection, total: int):
+        """Удаляет давно не использованные записи, пока размер кэша выше предела"""
+        excess = total - self.max_bytes
+        if excess <= 0:
+            return
+        
+        victims = []
+        freed = 0
+        for key, size in conn.execute('SELECT key, size FROM responses ORDER BY last_access'):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany('DELETE FROM responses WHERE key = ?', victims)
+        self._add_total(conn, -freed)
+    
+    def clear(self):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM responses')
+            conn.execute("UPDATE totals SET value = 0 WHERE name = 'bytes'")
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+    
+    def stats(self) -> dict:
+        conn = self._connection()
+        entries = conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+        total = conn.execute("SELECT value FROM totals WHERE name = 'bytes'").fetchone()[0]
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'bypassed': self.bypassed,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'saved_seconds': self.saved_seconds,
+                'entries': entries,
+                'bytes': total,
+                'max_bytes': self.max_bytes,
+            }
+    
+    def report(self) -> str:
+        """Короткая строка со статистикой для вывода в конце запуска"""
+        stats = self.stats()
+        if stats['bypassed']:
+            return f"Кэш ответов: пропущен (bypass) для {stats['bypassed']} запросов"
+        return (
+            f"Кэш ответов: {stats['hits']} попаданий, {stats['misses']} промахов "
+            f"({stats['hit_rate']:.0%}), сэкономлено {stats['saved_seconds']:.1f} с"
+        )
+
+class TokenUsage:
+    """
+    Потокобезопасный счетчик токенов, потраченных на запросы к модели (без попаданий в кэш).
+
+    Помимо сумм хранит последние запросы: сколько входных токенов провайдер
+    взял из своего кэша префикса, сколько обработал заново и локальную оценку размера.
+    """
+    
+    def __init__(self, history: int = 100):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_prompt_tokens = 0
+        self.completion_tokens = 0
+        self.calls = deque(maxlen=history)
+    
+    def add(self, usage, estimated_tokens: Optional[int] = None) -> dict:
+        """usage - поле usage ответа chat.completions (может отсутствовать)"""
+        prompt_tokens = getattr(usage, 'prompt_tokens', None) or 0
+        details = getattr(usage, 'prompt_tokens_details', None)
+        cached_tokens = getattr(details, 'cached_tokens', None) or 0
+        call = {
+            'prompt_tokens': prompt_tokens,
+            'cached_prompt_tokens': cached_tokens,
+            'uncached_prompt_tokens': prompt_tokens - cached_tokens,
+            'completion_tokens': getattr(usage, 'completion_tokens', None) or 0,
+            'estimated_prompt_tokens': estimated_tokens,
+        }
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += prompt_tokens
+            self.cached_prompt_tokens += cached_tokens
+            self.completion_tokens += call['completion_tokens']
+            self.calls.append(call)
+        return call
+    
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'prompt_tokens': self.prompt_tokens,
+                'cached_prompt_tokens': self.cached_prompt_tokens,
+                'completion_tokens': self.completion_tokens,
+            }
+    
+    def report(self) -> str:
+        """Строка на каждый запрос: входные токены, из них в кэше провайдера, локальная оценка"""
+        with self._lock:
+            calls = list(self.calls)
+        lines = []
+        for n, call in enumerate(calls, 1):
+            estimate = call['estimated_prompt_tokens']
+            lines.append(
+                f"Запрос {n}: {call['prompt_tokens']} входных токенов "
+                f"({call['cached_prompt_tokens']} из кэша провайдера, {call['uncached_prompt_tokens']} новых"
+                + (f", оценка {estimate}" if estimate is not None else '')
+                + f"), {call['completion_tokens']} выходных"
+            )
+        return '\n'.join(lines)
+
+def completion_text(response) -> str:
+    """Текст ответа chat.completions; пустой ответ (отказ, фильтр контента) - RulesGenerationError"""
+    choice = response.choices[0] if response.choices else None
+    content = choice.message.content if choice is not None else None
+    if not content:
+        reason = getattr(choice, 'finish_reason', None)
+        raise RulesGenerationError(
+            f"Модель вернула пустой ответ (finish_reason: {reason})", 'empty',
+            request_id=getattr(response, 'id', None)
+        )
+    return content
+
+def cached_completion(
+    client,
+    cache: Optional[ResponseCache],
+    model: str,
+    messages: List[Dict[str, str]],
+    max_tokens: int,
+    temperature: float,
+    usage: Optional[TokenUsage] = None,
+    estimated_tokens: Optional[int] = None,
+    scheduler=None
+) -> str:
+    """
+    chat.completions.create через кэш: при попадании модель не вызывается.
+    Ошибки API пробрасываются и в кэш не попадают, usage учитывает потраченные токены.
+    С scheduler (rate_scheduler.RequestScheduler) запрос ждет бюджета лимитов и повторяется при 429.
+    Ответ без текста (например, отказ модели) не кэшируется: RulesGenerationError с kind='empty'.
+    """
+    key = None
+    if cache is not None:
+        key = key_for_messages(model, messages, temperature, max_tokens)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    
+    started = time.perf_counter()
+    params = dict(model=model, messages=messages, max_tokens=max_tokens, temperature=temperature)
+    if scheduler is not None:
+        response = scheduler.complete(client, (estimated_tokens or 0) + max_tokens, **params)
+    else:
+        response = client.chat.completions.create(**params)
+    if usage is not None:
+        usage.add(response.usage, estimated_tokens)
+    content = completion_text(response)
+    if key is not None:
+        cache.put(key, content, time.perf_counter() - started)
+    return content
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Общий для процесса кэш из переменных окружения (None, если RULES_CACHE_DISABLE=1)"""
+    global _response_cache
+    if os.getenv('RULES_CACHE_DISABLE', '') not in ('', '0'):
+        return None
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = ResponseCache.from_env()
+    return _response_cache
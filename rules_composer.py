@@ -0,0 +1,362 @@
+"""
+Локальная сборка .cursorrules из библиотеки шаблонов разделов без обращения к модели.
+
+Библиотека строится из уже готовых правил: вывода
+rag_livekit_rules_generator.generate_rag_livekit_cursorrules() и файлов
+rag_livekit_cursorrules.md, mm_agent_v2_cursorrules.md, livekit_rag_cursorrules.md
+(плюс *.md из каталогов RULES_TEMPLATE_DIRS, через os.pathsep). Каждый раздел
+("## Title" или "N. **Title:**") становится шаблоном, проиндексированным по
+упомянутым в нем технологиям.
+
+По описанию проекта определяются технологии, для каждой темы из rules_sections
+выбирается лучший шаблон, добавляются разделы по найденным технологиям, и все
+склеивается в детерминированном порядке. Сборка занимает миллисекунды; модель
+нужна только для необязательной доработки черновика (refine_rules).
+
+Запуск:
+    python rules_composer.py "Голосовой агент на LiveKit с RAG на LlamaIndex" --refine never
+"""
+import os
+import re
+import math
+import time
+import argparse
+import textwrap
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import rag_livekit_rules_generator
+from rules_sections import SECTIONS
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_TEMPLATE_FILES = ('rag_livekit_cursorrules.md', 'mm_agent_v2_cursorrules.md', 'livekit_rag_cursorrules.md')
+
+# Технологии: ключ индекса -> (название для вводной строки, слова для поиска).
+# Слово совпадает целиком; '*' в конце - основа с любым окончанием ('голос*' - "голосовой")
+TECHNOLOGIES = {
+    'python': ('Python', ('python*', 'pep', 'pytest', 'питон*')),
+    'typescript': ('TypeScript', ('typescript', 'ts', 'tsx')),
+    'javascript': ('JavaScript', ('javascript', 'js', 'node', 'nodejs')),
+    'react': ('React', ('react', 'jsx', 'hook*')),
+    'nextjs': ('Next.js', ('next.js', 'nextjs')),
+    'vite': ('Vite', ('vite',)),
+    'tailwind': ('TailwindCSS', ('tailwind*',)),
+    'fastapi': ('FastAPI', ('fastapi',)),
+    'django': ('Django', ('django',)),
+    'flask': ('Flask', ('flask',)),
+    'livekit': ('LiveKit', ('livekit',)),
+    'webrtc': ('WebRTC', ('webrtc',)),
+    'voice': ('voice agents', ('voice', 'голос*', 'speech', 'реч*', 'audio', 'аудио*', 'stt', 'tts')),
+    'deepgram': ('Deepgram', ('deepgram',)),
+    'openai': ('OpenAI', ('openai', 'gpt')),
+    'llamaindex': ('LlamaIndex', ('llamaindex*', 'llama index', 'llama_index')),
+    'rag': ('RAG (Retrieval-Augmented Generation)', ('rag', 'retrieval', 'ретрив*')),
+    'vector_db': ('vector databases', ('vector*', 'вектор*', 'embedding*', 'эмбеддинг*')),
+    'llm': ('LLM applications', ('llm', 'языков*')),
+    'jwt': ('JWT authentication', ('jwt', 'pyjwt')),
+    'vercel': ('Vercel', ('vercel', 'serverless')),
+    'docker': ('Docker', ('docker*', 'container*', 'контейнер*')),
+    'postgres': ('PostgreSQL', ('postgres*',)),
+    'redis': ('Redis', ('redis',)),
+    'iframe': ('embeddable widgets', ('iframe*', 'widget*', 'виджет*')),
+    'real_estate': ('real estate sales', ('real estate', 'недвижим*', 'квартир*', 'apartment*', 'жк')),
+}
+
+def _alias_pattern(alias: str) -> str:
+    if alias.endswith('*'):
+        return re.escape(alias[:-1]) + r'\w*'
+    return re.escape(alias)
+
+_TECH_PATTERNS = {
+    key: re.compile(r'\b(?:' + '|'.join(_alias_pattern(alias) for alias in aliases) + r')\b', re.IGNORECASE)
+    for key, (_, aliases) in TECHNOLOGIES.items()
+}
+
+_MD_HEADING = re.compile(r'^(#{2,3})\s+(.+?)\s*$')
+_NUMBERED_HEADING = re.compile(r'^\d+\.\s+\*\*(.+?):?\*\*:?\s*$')
+
+def detect_technologies(text: str) -> List[str]:
+    """Ключи TECHNOLOGIES, упомянутые в тексте, в порядке таблицы"""
+    return [key for key, pattern in _TECH_PATTERNS.items() if pattern.search(text)]
+
+# Темы rules_sections, распознаваемые по заголовку шаблона. Ключевые слова разделов
+# для этого слишком широкие ("Integration Patterns" - не раздел об архитектуре)
+_TOPIC_TITLES = {
+    'architecture': re.compile(r'^(?:architecture|code organization|project structure)', re.IGNORECASE),
+    'code_style': re.compile(r'(?:code style|best practices|conventions)', re.IGNORECASE),
+    'error_handling': re.compile(r'(?:error handling|monitoring|observability)', re.IGNORECASE),
+    'performance': re.compile(r'performance', re.IGNORECASE),
+    'testing': re.compile(r'^testing', re.IGNORECASE),
+    'security': re.compile(r'^security', re.IGNORECASE),
+    'documentation': re.compile(r'^documentation', re.IGNORECASE),
+}
+
+def _section_topic(title: str) -> Optional[str]:
+    """Тема раздела из rules_sections по заголовку (None - раздел о конкретной технологии)"""
+    for section in SECTIONS:
+        pattern = _TOPIC_TITLES.get(section.key)
+        if pattern is not None and pattern.search(title):
+            return section.key
+    return None
+
+class RuleTemplate:
+    """Раздел правил из библиотеки: заголовок, строки правил и технологии, которые он упоминает"""
+    
+    __slots__ = ('title', 'body', 'source', 'topic', 'technologies')
+    
+    def __init__(self, title: str, body: str, source: str):
+        self.title = title
+        self.body = body
+        self.source = source
+        self.topic = _section_topic(title)
+        self.technologies = frozenset(detect_technologies(f"{title}\n{body}"))
+    
+    def render(self) -> str:
+        return f"## {self.title}\n{self.body}"
+
+def parse_templates(text: str, source: str) -> List[RuleTemplate]:
+    """
+    Разбивает готовые правила на разделы. Понимает markdown заголовки
+    "## Title" (подзаголовки ### остаются внутри раздела) и нумерованные
+    блоки "1. **Title:**" с вложенными пунктами.
+    """
+    templates = []
+    title, lines, numbered = None, [], False
+    
+    def flush():
+        body = textwrap.dedent('\n'.join(line for line in lines if line.strip())).strip('\n')
+        if title and body:
+            templates.append(RuleTemplate(title, body, source))
+    
+    for raw in text.splitlines():
+        line = raw.rstrip()
+        heading = _MD_HEADING.match(line)
+        block = _NUMBERED_HEADING.match(line)
+        if line.startswith('```') or line.startswith('# ') or (heading and len(heading.group(1)) == 2) or block:
+            flush()
+            lines = []
+            title = heading.group(2) if heading else block.group(1).rstrip(':') if block else None
+            numbered = bool(block)
+            continue
+        # Заключение после нумерованных блоков ("By following these guidelines...") - не часть раздела
+        if numbered and line and not line[0].isspace():
+            flush()
+            title, lines = None, []
+            continue
+        if title is not None:
+            lines.append(line)
+    flush()
+    return templates
+
+class TemplateLibrary:
+    """Шаблоны разделов с обратным индексом технология -> шаблоны"""
+    
+    def __init__(self, templates: List[RuleTemplate]):
+        # Одинаковые разделы из разных файлов - один шаблон (первый по порядку источников)
+        seen = set()
+        self.templates = []
+        for template in templates:
+            fingerprint = (template.title.lower(), template.body)
+            if fingerprint not in seen:
+                seen.add(fingerprint)
+                self.templates.append(template)
+        
+        self.index: Dict[str, List[int]] = {}
+        for position, template in enumerate(self.templates):
+            for technology in template.technologies:
+                self.index.setdefault(technology, []).append(position)
+        total = len(self.templates)
+        # Редкие технологии весят больше (idf)
+        self.weights = {tech: math.log(1 + total / len(positions)) for tech, positions in self.index.items()}
+    
+    @classmethod
+    def load(cls, extra_dirs: Tuple[str, ...] = ()) -> 'TemplateLibrary':
+        templates = parse_templates(rag_livekit_rules_generator.generate_rag_livekit_cursorrules(), 'rag_livekit_rules_generator')
+        paths = [os.path.join(ROOT, name) for name in DEFAULT_TEMPLATE_FILES]
+        for directory in extra_dirs:
+            if os.path.isdir(directory):
+                paths.extend(os.path.join(directory, name) for name in sorted(os.listdir(directory)) if name.endswith('.md'))
+        for path in paths:
+            if os.path.exists(path):
+                with open(path, encoding='utf-8') as f:
+                    templates.extend(parse_templates(f.read(), os.path.basename(path)))
+        return cls(templates)
+    
+    def scores(self, technologies: List[str], min_precision: float = 0.5) -> Dict[int, float]:
+        """
+        Оценка шаблонов, упоминающих технологии проекта: вес совпавших технологий,
+        умноженный на их долю среди всех технологий шаблона. Шаблоны, где больше
+        половины веса приходится на чужие технологии, не оцениваются.
+        """
+        matched: Dict[int, float] = {}
+        for technology in technologies:
+            for position in self.index.get(technology, ()):
+                matched[position] = matched.get(position, 0.0) + self.weights[technology]
+        
+        scores = {}
+        for position, weight in matched.items():
+            total = sum(self.weights[tech] for tech in self.templates[position].technologies)
+            precision = weight / total
+            if precision >= min_precision:
+                scores[position] = weight * precision
+        return scores
+
+_library = None
+_library_lock = threading.Lock()
+
+def get_template_library() -> TemplateLibrary:
+    """Библиотека шаблонов, загружаемая один раз на процесс"""
+    global _library
+    if _library is None:
+        with _library_lock:
+            if _library is None:
+                extra = tuple(filter(None, os.getenv('RULES_TEMPLATE_DIRS', '').split(os.pathsep)))
+                _library = TemplateLibrary.load(extra)
+    return _library
+
+class Composition:
+    """Результат локальной сборки правил"""
+    
+    __slots__ = ('text', 'technologies', 'sections', 'coverage', 'elapsed_ms')
+    
+    def __init__(self, text: str, technologies: List[str], sections: List[str], coverage: float, elapsed_ms: float):
+        self.text = text
+        self.technologies = technologies
+        self.sections = sections
+        self.coverage = coverage
+        self.elapsed_ms = elapsed_ms
+
+def compose_rules(
+    description: str,
+    clarifications: Optional[Dict[str, str]] = None,
+    max_sections: int = 12,
+    library: Optional[TemplateLibrary] = None
+) -> Composition:
+    """
+    Собирает .cursorrules из шаблонов по описанию проекта.
+
+    coverage - доля тем из rules_sections (кроме вводной), для которых нашелся шаблон:
+    по ней можно решить, нужна ли доработка моделью.
+    """
+    library = library or get_template_library()
+    started = time.perf_counter()
+    text = description + ''.join(f"\n{q} {a}" for q, a in (clarifications or {}).items())
+    technologies = detect_technologies(text)
+    scores = library.scores(technologies)
+    
+    # Лучший шаблон на каждую тему и разделы о конкретных технологиях
+    best_by_topic: Dict[str, int] = {}
+    specific: List[int] = []
+    for position, template in enumerate(library.templates):
+        score = scores.get(position, 0.0)
+        if template.topic is None:
+            if score > 0:
+                specific.append(position)
+        elif score > 0 or not template.technologies:
+            current = best_by_topic.get(template.topic)
+            if current is None or score > scores.get(current, 0.0):
+                best_by_topic[template.topic] = position
+    
+    specific.sort(key=lambda position: (-scores[position], position))
+    topic_order = [section.key for section in SECTIONS if section.key in best_by_topic]
+    budget = max(0, max_sections - len(topic_order))
+    chosen = specific[:budget] + [best_by_topic[topic] for topic in topic_order]
+    # Порядок в документе: сначала разделы о технологиях, затем темы в порядке SECTIONS
+    templates = [library.templates[position] for position in chosen][:max_sections]
+    
+    names = [TECHNOLOGIES[key][0] for key in technologies] or ['modern software development']
+    header = f"You are an expert in {', '.join(names)}."
+    rules = '\n\n'.join([header] + [template.render() for template in templates])
+    
+    topics = len(SECTIONS) - 1
+    return Composition(
+        text=rules,
+        technologies=technologies,
+        sections=[template.title for template in templates],
+        coverage=len(topic_order) / topics if topics else 1.0,
+        elapsed_ms=(time.perf_counter() - started) * 1000,
+    )
+
+REFINE_SYSTEM_PROMPT = """Ты эксперт по написанию .cursorrules файлов для IDE Cursor.
+
+Тебе дают черновик .cursorrules, собранный из готовых шаблонов, и описание проекта.
+Доработай черновик под проект: убери правила, не относящиеся к его технологиям,
+допиши недостающие разделы, сохрани формат "## Раздел" со списками "- правило".
+Первая строка всегда начинается с "You are an expert in...".
+
+Формат ответа: только текст .cursorrules, без дополнительных пояснений."""
+
+def needs_refinement(composition: Composition, min_coverage: float = 0.5) -> bool:
+    """Черновик стоит дорабатывать моделью, если технологии не распознаны или покрыто мало тем"""
+    return not composition.technologies or composition.coverage < min_coverage
+
+def refine_rules(
+    composition: Composition,
+    description: str,
+    clarifications: Optional[Dict[str, str]] = None,
+    generator=None,
+    raise_errors: bool = False
+) -> str:
+    """
+    Дорабатывает черновик моделью (один запрос через кэш ответов).
+    При ошибке API возвращает исходный черновик, если не raise_errors.
+    """
+    # OpenAI клиент нужен только здесь: локальная сборка не импортирует его
+    import main as cursorrules
+    from prompt_builder import PromptBuilder
+    from rules_cache import cached_completion
+    from rate_scheduler import RulesGenerationError
+    
+    generator = generator or cursorrules.CursorRulesGenerator()
+    context = description
+    if clarifications:
+        context += ''.join(f"\n- {q}: {a}" for q, a in clarifications.items() if a.strip())
+    prompt = PromptBuilder(REFINE_SYSTEM_PROMPT, cursorrules.RULES_MODEL).build(
+        f"Описание проекта: {context}\n\nЧерновик:\n{composition.text}"
+    )
+    try:
+        content = cached_completion(
+            generator.client,
+            generator.cache,
+            cursorrules.RULES_MODEL,
+            prompt.messages,
+            cursorrules.RULES_MAX_TOKENS,
+            cursorrules.RULES_TEMPERATURE,
+            usage=generator.usage,
+            estimated_tokens=prompt.estimated_tokens,
+            scheduler=generator.scheduler
+        )
+        return content.strip()
+    except RulesGenerationError:
+        if raise_errors:
+            raise
+        return composition.text
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('description', help='Описание проекта')
+    parser.add_argument('--refine', choices=('auto', 'always', 'never'), default='auto',
+                        help='Дорабатывать черновик моделью (auto - только при слабом покрытии)')
+    parser.add_argument('--max-sections', type=int, default=12)
+    parser.add_argument('--output', help='Сохранить в .md-файл')
+    args = parser.parse_args()
+    
+    composition = compose_rules(args.description, max_sections=args.max_sections)
+    print(f"Собрано локально за {composition.elapsed_ms:.1f} мс: "
+          f"технологии {', '.join(composition.technologies) or '-'}, "
+          f"разделов {len(composition.sections)}, покрытие тем {composition.coverage:.0%}")
+    
+    rules = composition.text
+    if args.refine == 'always' or (args.refine == 'auto' and needs_refinement(composition)):
+        print("Дорабатываю черновик моделью...")
+        rules = refine_rules(composition, args.description)
+    
+    print()
+    print(rules)
+    if args.output:
+        import main as cursorrules
+        cursorrules.save_rules_md(rules, args.output)
+        print(f'\nСохранено в {args.output}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,365 @@
+"""
+Индекс похожих запросов по ранее сгенерированным правилам.
+
+Каждый сохраненный результат (описание проекта + уточнения -> .md файл правил)
+превращается в разреженный вектор хэшированных признаков: нормализованные
+слова (синонимы технологий приводятся к одному виду: TS -> typescript,
+admin panel -> dashboard) и их префиксы для устойчивости к словоформам.
+Векторы хранятся в memory-mapped файлах (features.npy, weights.npy) и
+дописываются по одному; метаданные - в entries.jsonl.
+
+Поиск - косинусная близость через обратный индекс признак -> строки, который
+строится в памяти при первом запросе; строки, добавленные после этого, проверяются
+прямым перебором, пока их не наберется REBUILD_TAIL. Проверка перед генерацией
+(search с min_score) перебирает только строки с редкими признаками запроса:
+на 100k записей это ~0.5 мс, полный top-k без порога - ~2 мс
+(benchmarks/bench_rules_index.py).
+
+Настройка:
+    RULES_INDEX_DIR           каталог индекса (по умолчанию cursorrules_lib/index)
+    RULES_REUSE_THRESHOLD     порог сходства для повторного использования правил (по умолчанию 0 - выключено;
+                              рекомендуемое значение DEFAULT_REUSE_THRESHOLD = 0.9)
+
+Запись хранит sha256 текста правил и версию в rules_store: CLI перезаписывает
+один и тот же rules.md, поэтому по пути файла к моменту поиска может лежать
+уже чужой проект. Правила берутся из rules_store (или из файла, если история
+отключена) и отбрасываются, если их sha256 не совпадает с записью.
+
+Один процесс пишет в индекс одновременно; читать могут несколько.
+"""
+import os
+import re
+import json
+import hashlib
+import time
+import zlib
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_INDEX_DIR = os.path.join('cursorrules_lib', 'index')
+DEFAULT_REUSE_THRESHOLD = 0.9
+
+FEATURE_SPACE = 1 << 16
+MAX_FEATURES = 64
+INITIAL_CAPACITY = 1024
+REBUILD_TAIL = 1024
+
+_WORD_WEIGHT = 1.0
+_PREFIX_WEIGHT = 0.5
+# Общая основа словоформ: "панели" и "панелью" совпадают по первым 5 символам
+_PREFIX_LENGTH = 5
+
+_WORDS = re.compile(r'[\w.#+]+', re.UNICODE)
+
+# Слова и словосочетания с одинаковым смыслом для описаний проектов
+SYNONYMS = {
+    'ts': 'typescript', 'tsx': 'typescript', 'js': 'javascript', 'jsx': 'javascript',
+    'py': 'python', 'nextjs': 'next.js', 'next': 'next.js', 'postgresql': 'postgres', 'pg': 'postgres',
+    'k8s': 'kubernetes', 'golang': 'go', 'node.js': 'node', 'nodejs': 'node', 'vue.js': 'vue', 'vuejs': 'vue',
+    'admin panel': 'dashboard', 'admin': 'dashboard', 'panel': 'dashboard', 'админка': 'dashboard',
+    'дашборд': 'dashboard', 'панель': 'dashboard', 'панели': 'dashboard',
+    'app': 'application', 'приложение': 'application', 'приложения': 'application',
+    'site': 'website', 'сайт': 'website', 'api': 'backend', 'бэкенд': 'backend', 'бекенд': 'backend',
+    'фронтенд': 'frontend', 'front-end': 'frontend', 'back-end': 'backend',
+}
+
+STOP_WORDS = frozenset((
+    'a', 'an', 'and', 'the', 'with', 'for', 'of', 'in', 'on', 'to', 'using', 'based', '+', '&',
+    'и', 'с', 'со', 'на', 'для', 'в', 'во', 'по', 'из', 'к', 'а', 'или', 'это', 'мой', 'наш',
+))
+
+def _hash(feature: str) -> int:
+    return zlib.crc32(feature.encode('utf-8')) & (FEATURE_SPACE - 1)
+
+def _tokens(text: str) -> List[str]:
+    words = [w.strip('.').lower() for w in _WORDS.findall(text)]
+    tokens = []
+    i = 0
+    while i < len(words):
+        pair = f"{words[i]} {words[i + 1]}" if i + 1 < len(words) else None
+        if pair in SYNONYMS:
+            tokens.append(SYNONYMS[pair])
+            i += 2
+            continue
+        word = SYNONYMS.get(words[i], words[i])
+        if word and word not in STOP_WORDS:
+            tokens.append(word)
+        i += 1
+    return tokens
+
+def vectorize(user_query: str, clarifications: Optional[Dict[str, str]] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Разреженный L2-нормированный вектор (индексы признаков, веса), не больше
+    MAX_FEATURES признаков. Учитываются описание и ответы на уточнения.
+    """
+    text = user_query + ''.join(f"\n{a}" for a in (clarifications or {}).values() if a.strip())
+    weights: Dict[int, float] = {}
+    for token in _tokens(text):
+        index = _hash('w:' + token)
+        weights[index] = weights.get(index, 0.0) + _WORD_WEIGHT
+        if len(token) > _PREFIX_LENGTH:
+            index = _hash('p:' + token[:_PREFIX_LENGTH])
+            weights[index] = weights.get(index, 0.0) + _PREFIX_WEIGHT
+    
+    if len(weights) > MAX_FEATURES:
+        weights = dict(sorted(weights.items(), key=lambda item: -item[1])[:MAX_FEATURES])
+    features = np.fromiter(weights.keys(), dtype=np.uint16, count=len(weights))
+    values = np.fromiter(weights.values(), dtype=np.float32, count=len(weights))
+    norm = float(np.linalg.norm(values))
+    if norm:
+        values /= norm
+    return features, values
+
+def rules_digest(rules: str) -> str:
+    """sha256 текста правил без краевых пробелов (в таком виде его возвращает extract_rules)"""
+    return hashlib.sha256(rules.strip().encode('utf-8')).hexdigest()
+
+def extract_rules(markdown: str) -> str:
+    """Текст правил из .md файла, записанного save_rules_md (содержимое блока ```)"""
+    start = markdown.find('```\n')
+    end = markdown.rfind('\n```')
+    if start == -1 or end <= start:
+        return markdown.strip()
+    return markdown[start + 4:end].strip()
+
+class RulesIndex:
+    """Инкрементальный индекс похожих запросов на memory-mapped массивах"""
+    
+    def __init__(self, directory: str = DEFAULT_INDEX_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._features_path = os.path.join(directory, 'features.npy')
+        self._weights_path = os.path.join(directory, 'weights.npy')
+        self._entries_path = os.path.join(directory, 'entries.jsonl')
+        self._entries: List[bytes] = []
+        self._features = None
+        self._weights = None
+        self._postings = None
+        self._rows = None
+        self._indexed = 0
+        
+        if os.path.exists(self._entries_path):
+            with open(self._entries_path, 'rb') as f:
+                # Последняя строка могла оборваться при сбое
+                self._entries = [line for line in f.read().split(b'\n') if line.endswith(b'}')]
+        if os.path.exists(self._features_path):
+            self._features = np.load(self._features_path, mmap_mode='r+')
+            self._weights = np.load(self._weights_path, mmap_mode='r+')
+    
+    @classmethod
+    def from_env(cls) -> 'RulesIndex':
+        return cls(os.getenv('RULES_INDEX_DIR', DEFAULT_INDEX_DIR))
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def _ensure_capacity(self, count: int):
+        capacity = 0 if self._features is None else self._features.shape[0]
+        if count <= capacity:
+            return
+        new_capacity = max(INITIAL_CAPACITY, capacity * 2)
+        while new_capacity < count:
+            new_capacity *= 2
+        os.makedirs(self.directory, exist_ok=True)
+        for path, dtype, old in ((self._features_path, np.uint16, self._features), (self._weights_path, np.float32, self._weights)):
+            temp_path = path + '.tmp'
+            grown = np.lib.format.open_memmap(temp_path, mode='w+', dtype=dtype, shape=(new_capacity, MAX_FEATURES))
+            if old is not None:
+                grown[:capacity] = old
+            grown.flush()
+            del grown
+            os.replace(temp_path, path)
+        self._features = np.load(self._features_path, mmap_mode='r+')
+        self._weights = np.load(self._weights_path, mmap_mode='r+')
+    
+    def add(
+        self,
+        user_query: str,
+        clarifications: Optional[Dict[str, str]],
+        rules_path: str,
+        rules: str,
+        version: Optional[Tuple[str, int]] = None
+    ) -> int:
+        """
+        Добавляет результат генерации и возвращает номер записи.
+        version - (проект, номер версии) тех же правил в rules_store.
+        """
+        features, values = vectorize(user_query, clarifications)
+        record = {
+            'query': user_query,
+            'clarifications': clarifications or {},
+            'path': os.path.abspath(rules_path),
+            'digest': rules_digest(rules),
+            'created': time.time(),
+        }
+        if version is not None:
+            record['version'] = list(version)
+        entry = json.dumps(record, ensure_ascii=False).encode('utf-8')
+        
+        with self._lock:
+            row = len(self._entries)
+            self._ensure_capacity(row + 1)
+            self._features[row] = 0
+            self._weights[row] = 0
+            self._features[row, :len(features)] = features
+            self._weights[row, :len(values)] = values
+            self._features.flush()
+            self._weights.flush()
+            # Запись видна после того, как вектор уже на диске
+            with open(self._entries_path, 'ab') as f:
+                f.write(entry + b'\n')
+            self._entries.append(entry)
+        return row
+    
+    def _build_postings(self, count: int):
+        """
+        Обратный индекс признак -> (строки, веса) по первым count строкам
+        и копия самих строк в памяти без пустых хвостов для точного подсчета сходства
+        """
+        matrix = np.asarray(self._features[:count])
+        weight_matrix = np.asarray(self._weights[:count])
+        present = weight_matrix != 0
+        width = max(1, int(present.sum(axis=1).max()))
+        self._rows = (matrix[:, :width].copy(), weight_matrix[:, :width].copy())
+        
+        present = present.ravel()
+        rows = np.repeat(np.arange(count, dtype=np.int32), MAX_FEATURES)[present]
+        features, weights = matrix.ravel()[present], weight_matrix.ravel()[present]
+        order = np.argsort(features, kind='stable')
+        features = features[order]
+        self._postings = (
+            np.searchsorted(features, np.arange(FEATURE_SPACE + 1)),
+            rows[order],
+            weights[order],
+        )
+        self._indexed = count
+    
+    def search(
+        self,
+        user_query: str,
+        clarifications: Optional[Dict[str, str]] = None,
+        top_k: int = 5,
+        min_score: float = 0.0
+    ) -> List[Tuple[float, dict]]:
+        """
+        Похожие записи по убыванию косинусного сходства: [(сходство, запись)].
+        С min_score > 0 возвращаются только записи не ниже порога, и поиск
+        идет лишь по строкам с редкими признаками запроса (см. _candidates).
+        """
+        with self._lock:
+            count = len(self._entries)
+            if not count:
+                return []
+            if self._postings is None or count - self._indexed > REBUILD_TAIL:
+                self._build_postings(count)
+            offsets, rows, weights = self._postings
+            row_features, row_weights = self._rows
+            indexed = self._indexed
+        
+        features, values = vectorize(user_query, clarifications)
+        if not len(features):
+            return []
+        starts, ends = offsets[features], offsets[features.astype(np.int64) + 1]
+        dense = np.zeros(FEATURE_SPACE, dtype=np.float32)
+        dense[features] = values
+        
+        if min_score > 0:
+            candidates = self._candidates(rows, weights, starts, ends, values, min_score, indexed)
+            scores = np.einsum('ij,ij->i', np.take(dense, row_features[candidates]), row_weights[candidates])
+            if count > indexed:
+                tail = slice(indexed, count)
+                candidates = np.concatenate([candidates, np.arange(indexed, count)])
+                scores = np.concatenate([scores, (dense[self._features[tail]] * self._weights[tail]).sum(axis=1)])
+            keep = scores >= min_score
+            candidates, scores = candidates[keep], scores[keep]
+        else:
+            scores = np.zeros(count, dtype=np.float32)
+            hit_rows = np.concatenate([rows[s:e] for s, e in zip(starts, ends)])
+            hit_weights = np.concatenate([weights[s:e] * v for s, e, v in zip(starts, ends, values)])
+            scores[:indexed] = np.bincount(hit_rows, hit_weights, minlength=indexed)
+            if count > indexed:
+                tail = slice(indexed, count)
+                scores[tail] = (dense[self._features[tail]] * self._weights[tail]).sum(axis=1)
+            candidates = np.flatnonzero(scores)
+            scores = scores[candidates]
+        
+        if len(candidates) > top_k:
+            best = np.argpartition(scores, -top_k)[-top_k:]
+            candidates, scores = candidates[best], scores[best]
+        order = np.argsort(-scores, kind='stable')
+        return [(float(scores[i]), json.loads(self._entries[candidates[i]])) for i in order]
+    
+    @staticmethod
+    def _candidates(rows, weights, starts, ends, values, min_score: float, indexed: int) -> np.ndarray:
+        """
+        Строки, которые могут набрать min_score. Признаки запроса берутся от редких
+        к частым, пока норма оставшихся не станет меньше min_score: у строки без
+        единого взятого признака сходство не больше этой нормы (векторы единичные).
+        По взятым признакам считается частичное сходство, и строки, которым
+        не добрать до порога даже с остатком нормы, отбрасываются. Результат точный,
+        а длинные списки частых признаков (React, API) не перебираются.
+        """
+        rest = float(np.dot(values, values))
+        partial = np.zeros(indexed, dtype=np.float32)
+        for i in np.argsort(ends - starts, kind='stable'):
+            if rest < min_score * min_score:
+                break
+            # В списке одного признака каждая строка встречается один раз
+            partial[rows[starts[i]:ends[i]]] += weights[starts[i]:ends[i]] * values[i]
+            rest -= float(values[i]) ** 2
+        return np.flatnonzero(partial >= min_score - np.sqrt(max(rest, 0.0)) - 1e-6)
+    
+    def find_reusable(
+        self,
+        user_query: str,
+        clarifications: Optional[Dict[str, str]] = None,
+        threshold: float = DEFAULT_REUSE_THRESHOLD
+    ) -> Optional[Tuple[float, str, dict]]:
+        """
+        (сходство, текст правил, запись) для самого похожего результата выше порога.
+        Записи без sha256 (из старых версий индекса) и записи, чьи правила
+        изменились или пропали, пропускаются.
+        """
+        for score, entry in self.search(user_query, clarifications, top_k=3, min_score=threshold):
+            if 'digest' not in entry:
+                continue
+            rules = _load_rules(entry)
+            if rules is not None and rules_digest(rules) == entry['digest']:
+                return score, rules, entry
+        return None
+
+def _load_rules(entry: dict) -> Optional[str]:
+    """Правила записи: из rules_store по версии, иначе из файла; None, если их нет"""
+    if entry.get('version'):
+        from rules_store import get_rules_store
+        store = get_rules_store()
+        if store is not None:
+            project, version = entry['version']
+            try:
+                return store.text(project, version).strip()
+            except (ValueError, OSError):
+                pass
+    try:
+        with open(entry['path'], encoding='utf-8') as f:
+            return extract_rules(f.read())
+    except OSError:
+        # Файл правил удален или перемещен
+        return None
+
+_rules_index = None
+_rules_index_lock = threading.Lock()
+
+def get_rules_index() -> RulesIndex:
+    """Общий для процесса индекс из RULES_INDEX_DIR"""
+    global _rules_index
+    if _rules_index is None:
+        with _rules_index_lock:
+            if _rules_index is None:
+                _rules_index = RulesIndex.from_env()
+    return _rules_index
+
+def reuse_threshold() -> float:
+    """Порог повторного использования из RULES_REUSE_THRESHOLD; по умолчанию 0 - не использовать"""
+    return float(os.getenv('RULES_REUSE_THRESHOLD', 0))
@@ -0,0 +1,156 @@
+"""
+Посекционная генерация .cursorrules.
+
+Документ делится на разделы (Code Style, Performance, Testing, Security, ...),
+каждый генерируется отдельным небольшим запросом. В промпт раздела попадают
+только те уточнения, которые к нему относятся (по ключевым словам вопроса
+и ответа), поэтому ключ кэша ответов (rules_cache) раздела зависит только от
+его подмножества входных данных: при изменении одного уточнения заново
+запрашиваются лишь затронутые разделы, остальные берутся из кэша.
+
+Разделы всегда склеиваются в порядке SECTIONS, так что итоговый текст
+не зависит от порядка завершения запросов.
+"""
+import re
+from typing import Dict, List, Optional
+
+from prompt_builder import Prompt, PromptBuilder, fit_clarifications
+
+class RuleSection:
+    """Раздел .cursorrules: заголовок, о чем писать и по каким словам выбирать уточнения"""
+    
+    __slots__ = ('key', 'title', 'focus', 'max_tokens', '_pattern')
+    
+    def __init__(self, key: str, title: str, focus: str, keywords: tuple, max_tokens: int = 250):
+        self.key = key
+        self.title = title
+        self.focus = focus
+        self.max_tokens = max_tokens
+        # Ключевые слова - основы слов: совпадение с началом слова без учета регистра
+        self._pattern = re.compile(r'\b(?:' + '|'.join(keywords) + ')', re.IGNORECASE) if keywords else None
+    
+    def matches(self, question: str, answer: str) -> bool:
+        return self._pattern is not None and bool(self._pattern.search(f"{question}\n{answer}"))
+
+# Первый раздел без заголовка: вводная "You are an expert in..." и стек технологий.
+# Уточнения, не подошедшие ни одному разделу, тоже попадают в него
+SECTIONS = (
+    RuleSection(
+        'overview', '',
+        'Одна строка "You are an expert in ..." со всеми ключевыми технологиями проекта, '
+        'затем 2-4 правила о стеке и версиях',
+        ('stack', 'стек', 'framework', 'фреймворк', 'language', 'язык', 'librar', 'библиотек',
+         'version', 'верси', 'platform', 'платформ'),
+        max_tokens=150
+    ),
+    RuleSection(
+        'architecture', 'Architecture and Project Structure',
+        'архитектура, структура каталогов и модулей, паттерны, работа с данными и API',
+        ('architect', 'архитект', 'structur', 'структур', 'module', 'модул', 'pattern', 'паттерн',
+         'microservice', 'микросервис', 'monorepo', 'database', 'баз', 'api', 'orm')
+    ),
+    RuleSection(
+        'code_style', 'Code Style and Conventions',
+        'стиль кода, именование, типизация, форматирование и линтеры',
+        ('style', 'стил', 'naming', 'именова', 'lint', 'линт', 'format', 'формат', 'typ', 'типиз',
+         'eslint', 'prettier', 'pep', 'convention', 'соглашени')
+    ),
+    RuleSection(
+        'error_handling', 'Error Handling and Logging',
+        'обработка ошибок, логирование, повторы и наблюдаемость',
+        ('error', 'ошиб', 'exception', 'исключени', 'log', 'лог', 'retry', 'повтор',
+         'monitor', 'мониторинг', 'observab', 'alert')
+    ),
+    RuleSection(
+        'performance', 'Performance and Optimization',
+        'производительность, кэширование, работа под нагрузкой и масштабирование',
+        ('perform', 'производит', 'cach', 'кэш', 'кеш', 'latenc', 'задержк', 'optimi', 'оптимиз',
+         'load', 'нагруз', 'scal', 'масштаб', 'memory', 'памят')
+    ),
+    RuleSection(
+        'testing', 'Testing and Quality',
+        'тесты, их виды и инструменты, покрытие и CI',
+        ('test', 'тест', 'coverage', 'покрыти', 'ci', 'pytest', 'jest', 'qa', 'e2e')
+    ),
+    RuleSection(
+        'security', 'Security',
+        'безопасность, аутентификация и авторизация, секреты, валидация ввода',
+        ('secur', 'безопас', 'auth', 'авториз', 'аутентиф', 'secret', 'секрет', 'token', 'токен',
+         'access', 'доступ', 'encrypt', 'шифр', 'gdpr', 'персональн')
+    ),
+    RuleSection(
+        'documentation', 'Documentation',
+        'документация кода и API, README, комментарии',
+        ('doc', 'документ', 'readme', 'comment', 'комментар', 'docstring')
+    ),
+)
+
+SECTION_SYSTEM_PROMPT = """Ты эксперт по написанию .cursorrules файлов для IDE Cursor.
+
+.cursorrules файлы - это инструкции для AI-ассистента в Cursor IDE, которые определяют как он должен действовать при работе с кодом.
+
+Ты пишешь ОДИН раздел .cursorrules файла, остальные разделы пишутся отдельно.
+Правила раздела должны быть конкретными для описанного проекта и не повторять темы других разделов.
+
+Формат ответа: только строки правил, каждая начинается с "- ", без заголовка раздела и без пояснений.
+Исключение - вводный раздел: он начинается со строки "You are an expert in ...", за ней идут строки правил."""
+
+SECTION_USER_TEMPLATE = """Раздел: {title}
+Тема раздела: {focus}
+
+Пользователь описал свой проект: {context}"""
+
+def section_clarifications(
+    section: RuleSection,
+    clarifications: Optional[Dict[str, str]] = None
+) -> Dict[str, str]:
+    """Уточнения (с непустым ответом), от которых зависит раздел"""
+    answered = {q: a for q, a in (clarifications or {}).items() if a.strip()}
+    if section.key == 'overview':
+        unmatched = {
+            q: a for q, a in answered.items()
+            if not any(other.matches(q, a) for other in SECTIONS if other.key != 'overview')
+        }
+        return {q: a for q, a in answered.items() if q in unmatched or section.matches(q, a)}
+    return {q: a for q, a in answered.items() if section.matches(q, a)}
+
+def build_section_prompt(
+    builder: PromptBuilder,
+    section: RuleSection,
+    user_query: str,
+    clarifications: Optional[Dict[str, str]] = None
+) -> Prompt:
+    """Промпт раздела: общий статический префикс, затем только зависящие от раздела данные"""
+    title = section.title or 'Вводный раздел'
+    context = user_query
+    relevant = section_clarifications(section, clarifications)
+    trimmed = False
+    if relevant:
+        header = "\n\nУточнения, относящиеся к разделу:"
+        budget = builder.available_tokens(
+            SECTION_USER_TEMPLATE.format(title=title, focus=section.focus, context=context), header
+        )
+        fitted = fit_clarifications(relevant, budget, builder.model)
+        trimmed = fitted != relevant
+        if fitted:
+            context += header
+            for question, answer in fitted.items():
+                context += f"\n- {question}: {answer}"
+    return builder.build(SECTION_USER_TEMPLATE.format(title=title, focus=section.focus, context=context), trimmed)
+
+def merge_sections(texts: Dict[str, str]) -> str:
+    """Склеивает разделы в порядке SECTIONS; пустые разделы пропускаются"""
+    parts = []
+    for section in SECTIONS:
+        text = (texts.get(section.key) or '').strip()
+        if not text:
+            continue
+        parts.append(f"{section.title}\n{text}" if section.title else text)
+    return '\n\n'.join(parts)
+
+def section_keys(clarifications_before: Dict[str, str], clarifications_after: Dict[str, str]) -> List[str]:
+    """Разделы, которые нужно перегенерировать после изменения уточнений (при том же описании проекта)"""
+    return [
+        section.key for section in SECTIONS
+        if section_clarifications(section, clarifications_before) != section_clarifications(section, clarifications_after)
+    ]
@@ -0,0 +1,517 @@
+"""
+История сгенерированных правил: версии с дедупликацией содержимого.
+
+save_rules_md в main.py, chat_generator.py и rag_livekit_rules_generator.py
+перезаписывают свои файлы (rules.md, rag_livekit_rules.md,
+rag_livekit_cursorrules.md, .cursorrules), а каждая сохраненная версия
+дополнительно попадает сюда:
+
+    blobs/ab/cdef...      разделы правил, сжатые zlib; имя - sha256 текста раздела
+    manifests/<sha256>    список разделов версии (id и число строк), заголовок и
+                          вводный текст .md, сжатые zlib; имя - sha256 манифеста.
+                          Обычно хранится не целиком, а изменениями относительно
+                          манифеста прошлой версии проекта (цепочка до
+                          MAX_DELTA_DEPTH): разделов много, меняются единицы
+    index.jsonl           проект, номер версии, время, манифест, размер
+
+Текст делится на разделы по пустым строкам (абзац "## Заголовок" со
+списком правил или блок "Раздел\\nтекст" из merge_sections), склейка
+разделов дает исходный текст байт в байт. Одинаковые разделы разных версий
+и проектов хранятся один раз, поэтому хранилище растет с объемом нового
+содержимого, а не с числом генераций; повторное сохранение того же текста
+новой версии не создает.
+
+Сравнение версий сначала сопоставляет списки id разделов из манифестов:
+построчный diff считается только по измененным разделам, из неизмененных
+читаются лишь соседние строки для контекста хунков. Любую версию можно
+снова записать в .md или .cursorrules через rules_writer.
+
+    python rules_store.py list
+    python rules_store.py diff rules 3 4
+    python rules_store.py materialize rules 3 --output rules.md --output .cursorrules
+    python rules_store.py import rag_livekit_cursorrules.md
+
+Настройка:
+    RULES_STORE_DIR           каталог хранилища (по умолчанию cursorrules_lib/store)
+    RULES_STORE_DISABLE=1     не сохранять версии из save_rules_md
+
+Один процесс пишет в хранилище одновременно; читать могут несколько.
+"""
+import argparse
+import bisect
+import difflib
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from rules_writer import markdown_output, plain_output, write_rules
+
+DEFAULT_STORE_DIR = os.path.join('cursorrules_lib', 'store')
+DEFAULT_TITLE = '# Cursor Rules'
+MAX_DELTA_DEPTH = 32
+
+# Граница раздела: начало непустой строки после пустой
+_SECTION_BOUNDARY = re.compile(r'(?<=\n\n)(?=[^\n])')
+
+def split_sections(text: str) -> List[str]:
+    """Разделы текста правил; ''.join(split_sections(text)) == text"""
+    return [section for section in _SECTION_BOUNDARY.split(text) if section]
+
+def parse_markdown(markdown: str) -> Tuple[str, str, str]:
+    """
+    (заголовок, вводный текст, правила) файла, записанного markdown_output;
+    для прочих файлов - ('', '', весь текст)
+    """
+    title, sep, rest = markdown.partition('\n\n')
+    start = rest.find('```\n')
+    if not title.startswith('#') or '\n' in title or not sep or start == -1 or not rest.endswith('\n```\n'):
+        return '', '', markdown
+    return title, rest[:start], rest[start + 4:-5]
+
+def project_for_path(path: str) -> str:
+    """Имя проекта по пути файла правил: rules.md -> rules"""
+    name = os.path.basename(path)
+    return os.path.splitext(name)[0] if not name.startswith('.') else name.lstrip('.')
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def _range(start: int, stop: int) -> str:
+    # Диапазон строк в заголовке хунка, как в difflib.unified_diff
+    length = stop - start
+    if length == 1:
+        return str(start + 1)
+    return f'{start + 1 if length else start},{length}'
+
+class _SectionLines:
+    """Строки версии по номеру; разделы читаются с диска при первом обращении"""
+    
+    def __init__(self, store: 'RulesStore', sections: list):
+        self.store = store
+        self.sections = sections
+        self.offsets = [0]
+        for _, lines in sections:
+            self.offsets.append(self.offsets[-1] + lines)
+        self._read: Dict[int, List[str]] = {}
+    
+    def _section(self, index: int) -> List[str]:
+        lines = self._read.get(index)
+        if lines is None:
+            lines = self._read[index] = self.store.read_section(self.sections[index][0]).splitlines(True)
+        return lines
+    
+    def region(self, start: int, stop: int) -> List[str]:
+        return [line for index in range(start, stop) for line in self._section(index)]
+    
+    def __getitem__(self, line: int) -> str:
+        index = bisect.bisect_right(self.offsets, line) - 1
+        return self._section(index)[line - self.offsets[index]]
+
+def _grouped(codes: list, context: int) -> Iterator[list]:
+    """Хунки из построчных opcodes, как SequenceMatcher.get_grouped_opcodes"""
+    if not codes or (len(codes) == 1 and codes[0][0] == 'equal'):
+        return
+    codes = list(codes)
+    if codes[0][0] == 'equal':
+        tag, i1, i2, j1, j2 = codes[0]
+        codes[0] = tag, max(i1, i2 - context), i2, max(j1, j2 - context), j2
+    if codes[-1][0] == 'equal':
+        tag, i1, i2, j1, j2 = codes[-1]
+        codes[-1] = tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context)
+    group = []
+    for tag, i1, i2, j1, j2 in codes:
+        if tag == 'equal' and i2 - i1 > 2 * context:
+            group.append((tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context)))
+            yield group
+            group = []
+            i1, j1 = max(i1, i2 - context), max(j1, j2 - context)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == 'equal'):
+        yield group
+
+class RulesVersion:
+    """Запись индекса: версия правил проекта"""
+    
+    __slots__ = ('project', 'version', 'created', 'manifest', 'size', 'meta')
+    
+    def __init__(self, project: str, version: int, created: float, manifest: str, size: int, meta: Optional[dict] = None):
+        self.project = project
+        self.version = version
+        self.created = created
+        self.manifest = manifest
+        self.size = size
+        self.meta = meta or {}
+    
+    @classmethod
+    def from_record(cls, record: dict) -> 'RulesVersion':
+        return cls(record['project'], record['version'], record['created'], record['manifest'],
+                   record['size'], record.get('meta'))
+    
+    def to_record(self) -> dict:
+        return {
+            'project': self.project,
+            'version': self.version,
+            'created': self.created,
+            'manifest': self.manifest,
+            'size': self.size,
+            'meta': self.meta,
+        }
+
+class RulesStore:
+    """Версии правил по проектам поверх content-addressed хранилища разделов"""
+    
+    def __init__(self, directory: str = DEFAULT_STORE_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._index_path = os.path.join(directory, 'index.jsonl')
+        self._versions: Dict[str, List[RulesVersion]] = {}
+        self._manifests: Dict[str, dict] = {}
+        # Длина цепочки изменений до полного манифеста
+        self._depths: Dict[str, int] = {}
+        
+        if os.path.exists(self._index_path):
+            with open(self._index_path, 'rb') as f:
+                for line in f.read().split(b'\n'):
+                    # Последняя строка могла оборваться при сбое
+                    if line.endswith(b'}'):
+                        version = RulesVersion.from_record(json.loads(line))
+                        self._versions.setdefault(version.project, []).append(version)
+    
+    @classmethod
+    def from_env(cls) -> 'RulesStore':
+        return cls(os.getenv('RULES_STORE_DIR', DEFAULT_STORE_DIR))
+    
+    def _write_file(self, path: str, data: bytes):
+        """Атомарно: временный файл рядом, fsync, os.replace"""
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        temp_path = os.path.join(directory, f'.{os.path.basename(path)}.{uuid.uuid4().hex[:8]}.tmp')
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+    
+    def _blob_path(self, blob_id: str) -> str:
+        return os.path.join(self.directory, 'blobs', blob_id[:2], blob_id[2:])
+    
+    def _manifest_path(self, manifest_id: str) -> str:
+        return os.path.join(self.directory, 'manifests', manifest_id)
+    
+    def _put_blob(self, data: bytes) -> Tuple[str, bool]:
+        """(id, записан ли новый блоб); существующий блоб не перезаписывается"""
+        blob_id = _digest(data)
+        path = self._blob_path(blob_id)
+        if os.path.exists(path):
+            return blob_id, False
+        self._write_file(path, zlib.compress(data))
+        return blob_id, True
+    
+    def read_section(self, blob_id: str) -> str:
+        with open(self._blob_path(blob_id), 'rb') as f:
+            return zlib.decompress(f.read()).decode('utf-8')
+    
+    def manifest(self, manifest_id: str) -> dict:
+        manifest = self._manifests.get(manifest_id)
+        if manifest is None:
+            with open(self._manifest_path(manifest_id), 'rb') as f:
+                stored = json.loads(zlib.decompress(f.read()))
+            if 'base' in stored:
+                base = self.manifest(stored['base'])
+                sections, position = [], 0
+                for start, stop, inserted in stored['edits']:
+                    sections.extend(base['sections'][position:start])
+                    sections.extend(inserted)
+                    position = stop
+                sections.extend(base['sections'][position:])
+                manifest = {
+                    'sections': sections,
+                    'title': stored.get('title', base['title']),
+                    'preamble': stored.get('preamble', base['preamble']),
+                }
+                self._depths[manifest_id] = stored['depth']
+            else:
+                manifest = stored
+            self._manifests[manifest_id] = manifest
+        return manifest
+    
+    def _encode_manifest(self, manifest: dict, data: bytes, base_id: Optional[str]) -> bytes:
+        """
+        Манифест на диске: полный или изменения относительно манифеста прошлой
+        версии (цепочка не длиннее MAX_DELTA_DEPTH), если так короче
+        """
+        full = zlib.compress(data)
+        if base_id is None:
+            return full
+        base = self.manifest(base_id)
+        depth = self._depths.get(base_id, 0) + 1
+        if depth > MAX_DELTA_DEPTH:
+            return full
+        new_sections = manifest['sections']
+        matcher = difflib.SequenceMatcher(
+            None, [blob_id for blob_id, _ in base['sections']], [blob_id for blob_id, _ in new_sections], autojunk=False
+        )
+        delta = {
+            'base': base_id,
+            'depth': depth,
+            'edits': [[i1, i2, new_sections[j1:j2]] for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != 'equal'],
+        }
+        for key in ('title', 'preamble'):
+            if manifest[key] != base[key]:
+                delta[key] = manifest[key]
+        encoded = zlib.compress(json.dumps(delta, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        if len(encoded) >= len(full):
+            return full
+        self._depths[_digest(data)] = depth
+        return encoded
+    
+    def put(
+        self,
+        project: str,
+        rules: Union[str, Iterable[str]],
+        title: str = DEFAULT_TITLE,
+        preamble: str = '',
+        meta: Optional[dict] = None
+    ) -> RulesVersion:
+        """
+        Сохраняет текст правил (строку или фрагменты) новой версией проекта.
+        Если он совпадает с последней версией вместе с заголовком, возвращается она.
+        """
+        text = rules if isinstance(rules, str) else ''.join(rules)
+        sections = []
+        for section in split_sections(text):
+            blob_id, _ = self._put_blob(section.encode('utf-8'))
+            sections.append([blob_id, len(section.splitlines(True))])
+        manifest = {'sections': sections, 'title': title, 'preamble': preamble}
+        data = json.dumps(manifest, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        manifest_id = _digest(data)
+        
+        with self._lock:
+            versions = self._versions.get(project, [])
+            if versions and versions[-1].manifest == manifest_id:
+                return versions[-1]
+            if not os.path.exists(self._manifest_path(manifest_id)):
+                encoded = self._encode_manifest(manifest, data, versions[-1].manifest if versions else None)
+                self._write_file(self._manifest_path(manifest_id), encoded)
+            self._manifests[manifest_id] = manifest
+            version = RulesVersion(
+                project, len(versions) + 1, round(time.time(), 3), manifest_id, len(text.encode('utf-8')), meta
+            )
+            # Версия видна после того, как ее разделы и манифест уже на диске
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self._index_path, 'ab') as f:
+                f.write(json.dumps(version.to_record(), ensure_ascii=False).encode('utf-8') + b'\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self._versions.setdefault(project, []).append(version)
+        return version
+    
+    def projects(self) -> List[str]:
+        return sorted(self._versions)
+    
+    def versions(self, project: str) -> List[RulesVersion]:
+        return list(self._versions.get(project, ()))
+    
+    def get(self, project: str, version: Optional[int] = None) -> RulesVersion:
+        """Версия проекта; None - последняя"""
+        versions = self._versions.get(project)
+        if not versions:
+            raise ValueError(f'Unknown project: {project}')
+        if version is None:
+            return versions[-1]
+        if not 1 <= version <= len(versions):
+            raise ValueError(f'Unknown version: {project}@{version}')
+        return versions[version - 1]
+    
+    def iter_text(self, project: str, version: Optional[int] = None) -> Iterator[str]:
+        """Текст правил версии по разделам"""
+        for blob_id, _ in self.manifest(self.get(project, version).manifest)['sections']:
+            yield self.read_section(blob_id)
+    
+    def text(self, project: str, version: Optional[int] = None) -> str:
+        return ''.join(self.iter_text(project, version))
+    
+    def materialize(self, project: str, version: Optional[int], paths: Sequence[str]) -> int:
+        """
+        Записывает версию в файлы за один проход: .md - с заголовком и вводным
+        текстом этой версии, остальные (например .cursorrules) - голый текст.
+        Возвращает размер текста в байтах.
+        """
+        record = self.get(project, version)
+        manifest = self.manifest(record.manifest)
+        outputs = [
+            markdown_output(path, manifest['title'] or DEFAULT_TITLE, manifest['preamble'])
+            if path.endswith('.md') else plain_output(path)
+            for path in paths
+        ]
+        return write_rules(self.iter_text(project, record.version), outputs)
+    
+    def _section_changes(self, project: str, old: int, new: int) -> Tuple[list, list, list]:
+        old_sections = self.manifest(self.get(project, old).manifest)['sections']
+        new_sections = self.manifest(self.get(project, new).manifest)['sections']
+        matcher = difflib.SequenceMatcher(
+            None, [blob_id for blob_id, _ in old_sections], [blob_id for blob_id, _ in new_sections], autojunk=False
+        )
+        return old_sections, new_sections, matcher.get_opcodes()
+    
+    def compare(self, project: str, old: int, new: int) -> dict:
+        """Число неизмененных, удаленных и добавленных разделов; сами разделы не читаются"""
+        old_sections, new_sections, opcodes = self._section_changes(project, old, new)
+        unchanged = sum(i2 - i1 for tag, i1, i2, _, _ in opcodes if tag == 'equal')
+        return {
+            'unchanged': unchanged,
+            'removed': len(old_sections) - unchanged,
+            'added': len(new_sections) - unchanged,
+        }
+    
+    def diff(self, project: str, old: int, new: int, context: int = 3) -> str:
+        """
+        Unified diff двух версий проекта. Неизмененные разделы сопоставляются по
+        id, с диска читаются только измененные и те, из которых берется контекст.
+        """
+        old_sections, new_sections, opcodes = self._section_changes(project, old, new)
+        old_lines = _SectionLines(self, old_sections)
+        new_lines = _SectionLines(self, new_sections)
+        
+        # Построчные opcodes всего файла: равные разделы - одним блоком без чтения
+        codes = []
+        
+        def append(op, a1, a2, b1, b2):
+            # Соседние равные блоки (конец измененного раздела + неизмененные разделы) склеиваются
+            if op == 'equal' and codes and codes[-1][0] == 'equal':
+                _, a1, _, b1, _ = codes.pop()
+            codes.append((op, a1, a2, b1, b2))
+        
+        for tag, i1, i2, j1, j2 in opcodes:
+            a_base, b_base = old_lines.offsets[i1], new_lines.offsets[j1]
+            if tag == 'equal':
+                append('equal', a_base, old_lines.offsets[i2], b_base, new_lines.offsets[j2])
+                continue
+            a, b = old_lines.region(i1, i2), new_lines.region(j1, j2)
+            for op, a1, a2, b1, b2 in difflib.SequenceMatcher(None, a, b).get_opcodes():
+                append(op, a_base + a1, a_base + a2, b_base + b1, b_base + b2)
+        
+        out = []
+        for group in _grouped(codes, context):
+            first, last = group[0], group[-1]
+            out.append(f'@@ -{_range(first[1], last[2])} +{_range(first[3], last[4])} @@\n')
+            for op, a1, a2, b1, b2 in group:
+                if op in ('equal', 'delete', 'replace'):
+                    prefix = ' ' if op == 'equal' else '-'
+                    out.extend(prefix + old_lines[i] for i in range(a1, a2))
+                if op in ('insert', 'replace'):
+                    out.extend('+' + new_lines[i] for i in range(b1, b2))
+        if not out:
+            return ''
+        # Как difflib: строка без перевода строки в конце файла закрывается отдельно
+        out = [line if line.endswith('\n') else line + '\n\\ No newline at end of file\n' for line in out]
+        return f'--- {project}@{old}\n+++ {project}@{new}\n' + ''.join(out)
+    
+    def stats(self) -> dict:
+        blobs = blob_bytes = 0
+        for root, _, files in os.walk(os.path.join(self.directory, 'blobs')):
+            for name in files:
+                if not name.endswith('.tmp'):
+                    blobs += 1
+                    blob_bytes += os.path.getsize(os.path.join(root, name))
+        manifests_dir = os.path.join(self.directory, 'manifests')
+        manifest_bytes = sum(
+            os.path.getsize(os.path.join(manifests_dir, name))
+            for name in (os.listdir(manifests_dir) if os.path.isdir(manifests_dir) else ()) if not name.endswith('.tmp')
+        )
+        index_bytes = os.path.getsize(self._index_path) if os.path.exists(self._index_path) else 0
+        versions = [version for project in self._versions.values() for version in project]
+        logical_bytes = sum(version.size for version in versions)
+        stored_bytes = blob_bytes + manifest_bytes + index_bytes
+        return {
+            'projects': len(self._versions),
+            'versions': len(versions),
+            'blobs': blobs,
+            'logical_bytes': logical_bytes,
+            'stored_bytes': stored_bytes,
+            'stored_to_logical': round(stored_bytes / logical_bytes, 4) if logical_bytes else None,
+        }
+
+_rules_store = None
+_rules_store_lock = threading.Lock()
+
+def get_rules_store() -> Optional[RulesStore]:
+    """Общее для процесса хранилище из RULES_STORE_DIR (None, если RULES_STORE_DISABLE=1)"""
+    global _rules_store
+    if os.getenv('RULES_STORE_DISABLE', '') not in ('', '0'):
+        return None
+    if _rules_store is None:
+        with _rules_store_lock:
+            if _rules_store is None:
+                _rules_store = RulesStore.from_env()
+    return _rules_store
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    listing = commands.add_parser('list', help='Проекты или версии проекта')
+    listing.add_argument('project', nargs='?')
+    show = commands.add_parser('show', help='Текст версии')
+    show.add_argument('project')
+    show.add_argument('version', type=int, nargs='?')
+    diff = commands.add_parser('diff', help='Unified diff двух версий')
+    diff.add_argument('project')
+    diff.add_argument('old', type=int)
+    diff.add_argument('new', type=int)
+    diff.add_argument('--context', type=int, default=3)
+    materialize = commands.add_parser('materialize', help='Записать версию в .md и/или .cursorrules')
+    materialize.add_argument('project')
+    materialize.add_argument('version', type=int, nargs='?')
+    materialize.add_argument('--output', action='append', required=True, help='Путь файла (можно несколько)')
+    imported = commands.add_parser('import', help='Сохранить существующие файлы правил версиями')
+    imported.add_argument('paths', nargs='+')
+    imported.add_argument('--project', help='Имя проекта (по умолчанию - по имени файла)')
+    commands.add_parser('stats', help='Размер хранилища')
+    args = parser.parse_args()
+    
+    store = RulesStore.from_env()
+    try:
+        if args.command == 'list' and args.project is None:
+            for project in store.projects():
+                latest = store.get(project)
+                print(f'{project}: версий {latest.version}, последняя '
+                      f'{time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(latest.created))}')
+        elif args.command == 'list':
+            for version in store.versions(args.project):
+                compared = store.compare(args.project, version.version - 1, version.version) if version.version > 1 else None
+                change = f', разделов +{compared["added"]} -{compared["removed"]}' if compared else ''
+                print(f'{version.version}\t{time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(version.created))}\t'
+                      f'{version.size} байт{change}')
+        elif args.command == 'show':
+            print(store.text(args.project, args.version), end='')
+        elif args.command == 'diff':
+            print(store.diff(args.project, args.old, args.new, args.context), end='')
+        elif args.command == 'materialize':
+            size = store.materialize(args.project, args.version, args.output)
+            print(f'Записано {size} байт в {", ".join(args.output)}')
+        elif args.command == 'import':
+            for path in args.paths:
+                with open(path, encoding='utf-8') as f:
+                    title, preamble, rules = parse_markdown(f.read())
+                version = store.put(args.project or project_for_path(path), rules, title, preamble, {'path': os.path.abspath(path)})
+                print(f'{path} -> {version.project}@{version.version}')
+        else:
+            print(json.dumps(store.stats(), indent=2))
+    except ValueError as e:
+        parser.error(str(e))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""
+Атомарная запись сгенерированных правил.
+
+Текст правил принимается строкой или потоком фрагментов (например, прямо
+из стриминга completion) и за один проход пишется во все нужные файлы:
+.md с заголовком и блоком кода, голый .cursorrules и т.п. Каждый фрагмент
+кодируется в UTF-8 один раз, одинаковые байты уходят во все файлы; мелкие
+фрагменты копятся в буфере до CHUNK_SIZE байт.
+
+Каждый файл сначала пишется во временный файл рядом с целевым, затем
+fsync и os.replace: при падении процесса на месте остается либо старая,
+либо новая версия целиком, но не обрезанный файл. Если поток фрагментов
+завершился исключением, временные файлы удаляются.
+
+    with RulesWriter([markdown_output('rules.md', '# Cursor Rules'), plain_output('.cursorrules')]) as writer:
+        for chunk in stream:
+            writer.write(chunk)
+"""
+import os
+import uuid
+from typing import Iterable, Iterator, List, Sequence, Union
+
+CHUNK_SIZE = 64 * 1024
+
+class RulesOutput:
+    """Целевой файл и обрамление текста правил в нем"""
+    
+    __slots__ = ('path', 'header', 'footer')
+    
+    def __init__(self, path: str, header: str = '', footer: str = ''):
+        self.path = path
+        self.header = header
+        self.footer = footer
+
+def markdown_output(path: str, title: str, preamble: str = '') -> RulesOutput:
+    """.md файл: заголовок, необязательный вводный текст и правила в блоке ```"""
+    return RulesOutput(path, f"{title}\n\n{preamble}```\n", "\n```\n")
+
+def plain_output(path: str) -> RulesOutput:
+    """Файл только с текстом правил, например .cursorrules"""
+    return RulesOutput(path)
+
+def _fsync_directory(directory: str):
+    # На Windows каталог нельзя открыть для fsync, os.replace там и так надежен
+    if os.name == 'nt':
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class RulesWriter:
+    """
+    Пишет текст правил во все outputs за один проход. Файлы появляются на
+    своих местах только в commit() (или при выходе из with без исключения).
+    """
+    
+    def __init__(self, outputs: Sequence[RulesOutput], chunk_size: int = CHUNK_SIZE):
+        self.outputs = list(outputs)
+        self.chunk_size = chunk_size
+        self.bytes_written = 0
+        self._buffer = bytearray()
+        self._files = []
+        self._temp_paths: List[str] = []
+        try:
+            for output in self.outputs:
+                directory = os.path.dirname(output.path) or '.'
+                os.makedirs(directory, exist_ok=True)
+                temp_path = os.path.join(directory, f".{os.path.basename(output.path)}.{uuid.uuid4().hex[:8]}.tmp")
+                # Права как у обычного open(): 0666 с учетом umask
+                fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0), 0o666)
+                self._temp_paths.append(temp_path)
+                self._files.append(os.fdopen(fd, 'wb'))
+                if output.header:
+                    self._files[-1].write(output.header.encode('utf-8'))
+        except BaseException:
+            self.abort()
+            raise
+    
+    def write(self, chunk: str):
+        self._buffer += chunk.encode('utf-8')
+        if len(self._buffer) >= self.chunk_size:
+            self._flush_buffer()
+    
+    def _flush_buffer(self):
+        if not self._buffer:
+            return
+        data = bytes(self._buffer)
+        for f in self._files:
+            f.write(data)
+        self.bytes_written += len(data)
+        self._buffer.clear()
+    
+    def commit(self):
+        """Дописывает обрамление, сбрасывает файлы на диск и атомарно ставит их на место"""
+        try:
+            self._flush_buffer()
+            for output, f in zip(self.outputs, self._files):
+                if output.footer:
+                    f.write(output.footer.encode('utf-8'))
+                f.flush()
+                os.fsync(f.fileno())
+                f.close()
+            for output, temp_path in zip(self.outputs, self._temp_paths):
+                os.replace(temp_path, output.path)
+        except BaseException:
+            self.abort()
+            raise
+        self._temp_paths = []
+        for directory in {os.path.dirname(os.path.abspath(output.path)) for output in self.outputs}:
+            _fsync_directory(directory)
+    
+    def abort(self):
+        """Удаляет временные файлы, целевые файлы не меняются"""
+        for f in self._files:
+            f.close()
+        for temp_path in self._temp_paths:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+        self._temp_paths = []
+    
+    def __enter__(self) -> 'RulesWriter':
+        return self
+    
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+def tee_chunks(chunks: Iterable[str], parts: List[str]) -> Iterator[str]:
+    """
+    Отдает фрагменты дальше, попутно складывая их в parts: весь текст
+    (для истории или индекса) собирается по ходу записи, а не до нее.
+    """
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+
+def write_rules(rules: Union[str, Iterable[str]], outputs: Sequence[RulesOutput]) -> int:
+    """Записывает правила (строку или фрагменты) во все outputs и возвращает размер текста в байтах"""
+    with RulesWriter(outputs) as writer:
+        if isinstance(rules, str):
+            writer.write(rules)
+        else:
+            for chunk in rules:
+                writer.write(chunk)
+    return writer.bytes_written
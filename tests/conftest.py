@@ -0,0 +1,69 @@
+"""
+Общие фикстуры тестов. Запуск из корня репозитория:
+    python -m pytest tests
+
+Кэш ответов, индекс похожих запросов и история правил каждого теста лежат
+во временном каталоге; общие для процесса экземпляры сбрасываются.
+Запросы к модели идут в локальную заглушку benchmarks/openai_stub.py.
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+os.environ.setdefault('OPENAI_API_KEY', 'stub')
+
+import api.token as token_api
+import openai_clients
+import rules_cache
+import rules_index
+import rules_store
+import rate_scheduler
+from benchmarks.openai_stub import start_stub
+
+@pytest.fixture(autouse=True)
+def isolated_state(tmp_path, monkeypatch):
+    monkeypatch.setenv('RULES_CACHE_PATH', str(tmp_path / 'cache' / 'responses.sqlite3'))
+    monkeypatch.setenv('RULES_INDEX_DIR', str(tmp_path / 'index'))
+    monkeypatch.setenv('RULES_STORE_DIR', str(tmp_path / 'store'))
+    monkeypatch.delenv('RULES_REUSE_THRESHOLD', raising=False)
+    for module, name in ((rules_cache, '_response_cache'), (rules_index, '_rules_index'),
+                         (rules_store, '_rules_store'), (rate_scheduler, '_scheduler')):
+        monkeypatch.setattr(module, name, None)
+    yield
+
+@pytest.fixture
+def openai_stub(monkeypatch):
+    """Фабрика заглушек OpenAI API: start(**options) запускает заглушку и направляет на нее клиентов"""
+    servers = []
+    
+    def start(**options):
+        server, base_url = start_stub(**options)
+        servers.append(server)
+        monkeypatch.setenv('OPENAI_BASE_URL', base_url)
+        # Общие клиенты запомнили адрес прошлой заглушки
+        openai_clients.close_clients()
+        return server
+    
+    yield start
+    openai_clients.close_clients()
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+@pytest.fixture
+def token_env(monkeypatch):
+    """Креды LiveKit в окружении и сброшенные минтер, keyring, verifier, кеш токенов и лимитер api.token"""
+    monkeypatch.setenv('LIVEKIT_API_KEY', 'test-key')
+    monkeypatch.setenv('LIVEKIT_API_SECRET', 'test-secret-' + 'x' * 32)
+    monkeypatch.setenv('LIVEKIT_URL', 'wss://example.livekit.cloud')
+    monkeypatch.delenv('LIVEKIT_TOKEN_CACHE_SIZE', raising=False)
+    monkeypatch.delenv('LIVEKIT_KEYRING_FILE', raising=False)
+    for name, value in (('_minter', None), ('_token_cache', None), ('_token_cache_loaded', False),
+                        ('_rate_limiter', None), ('_rate_limiter_loaded', False),
+                        ('_keyring', None), ('_keyring_loaded', False), ('_verifier', None)):
+        monkeypatch.setattr(token_api, name, value)
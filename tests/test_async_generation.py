@@ -0,0 +1,46 @@
+"""
+AsyncCursorRulesGenerator на локальной заглушке OpenAI API: стриминг,
+порядок и ограничение конкурентности generate_many, ошибки API.
+"""
+import asyncio
+
+import pytest
+
+import main as rules_main
+from rate_scheduler import RequestScheduler, RulesGenerationError
+
+def _generate(coroutine_factory, **generator_options):
+    async def run():
+        async with rules_main.AsyncCursorRulesGenerator(use_cache=False, **generator_options) as generator:
+            return await coroutine_factory(generator)
+    return asyncio.run(run())
+
+def test_streamed_chunks_concatenate_to_final_text(openai_stub):
+    openai_stub(completion_tokens=50)
+    chunks = []
+    text = _generate(lambda generator: generator.generate_cursorrules('React dashboard', on_token=chunks.append))
+    
+    assert len(chunks) > 1
+    assert ''.join(chunks).strip() == text
+    assert text == rules_main.CursorRulesGenerator(use_cache=False).generate_cursorrules('React dashboard')
+
+def test_generate_many_keeps_input_order_and_concurrency_bound(openai_stub):
+    server = openai_stub(completion_tokens=20, token_delay=0.005)
+    descriptions = [f'Project {i}: FastAPI service' for i in range(9)]
+    expected = [_generate(lambda generator, d=d: generator.generate_cursorrules(d)) for d in descriptions]
+    server.max_active = 0
+    
+    results = _generate(lambda generator: generator.generate_many(descriptions, concurrency=3))
+    
+    assert results == expected
+    assert len(set(results)) == len(descriptions)
+    assert 1 < server.max_active <= 3
+
+def test_api_errors_propagate(openai_stub):
+    openai_stub(error_rate=1.0)
+    scheduler = RequestScheduler(max_retries=0)
+    
+    with pytest.raises(RulesGenerationError) as raised:
+        _generate(lambda generator: generator.generate_cursorrules('React dashboard'), scheduler=scheduler)
+    assert raised.value.kind == 'rate_limit'
+    assert raised.value.status == 429
@@ -0,0 +1,53 @@
+"""
+Манифест batch_generate: имена проектов из описаний не конфликтуют,
+имена и пути результатов не выходят за пределы каталога.
+"""
+import json
+
+import pytest
+
+from batch_generate import load_manifest
+
+PREFIX = 'React + Next.js storefront with server components and edge caching'
+
+def _manifest(tmp_path, projects) -> str:
+    path = tmp_path / 'projects.jsonl'
+    path.write_text('\n'.join(json.dumps(project) for project in projects), encoding='utf-8')
+    return str(path)
+
+def test_generated_names_with_shared_prefix_get_hash_suffix(tmp_path):
+    manifest = _manifest(tmp_path, [
+        {'description': PREFIX + ' for shoes'},
+        {'description': PREFIX + ' for books'},
+        {'description': PREFIX + ' for books'},
+    ])
+    names = [project['name'] for project in load_manifest(manifest)]
+    assert len(set(names)) == 3
+    assert names[0] == 'react-next-js-storefront-with-server-components'
+    assert all(name.startswith('react-next-js-storefront') for name in names)
+    # Имена стабильны между запусками: от них зависит продолжение по файлу прогресса
+    assert names == [project['name'] for project in load_manifest(manifest)]
+
+def test_generated_name_avoids_explicit_name(tmp_path):
+    projects = load_manifest(_manifest(tmp_path, [
+        {'description': 'Django API'},
+        {'name': 'django-api', 'description': 'Another Django service'},
+    ]))
+    assert projects[0]['name'] != 'django-api'
+
+@pytest.mark.parametrize('name', ['../escape', 'nested/name', '..', 'a\\b', ''])
+def test_name_must_be_plain_file_name(tmp_path, name):
+    with pytest.raises(ValueError):
+        load_manifest(_manifest(tmp_path, [{'name': name, 'description': 'Django API'}]))
+
+@pytest.mark.parametrize('output', ['../rules.md', 'rules/../../x.md', '/etc/rules.md'])
+def test_output_must_stay_relative(tmp_path, output):
+    with pytest.raises(ValueError):
+        load_manifest(_manifest(tmp_path, [{'output': output, 'description': 'Django API'}]))
+
+def test_explicit_duplicate_names_are_rejected(tmp_path):
+    with pytest.raises(ValueError, match='повторяющееся'):
+        load_manifest(_manifest(tmp_path, [
+            {'name': 'api', 'description': 'Django API'},
+            {'name': 'api', 'description': 'Flask API'},
+        ]))
@@ -0,0 +1,103 @@
+"""
+RequestScheduler: общая пауза после 429, AIMD, ошибки после всех повторов.
+"""
+import asyncio
+import threading
+import time
+
+import main as rules_main
+from openai_clients import get_client
+from rate_scheduler import RequestScheduler, RulesGenerationError
+
+def _rate_limited(retry_after: float) -> RulesGenerationError:
+    return RulesGenerationError('Rate limit reached', 'rate_limit', 429, retry_after)
+
+def test_retry_after_pauses_all_waiters():
+    scheduler = RequestScheduler(concurrency=8)
+    started = scheduler.acquire()
+    paused_at = time.monotonic()
+    scheduler.release(started, error=_rate_limited(0.3))
+    
+    waits = []
+    lock = threading.Lock()
+    
+    def wait_sync():
+        acquired = scheduler.acquire()
+        with lock:
+            waits.append(acquired - paused_at)
+    
+    async def wait_async():
+        return await scheduler.acquire_async() - paused_at
+    
+    threads = [threading.Thread(target=wait_sync) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    waits.append(asyncio.run(wait_async()))
+    for thread in threads:
+        thread.join()
+    
+    assert len(waits) == 4
+    assert min(waits) >= 0.29
+
+def test_aimd_halves_once_per_wave():
+    scheduler = RequestScheduler(concurrency=8)
+    wave = [scheduler.acquire() for _ in range(4)]
+    for started in wave:
+        scheduler.release(started, error=_rate_limited(0.01))
+    assert scheduler.limit == 4
+    assert scheduler.rate_limited == 4
+    
+    # Запрос, начатый после снижения, - новая волна
+    started = scheduler.acquire()
+    scheduler.release(started, error=_rate_limited(0.01))
+    assert scheduler.limit == 2
+    
+    # После первого 429 рост аддитивный: +1/limit на успешный ответ
+    started = scheduler.acquire()
+    scheduler.release(started)
+    assert scheduler.limit == 2.5
+
+def test_error_fields_after_retries_run_out(openai_stub):
+    server = openai_stub(error_rate=1.0)
+    scheduler = RequestScheduler(max_retries=2, backoff_base=0.01)
+    
+    try:
+        scheduler.complete(
+            get_client().with_options(max_retries=0),
+            model='stub', messages=[{'role': 'user', 'content': 'hi'}], max_tokens=5
+        )
+    except RulesGenerationError as e:
+        error = e
+    else:
+        raise AssertionError('RulesGenerationError expected')
+    
+    assert error.kind == 'rate_limit'
+    assert error.retryable
+    assert error.status == 429
+    assert error.attempts == 3
+    assert error.retry_after is not None and error.retry_after > 0
+    assert '[rate_limit 429, попыток: 3]' in str(error)
+    assert server.rate_limited == 3
+    assert (scheduler.retries, scheduler.failed) == (2, 1)
+
+def test_generate_many_returns_errors_in_place(openai_stub):
+    descriptions = [f'Project {i}: FastAPI service' for i in range(6)]
+    
+    async def generate_many(scheduler):
+        async with rules_main.AsyncCursorRulesGenerator(use_cache=False, scheduler=scheduler) as generator:
+            return await generator.generate_many(descriptions, concurrency=1)
+    
+    openai_stub(completion_tokens=20)
+    expected = asyncio.run(generate_many(RequestScheduler()))
+    server = openai_stub(completion_tokens=20, error_rate=0.5, seed=0)
+    results = asyncio.run(generate_many(RequestScheduler(max_retries=0)))
+    
+    assert len(results) == len(descriptions)
+    errors = [i for i, result in enumerate(results) if isinstance(result, RulesGenerationError)]
+    assert 0 < len(errors) < len(descriptions)
+    assert len(errors) == server.rate_limited
+    for i, result in enumerate(results):
+        if i in errors:
+            assert result.kind == 'rate_limit'
+        else:
+            assert result == expected[i]
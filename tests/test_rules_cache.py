@@ -0,0 +1,64 @@
+"""
+ResponseCache: ответ без текста - RulesGenerationError и в кэш не попадает,
+суммарный размер ведется без пересчета всей таблицы.
+"""
+from types import SimpleNamespace
+
+import pytest
+
+from rate_scheduler import RulesGenerationError
+from rules_cache import ResponseCache, cached_completion
+
+class _Completions:
+    def __init__(self, content):
+        self.content = content
+        self.calls = 0
+    
+    def create(self, **params):
+        self.calls += 1
+        message = SimpleNamespace(content=self.content)
+        choice = SimpleNamespace(message=message, finish_reason='content_filter')
+        return SimpleNamespace(id='chatcmpl-test', choices=[choice], usage=None)
+
+def _client(content) -> SimpleNamespace:
+    return SimpleNamespace(chat=SimpleNamespace(completions=_Completions(content)))
+
+def _stored_bytes(cache: ResponseCache) -> int:
+    return cache._connection().execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+@pytest.mark.parametrize('content', [None, ''])
+def test_empty_content_raises_and_is_not_cached(tmp_path, content):
+    cache = ResponseCache(str(tmp_path / 'responses.sqlite3'))
+    client = _client(content)
+    messages = [{'role': 'user', 'content': 'hi'}]
+    
+    for _ in range(2):
+        with pytest.raises(RulesGenerationError) as raised:
+            cached_completion(client, cache, 'stub', messages, 10, 0.0)
+        assert raised.value.kind == 'empty'
+        assert raised.value.request_id == 'chatcmpl-test'
+        assert 'content_filter' in str(raised.value)
+    assert client.chat.completions.calls == 2
+    assert cache.stats()['entries'] == 0
+
+def test_running_total_tracks_replacements_and_eviction(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'responses.sqlite3'), max_bytes=500)
+    for i in range(30):
+        cache.put(f'key-{i % 12}', 'x' * (50 + i))
+        stats = cache.stats()
+        assert stats['bytes'] == _stored_bytes(cache)
+        assert stats['bytes'] <= 500
+    # Вытесняются давно не использованные записи
+    assert cache.get('key-6') is None
+    assert cache.get('key-5') == 'x' * 79
+    
+    cache.clear()
+    assert cache.stats()['bytes'] == 0
+
+def test_running_total_survives_reopen_and_expiry(tmp_path):
+    path = str(tmp_path / 'responses.sqlite3')
+    ResponseCache(path).put('a', 'x' * 100)
+    cache = ResponseCache(path, ttl=-1)
+    assert cache.stats()['bytes'] == 100
+    assert cache.get('a') is None
+    assert cache.stats()['bytes'] == _stored_bytes(cache) == 0
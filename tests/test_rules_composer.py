@@ -0,0 +1,52 @@
+"""
+Локальная сборка правил rules_composer: технологии определяются по целым словам,
+по описанию проекта выбираются разделы о его технологиях и лучшие шаблоны тем.
+"""
+import pytest
+
+from rules_composer import TemplateLibrary, compose_rules, detect_technologies
+
+VOICE_RAG = 'Голосовой агент на LiveKit с RAG на LlamaIndex'
+
+@pytest.fixture(scope='module')
+def library():
+    return TemplateLibrary.load()
+
+@pytest.mark.parametrize('text, expected', [
+    ('TS and JS services, PEP 8', ['python', 'typescript', 'javascript']),
+    ('Pepper robot: JSON schemas, statsd metrics', []),
+    ('Reactive streams in Ragnarok', []),
+    ('Голосовой ассистент для продажи квартир', ['voice', 'real_estate']),
+    ('PostgreSQL and tailwindcss in Dockerfile', ['tailwind', 'docker', 'postgres']),
+])
+def test_detect_technologies_matches_whole_words(text, expected):
+    assert detect_technologies(text) == expected
+
+def test_compose_selects_sections_for_description(library):
+    composition = compose_rules(VOICE_RAG, library=library)
+    
+    assert composition.technologies == ['livekit', 'voice', 'llamaindex', 'rag']
+    assert composition.text.startswith('You are an expert in LiveKit, voice agents, LlamaIndex, RAG')
+    assert composition.sections == [
+        'LlamaIndex for RAG System',
+        'Core RAG Components',
+        'Three RAG Engine Types',
+        'LiveKit Integration Patterns',
+        'LiveKit Integration',
+        'Business Use Case Integration',
+        'Real-time Agent Patterns',
+        'Monitoring and Observability',
+        'Performance Optimization',
+        'Testing and Quality Assurance',
+        'Security and Privacy',
+        'Documentation and Deployment',
+    ]
+
+def test_compose_without_known_technologies_uses_only_topic_templates(library):
+    composition = compose_rules('Pepper robot with JSON schemas', library=library)
+    
+    assert composition.technologies == []
+    assert composition.text.startswith('You are an expert in modern software development.')
+    topics = {template.title: template.topic for template in library.templates if not template.technologies}
+    assert composition.sections
+    assert all(topics.get(title) for title in composition.sections)
@@ -0,0 +1,79 @@
+"""
+Переиспользование правил из индекса похожих запросов: правила сверяются с историей
+по дайджесту, повтор включается только порогом RULES_REUSE_THRESHOLD, last_reused
+виден лишь своему генератору, потоку и задаче.
+"""
+import main
+from rules_index import get_rules_index, reuse_threshold
+
+REACT_RULES = "You are an expert in React, TypeScript and Next.js.\n\n- Use functional components\n"
+DJANGO_RULES = "You are an expert in Django and Postgres.\n\n- Use class-based views\n"
+
+def _save_two_projects(tmp_path) -> str:
+    # CLI пишет все проекты в один и тот же rules.md
+    path = str(tmp_path / 'rules.md')
+    main.save_rules_md(REACT_RULES, path, "React + TS dashboard")
+    main.save_rules_md(DJANGO_RULES, path, "Django REST API on Postgres")
+    return path
+
+def test_reuse_returns_rules_of_matched_project_after_file_overwrite(tmp_path):
+    _save_two_projects(tmp_path)
+    score, rules, entry = get_rules_index().find_reusable("TypeScript React admin panel", threshold=0.9)
+    assert entry['query'] == "React + TS dashboard"
+    assert rules == REACT_RULES.strip()
+
+def test_reuse_rejects_overwritten_file_without_history(tmp_path, monkeypatch):
+    monkeypatch.setenv('RULES_STORE_DISABLE', '1')
+    _save_two_projects(tmp_path)
+    assert get_rules_index().find_reusable("TypeScript React admin panel", threshold=0.9) is None
+
+def test_reuse_is_opt_in(tmp_path):
+    _save_two_projects(tmp_path)
+    assert reuse_threshold() == 0
+    generator = main.CursorRulesGenerator(use_cache=False)
+    assert generator.similarity_threshold == 0
+
+def test_last_reused_is_per_thread(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+    main.save_rules_md(REACT_RULES, str(tmp_path / 'react.md'), "React + TS dashboard")
+    main.save_rules_md(DJANGO_RULES, str(tmp_path / 'django.md'), "Django REST API on Postgres")
+    generator = main.CursorRulesGenerator(use_cache=False, similarity_threshold=0.9)
+    
+    def generate(query):
+        rules = generator.generate_cursorrules(query)
+        return rules, generator.last_reused['query']
+    
+    queries = ["React + TS dashboard", "Django REST API on Postgres"] * 20
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(generate, queries))
+    for query, (rules, reused_query) in zip(queries, results):
+        assert reused_query == query
+        assert rules == (REACT_RULES if 'React' in query else DJANGO_RULES).strip()
+    assert generator.last_reused is None
+
+def test_last_reused_is_per_generator(tmp_path):
+    main.save_rules_md(REACT_RULES, str(tmp_path / 'react.md'), "React + TS dashboard")
+    first = main.CursorRulesGenerator(use_cache=False, similarity_threshold=0.9)
+    second = main.CursorRulesGenerator(use_cache=False, similarity_threshold=0.9)
+    
+    first.generate_cursorrules("React + TS dashboard")
+    assert first.last_reused['query'] == "React + TS dashboard"
+    assert second.last_reused is None
+
+def test_async_last_reused_is_per_task(tmp_path):
+    import asyncio
+    main.save_rules_md(REACT_RULES, str(tmp_path / 'react.md'), "React + TS dashboard")
+    main.save_rules_md(DJANGO_RULES, str(tmp_path / 'django.md'), "Django REST API on Postgres")
+    
+    async def run():
+        async with main.AsyncCursorRulesGenerator(use_cache=False, similarity_threshold=0.9) as generator:
+            async def generate(query):
+                await generator.generate_cursorrules(query)
+                await asyncio.sleep(0)
+                return generator.last_reused['query']
+            
+            queries = ["React + TS dashboard", "Django REST API on Postgres"] * 5
+            return queries, await asyncio.gather(*(generate(query) for query in queries))
+    
+    queries, reused = asyncio.run(run())
+    assert reused == queries
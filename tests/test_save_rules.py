@@ -0,0 +1,32 @@
+"""
+main.save_rules_md: поток фрагментов пишется в файлы по мере поступления,
+а весь текст попадает в историю правил и индекс похожих запросов.
+"""
+import os
+
+from main import save_rules_md
+from rules_index import get_rules_index
+from rules_store import get_rules_store, project_for_path
+
+RULES = '- Use typed interfaces\n- Keep functions small\n'
+
+def test_stream_is_written_while_it_is_generated(tmp_path):
+    filename = str(tmp_path / 'rules.md')
+    temp_files_seen = []
+    
+    def chunks():
+        yield RULES[:10]
+        # Запись идет параллельно генерации: временный файл уже открыт
+        temp_files_seen.append([name for name in os.listdir(tmp_path) if name.endswith('.tmp')])
+        yield RULES[10:]
+    
+    save_rules_md(chunks(), filename, user_query='React dashboard', cursorrules_path=str(tmp_path / '.cursorrules'))
+    
+    assert len(temp_files_seen[0]) == 2
+    with open(tmp_path / '.cursorrules', encoding='utf-8') as f:
+        assert f.read() == RULES
+    store = get_rules_store()
+    project = project_for_path(filename)
+    assert store.text(project, store.versions(project)[-1].version).strip() == RULES.strip()
+    index = get_rules_index()
+    assert len(index) == 1
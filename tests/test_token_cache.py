@@ -0,0 +1,72 @@
+"""
+Кеш и пакетный выпуск токенов API: срок жизни токена соответствует запрошенному
+ttl, после смены активного ключа keyring кеш не отдает токены прежнего ключа,
+невалидные записи пакета не расходуют квоту комнаты.
+"""
+import base64
+import json
+import time
+
+import api.token as token_api
+
+class _Request(dict):
+    method = 'POST'
+
+def _post(body) -> dict:
+    response = token_api.handler(_Request(body=json.dumps(body)), None)
+    assert response['statusCode'] == 200, response
+    return json.loads(response['body'])
+
+def _segment(token: str, index: int) -> dict:
+    segment = token.split('.')[index]
+    return json.loads(base64.urlsafe_b64decode(segment + '=' * (-len(segment) % 4)))
+
+def _claims(token: str) -> dict:
+    return _segment(token, 1)
+
+def test_batch_ttl_not_served_from_default_cache(token_env):
+    default = _claims(_post({'roomName': 'room', 'participantName': 'alice'})['token'])
+    assert default['exp'] - default['iat'] == token_api.DEFAULT_GRANT_PROFILE.ttl
+    
+    batch = _post([{'roomName': 'room', 'participantName': 'alice', 'ttl': 60}])
+    claims = _claims(batch['results'][0]['token'])
+    assert claims['exp'] - claims['iat'] == 60
+
+def test_same_ttl_is_served_from_cache(token_env):
+    entry = {'roomName': 'room', 'participantName': 'bob', 'ttl': 120}
+    first = _post([entry])['results'][0]['token']
+    second = _post([entry])['results'][0]['token']
+    claims = _claims(first)
+    assert claims['exp'] - claims['iat'] == 120
+    assert first == second
+
+def test_invalid_batch_entries_do_not_consume_room_quota(token_env, monkeypatch):
+    monkeypatch.setenv('LIVEKIT_RATE_LIMIT_ROOM', '2/60')
+    batch = _post([
+        {'roomName': 'quota', 'participantName': 'a', 'ttl': 0},
+        {'roomName': 'quota', 'participantName': 'b', 'ttl': 'long'},
+        {'roomName': 'quota', 'participantName': 'c'},
+        {'roomName': 'quota', 'participantName': 'd'},
+        {'roomName': 'quota', 'participantName': 'e'},
+    ])
+    results = batch['results']
+    assert all('ttl must be' in r['error'] for r in results[:2])
+    assert 'token' in results[2] and 'token' in results[3]
+    assert results[4]['error'] == 'Rate limit exceeded for room'
+
+def test_active_key_rollover_bypasses_cached_tokens(token_env, monkeypatch, tmp_path):
+    switch = time.time() + 1.0
+    keyring = tmp_path / 'keyring.json'
+    keyring.write_text(json.dumps({'keys': [
+        {'kid': 'old', 'api_key': 'old-key', 'api_secret': 'o' * 32, 'not_after': switch},
+        {'kid': 'new', 'api_key': 'new-key', 'api_secret': 'n' * 32, 'not_before': switch},
+    ]}))
+    monkeypatch.setenv('LIVEKIT_KEYRING_FILE', str(keyring))
+    body = {'roomName': 'room', 'participantName': 'carol'}
+    
+    first = _post(body)['token']
+    assert _segment(first, 0)['kid'] == 'old'
+    time.sleep(max(0.0, switch - time.time()) + 0.05)
+    second = _post(body)['token']
+    assert _segment(second, 0)['kid'] == 'new'
+    assert _claims(second)['iss'] == 'new-key'
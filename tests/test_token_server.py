@@ -0,0 +1,87 @@
+"""
+TokenServer: простаивающие и медленные соединения не занимают потоки пула,
+лишние соединения получают 503.
+"""
+import http.client
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+import api.token as token_api
+
+BODY = json.dumps({'roomName': 'room', 'participantName': 'alice'})
+
+@pytest.fixture
+def token_server(token_env):
+    servers = []
+    
+    def start(**options):
+        server = token_api.TokenServer(('127.0.0.1', 0), **options)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server.server_address[1]
+    
+    yield start
+    for server in servers:
+        server.stop()
+        server.server_close()
+
+def _post(connection: http.client.HTTPConnection) -> int:
+    connection.request('POST', '/', BODY, {'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    response.read()
+    return response.status
+
+def test_idle_keepalive_connections_do_not_hold_workers(token_server):
+    port = token_server(workers=2)
+    idle = [http.client.HTTPConnection('127.0.0.1', port, timeout=5) for _ in range(4)]
+    for connection in idle:
+        assert _post(connection) == 200
+    
+    started = time.monotonic()
+    assert _post(http.client.HTTPConnection('127.0.0.1', port, timeout=5)) == 200
+    assert time.monotonic() - started < 1.0
+    # Простаивавшие соединения обслуживаются дальше
+    assert all(_post(connection) == 200 for connection in idle)
+
+def test_slow_headers_are_cut_off_by_deadline(token_server):
+    port = token_server(workers=1, header_timeout=0.5)
+    slow = socket.create_connection(('127.0.0.1', port))
+    slow.sendall(b'POST / HTTP/1.1\r\n')
+    started = time.monotonic()
+    closed = None
+    for i in range(30):
+        try:
+            slow.sendall(b'X-Slow-%d: 1\r\n' % i)
+        except OSError:
+            closed = time.monotonic() - started
+            break
+        slow.settimeout(0.1)
+        try:
+            if slow.recv(1024) == b'':
+                closed = time.monotonic() - started
+                break
+        except socket.timeout:
+            pass
+    slow.close()
+    
+    assert closed is not None and closed < 1.5
+    assert _post(http.client.HTTPConnection('127.0.0.1', port, timeout=5)) == 200
+
+def test_connections_over_limit_get_503(token_server):
+    port = token_server(max_connections=2)
+    held = [socket.create_connection(('127.0.0.1', port)) for _ in range(2)]
+    time.sleep(0.1)
+    
+    extra = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    extra.connect()
+    response = http.client.HTTPResponse(extra.sock)
+    response.begin()
+    assert response.status == 503
+    assert json.loads(response.read())['error'] == 'Too many connections'
+    
+    for connection in held:
+        connection.close()
@@ -0,0 +1,20 @@
+"""
+Проверка токенов (POST /verify): предел тела в байтах, как у выпуска токенов.
+"""
+import json
+
+import api.token as token_api
+
+def test_verify_body_limit_counts_bytes(token_env):
+    # Строка короче предела в символах, но длиннее в байтах UTF-8
+    body = json.dumps({'token': 'я' * (token_api.MAX_BODY_SIZE // 2)}, ensure_ascii=False)
+    assert len(body) <= token_api.MAX_BODY_SIZE < len(body.encode('utf-8'))
+    
+    assert token_api.process_verify_request('POST', body).status == 413
+
+def test_verify_accepts_issued_token(token_env):
+    token = token_api.issue_token(token_api.get_minter(), 'room', 'alice')
+    response = token_api.process_verify_request('POST', json.dumps({'token': token, 'roomName': 'room'}))
+    
+    assert response.status == 200
+    assert json.loads(response.read_body())['active'] is True